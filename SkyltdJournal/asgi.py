@@ -3,6 +3,10 @@ ASGI config for SkyltdJournal project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Живий потік змін /api/events/ (Server-Sent Events) обслуговується лише тут:
+брокер подій in-process (apps/events.py), тому сервер запускається одним
+процесом, напр. ``uvicorn SkyltdJournal.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -14,3 +18,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SkyltdJournal.settings')
 
 application = get_asgi_application()
+
+# Префіксний індекс typeahead будується у фоні одразу при старті процесу
+from apps.suggest import index  # noqa: E402
+
+index.warm_up()
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SkyltdJournal.settings')
 
 application = get_wsgi_application()
+
+# Префіксний індекс typeahead будується у фоні одразу при старті процесу
+from apps.suggest import index  # noqa: E402
+
+index.warm_up()
@@ -1,7 +1,8 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from .models import User
-from ..models import JournalRecord, Service, Vehicle, Client
+from .. import dedup
+from ..models import JournalRecord, JournalCommentEntry, Service, Vehicle, VehicleBrand, VehicleModel, Client
 
 
 @admin.register(User)
@@ -39,6 +40,21 @@ class ClientAdmin(admin.ModelAdmin):
     list_display = ('name', 'phone')
     search_fields = ('name', 'phone')
     ordering = ('name',)
+    actions = ('merge_duplicates',)
+
+    @admin.action(description="Знайти та об'єднати дублікати серед вибраних")
+    def merge_duplicates(self, request, queryset):
+        clusters, _ = dedup.find_clusters(queryset)
+        if not clusters:
+            self.message_user(request, "Дублікатів серед вибраних клієнтів не знайдено", messages.INFO)
+            return
+        totals = dedup.merge_all(clusters)
+        self.message_user(
+            request,
+            "Об'єднано кластерів: {n}; видалено клієнтів {clients}, авто {vehicles}; "
+            "записів на сервіс з перетином після злиття авто: {overlaps}".format(n=len(clusters), **totals),
+            messages.SUCCESS,
+        )
 
 # -----------------------------
 # Vehicle
@@ -47,9 +63,26 @@ class ClientAdmin(admin.ModelAdmin):
 class VehicleAdmin(admin.ModelAdmin):
     list_display = ('brand', 'model', 'plate_number', 'client')
     search_fields = ('brand', 'model', 'plate_number', 'client__name')
-    list_filter = ('brand',)
+    # варіанти фільтра — з довідника, а не DISTINCT по всій таблиці авто
+    list_filter = ('brand_ref',)
     autocomplete_fields = ('client',)
 
+
+@admin.register(VehicleBrand)
+class VehicleBrandAdmin(admin.ModelAdmin):
+    list_display = ('name', 'key', 'vehicles_count')
+    search_fields = ('name', 'key')
+    readonly_fields = ('key', 'vehicles_count')
+
+
+@admin.register(VehicleModel)
+class VehicleModelAdmin(admin.ModelAdmin):
+    list_display = ('name', 'brand', 'key', 'vehicles_count')
+    list_select_related = ('brand',)
+    search_fields = ('name', 'key', 'brand__name')
+    readonly_fields = ('key', 'vehicles_count')
+    autocomplete_fields = ('brand',)
+
 # -----------------------------
 # Service
 # -----------------------------
@@ -62,9 +95,21 @@ class ServiceAdmin(admin.ModelAdmin):
 # -----------------------------
 # JournalRecord
 # -----------------------------
+class JournalCommentEntryInline(admin.TabularInline):
+    model = JournalCommentEntry
+    fields = ('created_at', 'author_name', 'text')
+    readonly_fields = ('created_at', 'author_name', 'text')
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(JournalRecord)
 class JournalRecordAdmin(admin.ModelAdmin):
     list_display = ('date', 'department', 'client', 'vehicle', 'service', 'comment')
     list_filter = ('department', 'date', 'service')
     search_fields = ('client__name', 'vehicle__plate_number', 'comment')
-    autocomplete_fields = ('client', 'vehicle', 'service', 'services')
\ No newline at end of file
+    autocomplete_fields = ('client', 'vehicle', 'service', 'services')
+    inlines = (JournalCommentEntryInline,)
\ No newline at end of file
@@ -12,6 +12,7 @@ class User(AbstractUser):
         blank=True,
         verbose_name="Посада"
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Оновлено")
 
     class Meta:
         verbose_name = "Користувач"
@@ -0,0 +1,272 @@
+from django.db import transaction
+from rest_framework import serializers
+
+from apps import catalog, counters, events, refdata, stats, suggest
+from apps.models import ChangeMarker, Client, Vehicle, JournalRecord, JournalCommentEntry, Service
+from apps.normalize import FULL_PHONE_LENGTH, normalize_phone, plate_key
+
+
+MAX_BULK_RECORDS = 500
+
+
+def _as_id(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+# "true" / "false" / "1" / "0" / "yes" / "no" з CSV і форм — як у JournalRecordSerializer
+_boolean = serializers.BooleanField()
+
+# Поле елемента -> max_length поля моделі, куди воно потрапляє. Перевіряємо до вставки:
+# DataError у спільній транзакції обірвав би весь пакет замість однієї помилки елемента
+_MAX_LENGTHS = {
+    "client_name": Client._meta.get_field("name").max_length,
+    "phone": min(Client._meta.get_field("phone").max_length, JournalRecord._meta.get_field("phone").max_length),
+    "plate_number": Vehicle._meta.get_field("plate_number").max_length,
+    "brand": Vehicle._meta.get_field("brand").max_length,
+    "model": Vehicle._meta.get_field("model").max_length,
+}
+
+
+def _clean(value):
+    return str(value).strip() if value is not None else ""
+
+
+def _unique_map(rows, key):
+    """key -> объект, только если совпадение однозначное (как count() == 1 в create)."""
+    found = {}
+    for row in rows:
+        k = key(row)
+        found[k] = None if k in found else row
+    return {k: v for k, v in found.items() if v is not None}
+
+
+def bulk_create_journal_records(items, user):
+    """
+    Массовое создание записей журнала.
+
+    Клиенты, авто и услуги резолвятся несколькими set-based запросами на весь пакет
+    (id__in / phone_normalized__in / plate_key__in), новые клиенты, авто, записи, дописи
+    и связи services вставляются через bulk_create в одной транзакции.
+    Возвращает список результатов по каждому элементу в исходном порядке.
+    """
+    results = [None] * len(items)
+    departments = dict(JournalRecord.DEPARTMENT_CHOICES)
+
+    # ---------------------------
+    # 1. Нормализация входа
+    # ---------------------------
+    rows = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {"index": index, "status": "error", "errors": {"non_field_errors": "Очікується об'єкт"}}
+            continue
+
+        department = _clean(item.get("department"))
+        if department not in departments:
+            results[index] = {"index": index, "status": "error", "errors": {"department": "Допустимі значення: sales, service"}}
+            continue
+
+        try:
+            is_priority = _boolean.to_internal_value(item.get("is_priority") or False)
+        except serializers.ValidationError:
+            results[index] = {"index": index, "status": "error", "errors": {"is_priority": "Очікується true або false"}}
+            continue
+
+        too_long = {
+            field: f"Не більше {limit} символів"
+            for field, limit in _MAX_LENGTHS.items() if len(_clean(item.get(field))) > limit
+        }
+        if too_long:
+            results[index] = {"index": index, "status": "error", "errors": too_long}
+            continue
+
+        service_ids = item.get("service_ids") or []
+        if not isinstance(service_ids, list):
+            service_ids = [service_ids]
+
+        rows.append({
+            "index": index,
+            "department": department,
+            "is_priority": is_priority,
+            "client_id": _as_id(item.get("client_id")),
+            "vehicle_id": _as_id(item.get("vehicle_id")),
+            "service_id": _as_id(item.get("service_id")),
+            "service_ids": [sid for sid in map(_as_id, service_ids) if sid],
+            "name": _clean(item.get("client_name")),
+            "phone": _clean(item.get("phone")),
+            "plate_number": _clean(item.get("plate_number")),
+            "brand": _clean(item.get("brand")),
+            "model": _clean(item.get("model")),
+            "comment": _clean(item.get("comment")),
+        })
+
+    # ---------------------------
+    # 2. Set-based резолв клиентов, авто и услуг
+    # ---------------------------
+    clients_by_id = Client.objects.in_bulk({r["client_id"] for r in rows if r["client_id"]})
+    vehicles_by_id = Vehicle.objects.select_related("client").in_bulk({r["vehicle_id"] for r in rows if r["vehicle_id"]})
+
+    # повний номер -> усі його власники (ім'я лише розрізняє кількох, як у create)
+    phones = {normalize_phone(r["phone"]) for r in rows if r["phone"] and not r["client_id"]}
+    phones = {phone for phone in phones if len(phone) >= FULL_PHONE_LENGTH}
+    clients_by_phone = {}
+    for candidate in Client.objects.filter(phone_normalized__in=phones) if phones else ():
+        clients_by_phone.setdefault(candidate.phone_normalized, []).append(candidate)
+
+    plates = {plate_key(r["plate_number"]) for r in rows if r["plate_number"] and not r["vehicle_id"]} - {""}
+    vehicles_by_plate = (
+        _unique_map(Vehicle.objects.select_related("client").filter(plate_key__in=plates), lambda v: v.plate_key)
+        if plates else {}
+    )
+
+    all_service_ids = {sid for r in rows for sid in r["service_ids"]} | {r["service_id"] for r in rows if r["service_id"]}
+    cached_services = refdata.services.snapshot().by_id
+    services_by_id = {sid: cached_services[sid] for sid in all_service_ids if sid in cached_services}
+    if len(services_by_id) != len(all_service_ids):
+        # послуги, яких знімок (apps.refdata) ще не знає, — створені в іншому процесі: одним запитом з бази
+        services_by_id = Service.objects.in_bulk(all_service_ids)
+    active_service_ids = {sid for sid, s in services_by_id.items() if s.is_active}
+
+    # ---------------------------
+    # 3. Сопоставление по каждой строке
+    # ---------------------------
+    new_clients = {}
+    new_vehicles = {}
+    ready = []
+
+    for r in rows:
+        client = clients_by_id.get(r["client_id"])
+        vehicle = vehicles_by_id.get(r["vehicle_id"])
+
+        phone = normalize_phone(r["phone"])
+        owners = clients_by_phone.get(phone, [])
+        if not client and owners:
+            candidates = owners
+            if len(candidates) > 1 and r["name"]:
+                candidates = [c for c in candidates if r["name"].lower() in c.name.lower()]
+            if len(candidates) == 1:
+                client = candidates[0]
+
+        if not vehicle and r["plate_number"]:
+            vehicle = vehicles_by_plate.get(plate_key(r["plate_number"]))
+
+        if not client and vehicle and vehicle.client:
+            client = vehicle.client
+
+        if not client and (r["name"] or r["phone"]):
+            if not r["name"] or not r["phone"]:
+                results[r["index"]] = {
+                    "index": r["index"], "status": "error",
+                    "errors": {"client": "Для створення нового клієнта потрібно і name, і phone"},
+                }
+                continue
+            if len(phone) < FULL_PHONE_LENGTH or owners:
+                results[r["index"]] = {
+                    "index": r["index"], "status": "error",
+                    "errors": {"client": (
+                        "Цей номер мають кілька клієнтів — вкажіть client_id" if owners
+                        else "Для створення нового клієнта потрібен повний номер телефону"
+                    )},
+                }
+                continue
+            # один и тот же новый клиент (полный номер) в пакете создаётся один раз
+            client = new_clients.setdefault(phone, Client(name=r["name"], phone=r["phone"]))
+
+        if not vehicle and r["department"] == "service":
+            if not r["brand"] or not r["model"]:
+                results[r["index"]] = {
+                    "index": r["index"], "status": "error",
+                    "errors": {"vehicle": "Для створення нового авто потрібно brand і model"},
+                }
+                continue
+            plate = r["plate_number"] or "-"
+            vehicle = new_vehicles.setdefault(
+                (plate_key(plate), r["brand"], r["model"], id(client)),
+                Vehicle(plate_number=plate, brand=r["brand"], model=r["model"], client=client),
+            )
+
+        if r["service_id"] and r["service_id"] not in services_by_id:
+            results[r["index"]] = {"index": r["index"], "status": "error", "errors": {"service_id": "Послугу не знайдено"}}
+            continue
+
+        ready.append((r, client, vehicle))
+
+    # ---------------------------
+    # 4. Вставка пакетами в одной транзакции
+    # ---------------------------
+    with transaction.atomic():
+        # bulk_create сам подставит pk только что созданных клиентов / авто в FK
+        for client in new_clients.values():
+            client.prepare_lookup_fields()  # bulk_create не вызывает save()
+        Client.objects.bulk_create(new_clients.values())
+        # одним INSERT ... ON CONFLICT: авто, що вже є у клієнта (номер в іншому форматі,
+        # паралельний імпорт), не дублюється — екземпляр отримує pk наявного запису
+        vehicles = list(new_vehicles.values())
+        inserted = [v for v, created in zip(vehicles, Vehicle.objects.upsert(vehicles, send_signals=False)) if created]
+        catalog.track_created(inserted)
+
+        # bulk_create / upsert без сигналов — новые клиенты / авто добавляем в typeahead-индекс сами
+        created_clients = [(c.pk, c.name, c.phone) for c in new_clients.values()]
+        created_vehicles = [(v.pk, v.plate_number, v.brand, v.model) for v in inserted]
+
+        def index_created():
+            for row in created_clients:
+                suggest.index.put_client(*row)
+            for row in created_vehicles:
+                suggest.index.put_vehicle(*row)
+
+        transaction.on_commit(index_created)
+
+        records = []
+        for r, client, vehicle in ready:
+            record = JournalRecord(
+                department=r["department"],
+                is_priority=r["is_priority"],
+                client=client,
+                vehicle=vehicle,
+                phone=r["phone"] or (client.phone if client else None) or None,
+                service=services_by_id.get(r["service_id"]),
+            )
+            # bulk_create не вызывает save() — документ поиска собираем сами
+            record.search_document = " ".join(
+                p for p in (record.build_search_document(), " ".join(r["comment"].split()).lower()) if p
+            )
+            records.append(record)
+        JournalRecord.objects.bulk_create(records)
+
+        JournalCommentEntry.objects.bulk_create([
+            JournalCommentEntry(record=record, author=user, author_name=user.username, text=r["comment"])
+            for (r, _, _), record in zip(ready, records) if r["comment"]
+        ])
+
+        Through = JournalRecord.services.through
+        links = Through.objects.bulk_create([
+            Through(journalrecord_id=record.pk, service_id=sid)
+            for (r, _, _), record in zip(ready, records)
+            for sid in dict.fromkeys(r["service_ids"]) if sid in active_service_ids
+        ])
+
+        # bulk_create не шлёт post_save / m2m_changed — обновляем DailyStat одним запросом
+        changes = stats.journal_service_changes(
+            {record.pk: record for record in records},
+            [(link.journalrecord_id, link.service_id) for link in links],
+        )
+        for record in records:
+            changes.update(stats.journal_changes(record))
+        stats.bump(changes)
+
+        # лічильники клієнтів (авто, записи журналу) — перерахунок лише зачеплених клієнтів
+        counters.refresh({record.client_id for record in records})
+        # маркери ETag (сигналів немає)
+        ChangeMarker.touch(Client, Vehicle, JournalRecord)
+
+        # и события живого потока — одной пачкой после коммита
+        events.schedule(events.JOURNAL, events.CREATED, records)
+
+    for (r, _, _), record in zip(ready, records):
+        results[r["index"]] = {"index": r["index"], "status": "created", "id": record.pk}
+
+    return results
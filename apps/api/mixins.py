@@ -0,0 +1,135 @@
+import hashlib
+
+from django.db import connection
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from apps.models import ChangeMarker
+
+
+class SparseFieldsViewSetMixin:
+    """
+    Для list/retrieve з ?fields= / ?expand= звужує queryset під вибрані поля
+    (SparseFieldsMixin.optimize_queryset): only(), select_related, prefetch_related.
+    """
+    sparse_actions = ("list", "retrieve")
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        params = self.request.query_params
+        if self.action not in self.sparse_actions or ("fields" not in params and "expand" not in params):
+            return qs
+
+        serializer = self.get_serializer()
+        if not hasattr(serializer, "optimize_queryset"):
+            return qs
+
+        # поля сортировки (cursor-пагинация) тоже нужны в only()
+        ordering = []
+        if isinstance(self.paginator, CursorPagination):
+            ordering = [field.lstrip("-") for field in self.paginator.ordering]
+        return serializer.optimize_queryset(qs, extra_only=ordering)
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified для list и retrieve.
+
+    Маркер строится одним запросом по таблицам из conditional_models:
+    версии ChangeMarker (счётчик, растущий с каждым коммитом вставок, изменений,
+    удалений и m2m) — для ETag, MAX(updated_at) каждой таблицы (индекс) — для Last-Modified.
+    MAX(updated_at) в ETag не годится: updated_at ставится до коммита, и запись,
+    закоммиченная позже более "свежей", его не меняет.
+    Если клиент прислал совпадающий If-None-Match / If-Modified-Since — 304 без сериализации.
+    """
+    conditional_models = ()
+
+    def get_change_markers(self):
+        tables = [model._meta.db_table for model in self.conditional_models]
+        quote = connection.ops.quote_name
+        columns = [f"(SELECT MAX(updated_at) FROM {quote(table)})" for table in tables]
+        columns.append(
+            f"(SELECT COALESCE(SUM(version), 0) FROM {quote(ChangeMarker._meta.db_table)} "
+            f"WHERE {quote('table')} IN ({', '.join(['%s'] * len(tables))}))"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {', '.join(columns)}", tables)
+            *updated, version = cursor.fetchone()
+
+        updated = [value for value in updated if value is not None]
+        last_modified = max(updated) if updated else None
+
+        # ETag зависит и от параметров запроса (фильтры, страница, fields) и формата ответа
+        key = "|".join([
+            self.request.get_full_path(),
+            str(self.request.user.pk),
+            self.request.accepted_renderer.format,
+            str(version),
+        ])
+        return f'"{hashlib.md5(key.encode()).hexdigest()}"', last_modified
+
+    def _conditional_response(self, handler, request, *args, **kwargs):
+        if not self.conditional_models:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = self.get_change_markers()
+        timestamp = last_modified.timestamp() if last_modified else None
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            # браузер всегда перепроверяет, но получает 304 без тела, если ничего не изменилось
+            response["Cache-Control"] = "private, no-cache"
+            patch_vary_headers(response, ["Accept"])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+class ReferenceCacheListMixin:
+    """
+    list без ?fields= / ?expand= — зі знімка довідника apps.refdata (reference_cache),
+    без запитів до бази. ETag / Last-Modified — з того ж знімка (ставиться перед
+    ConditionalGetMixin). Решта дій — як звичайно, по queryset.
+    """
+    reference_cache = None
+
+    def _from_reference_cache(self):
+        return self.action == "list" and not {"fields", "expand"} & set(self.request.query_params)
+
+    def get_change_markers(self):
+        if not self._from_reference_cache():
+            return super().get_change_markers()
+        snapshot = self.reference_cache.snapshot()
+        key = "|".join([
+            self.request.get_full_path(),
+            str(self.request.user.pk),
+            self.request.accepted_renderer.format,
+            self.reference_cache.name,
+            snapshot.fingerprint,
+        ])
+        return f'"{hashlib.md5(key.encode()).hexdigest()}"', snapshot.last_modified
+
+    def list(self, request, *args, **kwargs):
+        if not self._from_reference_cache():
+            return super().list(request, *args, **kwargs)
+        return self._conditional_response(self._list_from_reference_cache, request, *args, **kwargs)
+
+    def _list_from_reference_cache(self, request, *args, **kwargs):
+        rows = self.reference_cache.snapshot().rows
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(rows, many=True).data)
@@ -0,0 +1,56 @@
+from rest_framework.pagination import CursorPagination
+
+
+class JournalCursorPagination(CursorPagination):
+    """Keyset-пагінація журналу: без COUNT(*) та OFFSET, індекс (department, -date, -id)."""
+    ordering = ("-date", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class AppointmentCursorPagination(CursorPagination):
+    """Keyset-пагінація записів на сервіс, індекс (start_time, id)."""
+    ordering = ("start_time", "id")
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class ClientJournalPagination(JournalCursorPagination):
+    """Історія журналу в /clients/{id}/overview/, індекс (client, -date, -id)."""
+    cursor_query_param = "journals_cursor"
+    page_size_query_param = "journals_page_size"
+    page_size = 20
+    max_page_size = 100
+
+
+class FreeVehicleCursorPagination(CursorPagination):
+    """Авто без власника (/api/vehicles/free/), частковий індекс (plate_key, id) WHERE client IS NULL."""
+    ordering = ("plate_key", "id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class CursorPaginationMixin:
+    """
+    Вмикає cursor-пагінацію для ?pagination=cursor (або коли вже передано ?cursor=).
+    Без параметра залишається звичайна PageNumberPagination, щоб не ламати старий фронтенд.
+    Параметри з cursor_exclusive_params (напр. пошук q, упорядкований за релевантністю)
+    вимикають cursor: keyset-сторінки перевпорядкували б результат за ordering пагінатора.
+    """
+    cursor_pagination_class = None
+    cursor_exclusive_params = ()
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            use_cursor = "cursor" in params or params.get("pagination") == "cursor"
+            if any(params.get(name, "").strip() for name in self.cursor_exclusive_params):
+                use_cursor = False
+            if self.cursor_pagination_class is not None and use_cursor:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+
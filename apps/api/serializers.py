@@ -1,10 +1,108 @@
-from datetime import timedelta
 
+from django.db.models import Prefetch
 from rest_framework import serializers
+from apps import booking, refdata
 from apps.models import Client, Vehicle, Service, JournalRecord, Appointment
 from apps.accounts.models import User
 
 
+def _query_param_set(request, name):
+    value = request.query_params.get(name) if request is not None else None
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(",") if part.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Вибіркові поля для GET: ?fields=id,name,... та ?expand=client,services.
+
+    Без параметрів відповідь така ж, як раніше. Якщо передано fields або expand,
+    вкладені об'єкти з expandable_fields, яких немає в expand, віддаються компактно — лише id.
+    optimize_queryset() підганяє only() / select_related / prefetch_related під вибрані поля.
+
+    expandable_fields: {поле: {"select": [...], "prefetch": [...]}} — що потрібно для повного об'єкта.
+    field_requirements: {поле: {"only": [...], "select": [...], "prefetch": [...]}} — для інших
+    полів, які читають щось крім одноіменної колонки.
+    """
+    expandable_fields = {}
+    field_requirements = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compact_fields = set()
+
+        request = self.context.get("request")
+        if request is None or request.method != "GET":
+            return
+
+        fields = _query_param_set(request, "fields")
+        expand = _query_param_set(request, "expand")
+        if fields is None and expand is None:
+            return
+
+        if fields is not None:
+            for name in set(self.fields) - fields - {"id"}:
+                self.fields.pop(name)
+
+        for name in self.expandable_fields:
+            if name in self.fields and name not in (expand or ()):
+                self.compact_fields.add(name)
+                field = self.fields[name]
+                many = isinstance(field, serializers.ListSerializer)
+                if isinstance(field, serializers.BaseSerializer):
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many)
+
+    def is_compact(self, name):
+        return name in self.compact_fields
+
+    def optimize_queryset(self, queryset, extra_only=()):
+        model = self.Meta.model
+        concrete = {f.name for f in model._meta.concrete_fields}
+        only, select, prefetch = {"id", *extra_only}, set(), {}
+
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+
+            spec = self.field_requirements.get(name)
+
+            if name in self.expandable_fields:
+                spec = self.expandable_fields[name]
+                if name in self.compact_fields and "compact" in spec:
+                    spec = spec["compact"]
+                elif name in self.compact_fields and name in concrete:
+                    # FK: id берётся из колонки client_id, без JOIN
+                    only.add(name)
+                    continue
+                elif name in self.compact_fields:
+                    # M2M / обратный FK: prefetch только id (+ FK для сопоставления)
+                    for path in spec.get("prefetch", ()):
+                        relation = model._meta.get_field(path)
+                        columns = ["id"] + ([relation.field.attname] if relation.one_to_many else [])
+                        prefetch[path] = Prefetch(
+                            path, queryset=relation.related_model._default_manager.only(*columns)
+                        )
+                    continue
+
+            if spec is not None:
+                only.update(spec.get("only", ()))
+                select.update(spec.get("select", ()))
+                prefetch.update({path: path for path in spec.get("prefetch", ())})
+            elif field.source in concrete:
+                only.add(field.source)
+
+        # select_related(a__b) требует, чтобы a не было отложено в only()
+        only.update(path.split("__")[0] for path in select)
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch.values())
+        return queryset.only(*only)
+
+
 class UserBasicSerializer(serializers.ModelSerializer):
     display_name = serializers.SerializerMethodField()
 
@@ -30,35 +128,48 @@ class ClientBasicSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'phone']
 
 
-class VehicleSerializer(serializers.ModelSerializer):
+class VehicleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     client = ClientBasicSerializer(read_only=True)
     client_id = serializers.IntegerField(write_only=True, required=False)
 
+    expandable_fields = {
+        "client": {"select": ["client"]},
+    }
+
     class Meta:
         model = Vehicle
-        fields = ['id', 'brand', 'model', 'plate_number', 'client', 'client_id']
-        read_only_fields = ['client']
+        fields = ['id', 'brand', 'model', 'plate_number', 'brand_ref', 'model_ref', 'client', 'client_id']
+        read_only_fields = ['client', 'brand_ref', 'model_ref']
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     vehicles = VehicleBasicSerializer(many=True, read_only=True)
 
+    expandable_fields = {
+        "vehicles": {"prefetch": ["vehicles"]},
+    }
+
     class Meta:
         model = Client
-        fields = ['id', 'name', 'phone', 'vehicles']
+        fields = [
+            'id', 'name', 'phone', 'vehicles',
+            'vehicles_count', 'journals_count', 'last_journal_at', 'visits_count', 'last_visit_at',
+        ]
 
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = ['id', 'name', 'is_active']
 
 
-class JournalRecordSerializer(serializers.ModelSerializer):
+class JournalRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     client = ClientBasicSerializer(read_only=True)
     vehicle = VehicleBasicSerializer(read_only=True)
     service = ServiceSerializer(read_only=True)
     services = ServiceSerializer(many=True, read_only=True)
+    # Legacy-текст + append-only дописи (comment_entries), формат як і раніше
+    comment = serializers.CharField(source="full_comment", read_only=True)
 
     client_id = serializers.IntegerField(write_only=True, required=False)
     vehicle_id = serializers.IntegerField(write_only=True, required=False)
@@ -69,6 +180,16 @@ class JournalRecordSerializer(serializers.ModelSerializer):
         required=False
     )
 
+    expandable_fields = {
+        "client": {"select": ["client"]},
+        "vehicle": {"select": ["vehicle"]},
+        "service": {"select": ["service"]},
+        "services": {"prefetch": ["services"]},
+    }
+    field_requirements = {
+        "comment": {"only": ["comment"], "prefetch": ["comment_entries"]},
+    }
+
     class Meta:
         model = JournalRecord
         fields = [
@@ -90,7 +211,7 @@ class JournalRecordSerializer(serializers.ModelSerializer):
         read_only_fields = ['client', 'vehicle', 'service', 'services']
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # --- READ ---
     client = serializers.SerializerMethodField()
     vehicle = VehicleBasicSerializer(read_only=True)
@@ -117,6 +238,20 @@ class AppointmentSerializer(serializers.ModelSerializer):
         default=list,
     )
 
+    expandable_fields = {
+        # client — с fallback на владельца авто, в компактном виде нужен только vehicle.client_id
+        "client": {
+            "select": ["client", "vehicle__client"],
+            "compact": {"only": ["client", "vehicle"], "select": ["vehicle"]},
+        },
+        "vehicle": {"select": ["vehicle"]},
+        "services": {"prefetch": ["services"]},
+        "users": {"prefetch": ["users"]},
+    }
+    field_requirements = {
+        "users_display": {"prefetch": ["users"]},
+    }
+
     class Meta:
         model = Appointment
         fields = [
@@ -150,6 +285,9 @@ class AppointmentSerializer(serializers.ModelSerializer):
     # CLIENT FALLBACK (🔥 ключевой фикс)
     # =========================================
     def get_client(self, obj):
+        if self.is_compact("client"):
+            return obj.client_id or (obj.vehicle.client_id if obj.vehicle_id else None)
+
         if obj.client:
             return ClientBasicSerializer(obj.client).data
 
@@ -168,13 +306,16 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if len(set(value)) != len(value):
             raise serializers.ValidationError("Сотрудники не должны повторяться.")
 
-        users_qs = User.objects.filter(id__in=value)
+        # обычный случай — все из кэша сотрудников (apps.refdata), без запросов;
+        # иначе уточняем ошибку по базе
+        if len(refdata.staff_ids(value)) != len(value):
+            users_qs = User.objects.filter(id__in=value)
 
-        if users_qs.count() != len(value):
-            raise serializers.ValidationError("Один или несколько сотрудников не найдены.")
+            if users_qs.count() != len(value):
+                raise serializers.ValidationError("Один или несколько сотрудников не найдены.")
 
-        if users_qs.filter(is_superuser=True).exists():
-            raise serializers.ValidationError("Нельзя выбрать суперадминов.")
+            if users_qs.filter(is_superuser=True).exists():
+                raise serializers.ValidationError("Нельзя выбрать суперадминов.")
 
         return value
 
@@ -185,9 +326,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if len(set(value)) != len(value):
             raise serializers.ValidationError("Услуги не должны повторяться.")
 
-        services_qs = Service.objects.filter(id__in=value, is_active=True)
-
-        if services_qs.count() != len(value):
+        if len(refdata.active_service_ids(value)) != len(value):
             raise serializers.ValidationError("Одна или несколько услуг не найдены.")
 
         return value
@@ -213,10 +352,6 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
         force = str(raw_data.get("force", "")).lower() in ("1", "true", "yes")
 
-        start_time = validated_data["start_time"]
-        duration = validated_data["duration_minutes"]
-        end_time = start_time + timedelta(minutes=duration)
-
         # --- CLIENT ---
         client = None
 
@@ -241,46 +376,28 @@ class AppointmentSerializer(serializers.ModelSerializer):
                     "vehicle": "Нужно выбрать авто или указать бренд и модель."
                 })
 
-            vehicle, _ = Vehicle.objects.get_or_create(
-                plate_number=plate or "-",
-                brand=brand,
-                model=model,
-                client=client,
-            )
+            # те саме авто, навіть якщо номер набрано іншою розкладкою чи з пробілами
+            vehicle = Vehicle(plate_number=plate or "-", brand=brand, model=model, client=client)
+            Vehicle.objects.upsert([vehicle])
 
         elif client and not vehicle.client:
             vehicle.client = client
-            vehicle.save(update_fields=["client"])
+            vehicle.save(update_fields=["client", "updated_at"])
 
         if not client and vehicle and vehicle.client:
             client = vehicle.client
 
-        # --- CONFLICT CHECK ---
-        conflict_qs = Appointment.objects.filter(
-            vehicle=vehicle,
-            start_time__lt=end_time,
-            start_time__gt=start_time - timedelta(days=1),
-        )
-
-        if conflict_qs.exists() and not force:
-            raise serializers.ValidationError({
-                "has_conflicts": True,
-                "conflicts": AppointmentSerializer(conflict_qs, many=True).data,
-                "message": "Есть пересечения. Всё равно создать?"
-            })
+        # --- CONFLICT CHECK (авто і співробітники, apps.booking) ---
+        appointment = Appointment(client=client, vehicle=vehicle, **validated_data)
+        booking.reserve(appointment, user_ids, force)
 
         # --- CREATE ---
-        appointment = Appointment.objects.create(
-            client=client,
-            vehicle=vehicle,
-            **validated_data,
-        )
-
-        appointment.users.set(user_ids)
+        with booking.guard(appointment, user_ids):
+            appointment.save()
+            appointment.users.set(user_ids)
 
         if service_ids:
-            services = Service.objects.filter(id__in=service_ids, is_active=True)
-            appointment.services.set(services)
+            appointment.services.set(refdata.active_service_ids(service_ids))
 
         return appointment
 
@@ -299,14 +416,16 @@ class AppointmentSerializer(serializers.ModelSerializer):
         client_name = raw_data.get("client_name", "").strip()
         client_phone = raw_data.get("client_phone", "").strip()
 
-        # --- USERS ---
-        if user_ids is not None:
-            instance.users.set(user_ids)
+        force = str(raw_data.get("force", "")).lower() in ("1", "true", "yes")
+
+        # стан до змін — чи треба заново перевіряти конфлікти
+        current_user_ids = {user.pk for user in instance.users.all()}
+        previous = (instance.start_time, instance.end_time, instance.vehicle_id)
+        was_released = instance.status in Appointment.RELEASED_STATUSES
 
         # --- SERVICES ---
         if service_ids is not None:
-            services = Service.objects.filter(id__in=service_ids, is_active=True)
-            instance.services.set(services)
+            instance.services.set(refdata.active_service_ids(service_ids))
 
         # --- CLIENT ---
         client = instance.client
@@ -329,7 +448,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
         # если у машины нет клиента — привяжем
         if vehicle and client and not vehicle.client:
             vehicle.client = client
-            vehicle.save(update_fields=["client"])
+            vehicle.save(update_fields=["client", "updated_at"])
 
         # fallback клиента
         if not client and vehicle and vehicle.client:
@@ -341,12 +460,34 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
         instance.client = client
         instance.vehicle = vehicle
-        instance.save()
+        instance.prepare_lookup_fields()
+
+        # --- CONFLICT CHECK ---
+        # лише якщо запис переїхав / змінив авто чи співробітників / знову став активним:
+        # "Готово" на записі, збереженому з force, не питає підтвердження вдруге
+        new_user_ids = user_ids if user_ids is not None else sorted(current_user_ids)
+        moved = (
+            was_released
+            or previous != (instance.start_time, instance.end_time, instance.vehicle_id)
+            or set(new_user_ids) != current_user_ids
+        )
+        if moved:
+            booking.reserve(instance, new_user_ids, force)
+
+        # --- SAVE ---
+        # спершу прибрані співробітники, потім новий інтервал, потім додані:
+        # обмеження перевіряє кожен рядок AppointmentUser уже з актуальним інтервалом
+        with booking.guard(instance, new_user_ids):
+            if user_ids is not None:
+                instance.users.remove(*(current_user_ids - set(user_ids)))
+            instance.save()
+            if user_ids is not None:
+                instance.users.add(*[pk for pk in user_ids if pk not in current_user_ids])
 
         return instance
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -0,0 +1,102 @@
+import asyncio
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+from apps import events
+from .serializers import JournalRecordSerializer, AppointmentSerializer
+from .views import JournalRecordViewSet, AppointmentViewSet
+
+
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+
+
+# ---------------------------------------------------
+# Рендер событий: те же queryset и сериализаторы, что и в списках API,
+# чтобы фронт мог подменить объект в своём массиве как есть
+# ---------------------------------------------------
+@events.renderer(events.JOURNAL)
+def render_journal_records(pks):
+    records = JournalRecordViewSet.queryset.filter(pk__in=pks)
+    return {row["id"]: row for row in JournalRecordSerializer(records, many=True).data}
+
+
+@events.renderer(events.APPOINTMENT)
+def render_appointments(pks):
+    appointments = AppointmentViewSet.queryset.filter(pk__in=pks)
+    return {row["id"]: row for row in AppointmentSerializer(appointments, many=True).data}
+
+
+def _sse(event_id, name, data):
+    return f"id: {event_id}\nevent: {name}\ndata: {data}\n\n"
+
+
+async def _event_stream(subscription, replay):
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+
+        if replay is None:
+            yield _sse(events.broker.last_event_id, "reset", "{}")
+        else:
+            for event in replay:
+                yield _sse(event["id"], event["topic"], event["payload"])
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # комментарий держит соединение живым через прокси
+                yield ": ping\n\n"
+                continue
+
+            if event is events.RESET:
+                yield _sse(events.broker.last_event_id, "reset", "{}")
+            else:
+                yield _sse(event["id"], event["topic"], event["payload"])
+    finally:
+        events.broker.unsubscribe(subscription)
+
+
+async def change_stream(request):
+    """
+    GET /api/events/?topics=journal,appointment&department=service&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+
+    Server-Sent Events: `journal` / `appointment` с {"action": created|updated|deleted, "id", "data"},
+    `reset` — события потеряны, список нужно перезагрузить. Поддерживает Last-Event-ID.
+    Работает только под ASGI (SkyltdJournal/asgi.py): под WSGI поток занимал бы воркер.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "Потік змін доступний лише під ASGI"}, status=501)
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    params = request.GET
+    topics = [t for t in params.get("topics", ",".join(events.TOPICS)).split(",") if t in events.TOPICS]
+    if not topics:
+        return JsonResponse({"topics": f"Допустимі значення: {', '.join(events.TOPICS)}"}, status=400)
+
+    department = params.get("department") or None
+    if department and department not in ("sales", "service"):
+        return JsonResponse({"department": "Допустимі значення: sales, service"}, status=400)
+
+    dates = {}
+    for name in ("date_from", "date_to"):
+        value = params.get(name)
+        dates[name] = parse_date(value) if value else None
+        if value and not dates[name]:
+            return JsonResponse({name: "Очікується дата у форматі YYYY-MM-DD"}, status=400)
+
+    subscription = events.Subscription(topics, department, **dates)
+    replay = events.broker.subscribe(
+        subscription,
+        request.headers.get("Last-Event-ID") or params.get("last_event_id"),
+    )
+
+    response = StreamingHttpResponse(_event_stream(subscription, replay), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
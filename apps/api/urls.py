@@ -1,9 +1,11 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import (
     ClientViewSet, VehicleViewSet, ServiceViewSet,
     JournalRecordViewSet, UserCreateViewSet,
-    AppointmentViewSet,
+    AppointmentViewSet, StatsViewSet, SearchViewSet,
 )
+from .stream import change_stream
 
 router = DefaultRouter()
 
@@ -13,5 +15,10 @@ router.register('services', ServiceViewSet)
 router.register('journals', JournalRecordViewSet)
 router.register('users', UserCreateViewSet)
 router.register('appointments', AppointmentViewSet, basename='appointments')
+router.register('stats', StatsViewSet, basename='stats')
+router.register('search', SearchViewSet, basename='search')
+
+urlpatterns = router.urls + [
+    path('events/', change_stream, name='change-stream'),
+]
 
-urlpatterns = router.urls
@@ -1,3 +1,7 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
@@ -6,11 +10,23 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 # Форматируем дату и время для дополнения (локальное время)
+from django.db import transaction
+from django.db.models import Count, F, Q, prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 import pytz
 
-from apps.models import Client, Vehicle, Service, JournalRecord, Appointment
+from apps import counters, events, occupancy, refdata, stats, suggest
+from apps.models import ChangeMarker, Client, Vehicle, VehicleBrand, VehicleModel, Service, JournalRecord, Appointment
+from apps.normalize import FULL_PHONE_LENGTH, catalog_key, normalize_phone
 from apps.accounts.models import User
+from .bulk import bulk_create_journal_records, MAX_BULK_RECORDS
+from .mixins import SparseFieldsViewSetMixin, ConditionalGetMixin, ReferenceCacheListMixin
+from .pagination import (
+    CursorPaginationMixin, JournalCursorPagination, AppointmentCursorPagination,
+    ClientJournalPagination, FreeVehicleCursorPagination,
+)
 from .serializers import (
     ClientSerializer, VehicleSerializer,
     ServiceSerializer, JournalRecordSerializer, UserSerializer,
@@ -18,10 +34,100 @@ from .serializers import (
 )
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+def _local_date_param(request, name):
+    """?name=YYYY-MM-DD -> початок дня за Києвом (aware datetime) або None."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if not parsed:
+        raise ValidationError({name: "Очікується дата у форматі YYYY-MM-DD"})
+    return timezone.make_aware(datetime.combine(parsed, time.min), pytz.timezone('Europe/Kiev'))
+
+
+def _int_param(request, name):
+    value = request.query_params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Очікується ціле число"})
+
+
+class ClientViewSet(ConditionalGetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all().prefetch_related('vehicles')
     serializer_class = ClientSerializer
     permission_classes = [IsAuthenticated]
+    conditional_models = (Client, Vehicle)
+
+    FIND_LIMIT = 10
+    FIND_MAX_LIMIT = 50
+    FIND_COUNT_CAP = 1000
+    OVERVIEW_APPOINTMENTS = 10
+    OVERVIEW_MAX_APPOINTMENTS = 50
+
+    # ?ordering= для списку — лише за полями з індексами (лічильники — денормалізовані)
+    ORDERINGS = {
+        "name": ("name", "id"),
+        "-last_visit_at": (F("last_visit_at").desc(nulls_last=True), F("id").desc()),
+        "-last_journal_at": (F("last_journal_at").desc(nulls_last=True), F("id").desc()),
+        "-visits_count": ("-visits_count", "-id"),
+        "-journals_count": ("-journals_count", "-id"),
+    }
+
+    # ------------------------------------
+    # СПИСОК: /clients/?ordering=&min_visits=&min_journals=&visited_from=&visited_to=&has_vehicles=
+    # ------------------------------------
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action != "list":
+            return qs
+
+        ordering = self.request.query_params.get("ordering")
+        if ordering:
+            if ordering not in self.ORDERINGS:
+                raise ValidationError({"ordering": f"Допустимі значення: {', '.join(self.ORDERINGS)}"})
+            qs = qs.order_by(*self.ORDERINGS[ordering])
+
+        min_visits = _int_param(self.request, "min_visits")
+        if min_visits is not None:
+            qs = qs.filter(visits_count__gte=min_visits)
+
+        min_journals = _int_param(self.request, "min_journals")
+        if min_journals is not None:
+            qs = qs.filter(journals_count__gte=min_journals)
+
+        visited_from = _local_date_param(self.request, "visited_from")
+        if visited_from:
+            qs = qs.filter(last_visit_at__gte=visited_from)
+
+        # visited_to включно: до початку наступного дня
+        visited_to = _local_date_param(self.request, "visited_to")
+        if visited_to:
+            qs = qs.filter(last_visit_at__lt=visited_to + timedelta(days=1))
+
+        has_vehicles = self.request.query_params.get("has_vehicles")
+        if has_vehicles in ("true", "false", "1", "0"):
+            qs = qs.filter(vehicles_count__gt=0) if has_vehicles in ("true", "1") else qs.filter(vehicles_count=0)
+
+        return qs
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="ordering", type=str, required=False,
+                description="name, -last_visit_at, -last_journal_at, -visits_count, -journals_count",
+            ),
+            OpenApiParameter(name="min_visits", type=int, required=False, description="Мінімум візитів"),
+            OpenApiParameter(name="min_journals", type=int, required=False, description="Мінімум записів журналу"),
+            OpenApiParameter(name="visited_from", type=str, required=False, description="Останній візит з (YYYY-MM-DD)"),
+            OpenApiParameter(name="visited_to", type=str, required=False, description="Останній візит по (YYYY-MM-DD, включно)"),
+            OpenApiParameter(name="has_vehicles", type=bool, required=False, description="Є / немає авто"),
+        ]
+    )
+    def list(self, *args, **kwargs):
+        return super().list(*args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         """Переопределяем create для обработки привязки машин"""
@@ -49,7 +155,12 @@ class ClientViewSet(viewsets.ModelViewSet):
         
         # Привязываем машины к клиенту
         if vehicle_ids:
-            Vehicle.objects.filter(id__in=vehicle_ids).update(client=client)
+            vehicles = Vehicle.objects.filter(id__in=vehicle_ids)
+            previous_owners = set(vehicles.values_list("client_id", flat=True))
+            vehicles.update(client=client, updated_at=timezone.now())
+            # update() не шле сигналів — лічильники авто і маркер ETag оновлюємо явно
+            ChangeMarker.touch(Vehicle)
+            counters.refresh(previous_owners | {client.pk})
         
         # Перезагружаем клиента с обновленными данными о машинах через queryset
         client = self.get_queryset().get(pk=client.pk)
@@ -85,7 +196,9 @@ class ClientViewSet(viewsets.ModelViewSet):
         # Привязываем новые машины к клиенту (только те, которые не имеют владельца)
         if vehicle_ids:
             free_vehicles = Vehicle.objects.filter(id__in=vehicle_ids, client__isnull=True)
-            free_vehicles.update(client=client)
+            if free_vehicles.update(client=client, updated_at=timezone.now()):
+                ChangeMarker.touch(Vehicle)
+                counters.refresh({client.pk})
         
         # Перезагружаем клиента с обновленными данными о машинах через queryset
         client = self.get_queryset().get(pk=client.pk)
@@ -103,6 +216,7 @@ class ClientViewSet(viewsets.ModelViewSet):
         parameters=[
             OpenApiParameter(name="q", type=str, required=True),
             OpenApiParameter(name="phone", type=str, required=False),
+            OpenApiParameter(name="limit", type=int, required=False, description="Кількість результатів (до 50)"),
         ]
     )
     @action(detail=False, methods=['get'], url_path='find-by-name')
@@ -113,22 +227,33 @@ class ClientViewSet(viewsets.ModelViewSet):
         if not q:
             raise ValidationError({"error": "Потрібно передати параметр ?q="})
 
-        clients = Client.objects.filter(name__icontains=q)
+        try:
+            limit = min(max(int(request.query_params.get("limit", self.FIND_LIMIT)), 1), self.FIND_MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({"limit": "Очікується ціле число"})
+
+        # Нечіткий пошук (trigram, кирилиця/латиниця): лише top-N за схожістю
+        # і обмежений підрахунок замість двох повних count()
+        clients = self.get_queryset().fuzzy_name(q)
+        top = list(clients[:limit])
+        total = clients.order_by()[:self.FIND_COUNT_CAP].count() if len(top) == limit else len(top)
 
         # Если нашли несколько
-        if clients.count() > 1:
+        if len(top) > 1:
             return Response({
                 "exists": True,
                 "multiple": True,
-                "results": ClientSerializer(clients, many=True).data
+                "total": total,
+                "total_is_estimate": total >= self.FIND_COUNT_CAP,
+                "results": ClientSerializer(top, many=True).data
             })
 
         # Если нашли одного
-        if clients.count() == 1:
+        if top:
             return Response({
                 "exists": True,
                 "multiple": False,
-                "client": ClientSerializer(clients.first()).data
+                "client": ClientSerializer(top[0]).data
             })
 
         # ---- НЕ НАЙДЕНО → пробуем создать ----
@@ -148,8 +273,9 @@ class ClientViewSet(viewsets.ModelViewSet):
     @extend_schema(
         summary="Автопошук клієнта за телефоном (з можливим створенням)",
         parameters=[
-            OpenApiParameter(name="q", type=str, required=True),
+            OpenApiParameter(name="q", type=str, required=True, description="Повний номер або щонайменше 4 останні цифри"),
             OpenApiParameter(name="name", type=str, required=False),
+            OpenApiParameter(name="limit", type=int, required=False, description="Кількість результатів (до 50)"),
         ]
     )
     @action(detail=False, methods=['get'], url_path='find-by-phone')
@@ -160,27 +286,39 @@ class ClientViewSet(viewsets.ModelViewSet):
         if not q:
             raise ValidationError({"error": "Потрібно передати параметр ?q="})
 
-        clients = Client.objects.filter(phone__icontains=q)
+        try:
+            limit = min(max(int(request.query_params.get("limit", self.FIND_LIMIT)), 1), self.FIND_MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({"limit": "Очікується ціле число"})
+
+        # phone_normalized: точний збіг або збіг за закінченням номера, обидва по індексу;
+        # один запит на limit + 1 рядок замість двох count()
+        top = list(self.get_queryset().phone_lookup(q)[:limit + 1])
 
-        if clients.count() > 1:
+        if len(top) > 1:
             return Response({
                 "exists": True,
                 "multiple": True,
-                "results": ClientSerializer(clients, many=True).data
+                "truncated": len(top) > limit,
+                "results": ClientSerializer(top[:limit], many=True).data
             })
 
-        if clients.count() == 1:
+        if top:
             return Response({
                 "exists": True,
                 "multiple": False,
-                "client": ClientSerializer(clients.first()).data
+                "client": ClientSerializer(top[0]).data
             })
 
-        # ---- НЕ НАЙДЕНО → создание ----
+        # ---- НЕ НАЙДЕНО → создание (лише з повного номера, не з його закінчення) ----
         if not name:
             raise ValidationError({
                 "error": "Клієнта не знайдено. Для створення потрібно передати ?name="
             })
+        if len(normalize_phone(q)) < FULL_PHONE_LENGTH:
+            raise ValidationError({
+                "q": "Клієнта не знайдено. Для створення потрібен повний номер телефону"
+            })
 
         client = Client.objects.create(name=name, phone=q)
 
@@ -190,126 +328,226 @@ class ClientViewSet(viewsets.ModelViewSet):
             "client": ClientSerializer(client).data
         })
 
+    @extend_schema(
+        summary="Картка клієнта: авто, історія журналу, записи на сервіс і лічильники",
+        parameters=[
+            OpenApiParameter(name="journals_page_size", type=int, required=False, description="Записів журналу на сторінку (до 100)"),
+            OpenApiParameter(name="journals_cursor", type=str, required=False, description="Курсор сторінки журналу (journals.next)"),
+            OpenApiParameter(name="appointments_limit", type=int, required=False, description="Скільки найближчих і минулих записів на сервіс (до 50)"),
+        ]
+    )
+    @action(detail=True, methods=["get"])
+    def overview(self, request, pk=None):
+        # Фіксована кількість запитів, незалежно від довжини історії:
+        # клієнт (з лічильниками), авто, лічильники записів, сторінка журналу (+2 prefetch),
+        # найближчі й минулі записи (+2 prefetch на обидва списки разом)
+        try:
+            limit = min(
+                max(int(request.query_params.get("appointments_limit", self.OVERVIEW_APPOINTMENTS)), 1),
+                self.OVERVIEW_MAX_APPOINTMENTS,
+            )
+        except ValueError:
+            raise ValidationError({"appointments_limit": "Очікується ціле число"})
+
+        client = self.get_object()
+
+        # --- Записи на сервіс (як і в календарі — з fallback на власника авто) ---
+        vehicle_ids = [vehicle.id for vehicle in client.vehicles.all()]
+        now = timezone.now()
+        appointments = AppointmentViewSet.queryset.for_client(client.pk, vehicle_ids)
+        appointment_counts = appointments.aggregate(
+            total=Count("id"),
+            upcoming=Count("id", filter=Q(start_time__gte=now)),
+        )
+        appointments = appointments.prefetch_related(None)
+        upcoming = list(appointments.filter(start_time__gte=now).order_by("start_time", "id")[:limit])
+        past = list(appointments.filter(start_time__lt=now).order_by("-start_time", "-id")[:limit])
+        prefetch_related_objects(upcoming + past, "users", "services")
+
+        # --- Журнал: keyset-сторінки по індексу (client, -date, -id) ---
+        paginator = ClientJournalPagination()
+        journal_page = paginator.paginate_queryset(
+            JournalRecordViewSet.queryset.filter(client_id=client.pk), request, view=self,
+        )
+
+        return Response({
+            "client": ClientSerializer(client).data,
+            "counts": {
+                "vehicles": len(vehicle_ids),
+                "journals": client.journals_count,
+                "visits": client.visits_count,
+                "appointments": appointment_counts["total"],
+                "upcoming_appointments": appointment_counts["upcoming"],
+            },
+            "journals": {
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": JournalRecordSerializer(journal_page, many=True).data,
+            },
+            "appointments": {
+                "upcoming": AppointmentSerializer(upcoming, many=True).data,
+                "past": AppointmentSerializer(past, many=True).data,
+            },
+        })
+
 
 
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(ConditionalGetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Vehicle.objects.all().select_related('client')
     serializer_class = VehicleSerializer
     permission_classes = [IsAuthenticated]
+    conditional_models = (Vehicle, Client)
+
+    # ------------------------------------
+    # СПИСОК: /vehicles/?brand=<id>&model=<id> (id з довідника, див. facets)
+    # ------------------------------------
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action != "list":
+            return qs
+
+        brand_id = _int_param(self.request, "brand")
+        if brand_id is not None:
+            qs = qs.filter(brand_ref_id=brand_id)
+
+        model_id = _int_param(self.request, "model")
+        if model_id is not None:
+            qs = qs.filter(model_ref_id=model_id)
+
+        return qs
 
     @extend_schema(
-        summary="Отримати машини без власника",
-        responses=VehicleSerializer(many=True),
+        parameters=[
+            OpenApiParameter(name="brand", type=int, required=False, description="id марки з довідника"),
+            OpenApiParameter(name="model", type=int, required=False, description="id моделі з довідника"),
+        ]
     )
-    @action(detail=False, methods=["GET"])
-    def free(self, request):
-        """Возвращает список машин без владельца"""
-        free_vehicles = Vehicle.objects.filter(client__isnull=True)
-        return Response(VehicleSerializer(free_vehicles, many=True).data)
+    def list(self, *args, **kwargs):
+        return super().list(*args, **kwargs)
 
-    # ============================================================
-    # 1) АВТОПОИСК ПО НОМЕРУ
-    # ============================================================
     @extend_schema(
-        summary="Автопошук авто за номером",
+        summary="Фасети: марки та моделі з кількістю авто",
         parameters=[
-            OpenApiParameter(
-                name="plate_number",
-                type=str,
-                required=True,
-                location=OpenApiParameter.QUERY,
-                description="Номер автомобіля (повний або частковий)"
-            )
+            OpenApiParameter(name="q", type=str, required=False, description="Фільтр марок за назвою (будь-якою розкладкою)"),
+            OpenApiParameter(name="brand", type=int, required=False, description="id марки — повернути її моделі"),
         ],
-        responses=VehicleSerializer(many=True),
     )
     @action(detail=False, methods=["GET"])
-    def auto_find_by_number(self, request):
-        number = request.query_params.get('plate_number')
-        if not number:
-            return Response({"error": "Параметр plate_number є обов'язковим"}, status=400)
-
-        vehicles = Vehicle.objects.filter(plate_number__icontains=number)
-
-        return Response({
-            "count": vehicles.count(),
-            "results": VehicleSerializer(vehicles, many=True).data
-        })
+    def facets(self, request):
+        # Лише таблиці довідника: кількості зберігаються в vehicles_count (apps.catalog)
+        brands = VehicleBrand.objects.filter(vehicles_count__gt=0)
+        q = catalog_key(request.query_params.get("q", ""))
+        if q:
+            brands = brands.filter(key__contains=q)
+
+        response = {
+            "brands": list(brands.order_by("-vehicles_count", "name").values("id", "name", count=F("vehicles_count"))),
+        }
+
+        brand_id = _int_param(request, "brand")
+        if brand_id is not None:
+            response["models"] = list(
+                VehicleModel.objects.filter(brand_id=brand_id, vehicles_count__gt=0)
+                .order_by("-vehicles_count", "name")
+                .values("id", "name", count=F("vehicles_count"))
+            )
+        return Response(response)
 
-    # ============================================================
-    # 2) АВТОПОИСК ПО БРЕНДУ
-    # ============================================================
     @extend_schema(
-        summary="Автопошук авто за брендом",
+        summary="Отримати машини без власника",
+        description=(
+            "Cursor-пагінація за номером (next / previous / results), по 50 на сторінку.\n"
+            "q — кожне слово має бути частиною номера, марки або моделі."
+        ),
         parameters=[
-            OpenApiParameter(
-                name="brand",
-                type=str,
-                required=True,
-                location=OpenApiParameter.QUERY,
-                description="Бренд авто"
-            )
+            OpenApiParameter("q", str, OpenApiParameter.QUERY, description="Пошук за номером, маркою, моделлю"),
+            OpenApiParameter("page_size", int, OpenApiParameter.QUERY, description="Розмір сторінки (до 200)"),
         ],
         responses=VehicleSerializer(many=True),
     )
-    @action(detail=False, methods=["GET"])
-    def auto_find_by_brand(self, request):
-        brand = request.query_params.get('brand')
-        if not brand:
-            return Response({"error": "Параметр brand є обов'язковим"}, status=400)
-
-        vehicles = Vehicle.objects.filter(brand__icontains=brand)
-
-        return Response({
-            "count": vehicles.count(),
-            "results": VehicleSerializer(vehicles, many=True).data
-        })
+    @action(detail=False, methods=["GET"], pagination_class=FreeVehicleCursorPagination)
+    def free(self, request):
+        """Возвращает список машин без владельца (частичный индекс vehicle_free_plate_idx)"""
+        free_vehicles = Vehicle.objects.filter(client__isnull=True)
+        q = request.query_params.get("q", "").strip()
+        if q:
+            free_vehicles = free_vehicles.matching(q)
+        page = self.paginate_queryset(free_vehicles)
+        return self.get_paginated_response(VehicleSerializer(page, many=True).data)
 
     # ============================================================
-    # 3) АВТОПОИСК ПО МОДЕЛИ
+    # 1) ПОИСК АВТО (номер, марка, модель, владелец)
     # ============================================================
+    SEARCH_LIMIT = 20
+    SEARCH_MAX_LIMIT = 50
+    # дальше offset не листаем: нужно уточнить запрос
+    SEARCH_MAX_RESULTS = 200
+    SEARCH_PARAMS = ("plate", "brand", "model", "owner", "q")
+
     @extend_schema(
-        summary="Автопошук авто за моделлю",
+        summary="Пошук авто за номером, маркою, моделлю, власником",
+        description=(
+            "Будь-яка комбінація параметрів (умови через AND), один запит по індексах: номер — "
+            "по канонічній формі (розкладка, пробіли й дефіси не мають значення), марка / модель — "
+            "через довідник, власник — за ім'ям або телефоном. Збіги з початку номера — першими.\n"
+            "Без COUNT: повертає не більше limit записів, прапорець truncated і next_offset "
+            f"(null, якщо далі нічого або досягнуто межі {SEARCH_MAX_RESULTS} результатів)."
+        ),
         parameters=[
-            OpenApiParameter(
-                name="model",
-                type=str,
-                required=True,
-                location=OpenApiParameter.QUERY,
-                description="Модель авто"
-            )
+            OpenApiParameter("plate", str, OpenApiParameter.QUERY, description="Номер (повний або частковий)"),
+            OpenApiParameter("brand", str, OpenApiParameter.QUERY, description="Марка (частина назви)"),
+            OpenApiParameter("model", str, OpenApiParameter.QUERY, description="Модель (частина назви)"),
+            OpenApiParameter("owner", str, OpenApiParameter.QUERY, description="Ім'я або телефон власника"),
+            OpenApiParameter("q", str, OpenApiParameter.QUERY, description="Слова по номеру, марці, моделі"),
+            OpenApiParameter("limit", int, OpenApiParameter.QUERY, description=f"До {SEARCH_MAX_LIMIT}, за замовчуванням {SEARCH_LIMIT}"),
+            OpenApiParameter("offset", int, OpenApiParameter.QUERY, description="Зсув (next_offset попередньої відповіді)"),
         ],
-        responses=VehicleSerializer(many=True),
+        responses={200: OpenApiResponse(description="{results: [vehicle], truncated, next_offset}")},
     )
     @action(detail=False, methods=["GET"])
-    def auto_find_by_model(self, request):
-        model = request.query_params.get('model')
-        if not model:
-            return Response({"error": "Параметр model є обов'язковим"}, status=400)
+    def search(self, request):
+        params = {name: request.query_params.get(name, "") for name in self.SEARCH_PARAMS}
+        if not any(value.strip() for value in params.values()):
+            return Response(
+                {"error": f"Потрібен хоча б один параметр: {', '.join(self.SEARCH_PARAMS)}"},
+                status=400,
+            )
+
+        limit = min(max(_int_param(request, "limit") or self.SEARCH_LIMIT, 1), self.SEARCH_MAX_LIMIT)
+        offset = max(_int_param(request, "offset") or 0, 0)
+        if offset >= self.SEARCH_MAX_RESULTS:
+            raise ValidationError({"offset": f"Не більше {self.SEARCH_MAX_RESULTS - 1}, уточніть пошук"})
+        limit = min(limit, self.SEARCH_MAX_RESULTS - offset)
 
-        vehicles = Vehicle.objects.filter(model__icontains=model)
+        # limit + 1 рядок замість COUNT: чи є що-небудь далі
+        vehicles = list(Vehicle.objects.search(**params).select_related("client")[offset:offset + limit + 1])
+        truncated = len(vehicles) > limit
+        vehicles = vehicles[:limit]
+        next_offset = offset + limit if truncated and offset + limit < self.SEARCH_MAX_RESULTS else None
 
         return Response({
-            "count": vehicles.count(),
-            "results": VehicleSerializer(vehicles, many=True).data
+            "results": VehicleSerializer(vehicles, many=True).data,
+            "truncated": truncated,
+            "next_offset": next_offset,
         })
 
     # ============================================================
-    # 4) ПЕРЕОПРЕДЕЛЕННЫЙ create()
+    # 2) ПЕРЕОПРЕДЕЛЕННЫЙ create()
     # ============================================================
     @extend_schema(
         summary="Створення авто (з автоперевіркою існування)",
         description=(
-            "Якщо авто з таким номером вже існує — повертається існуючий запис.\n"
-            "Якщо авто не існує — необхідно вказати brand та model."
+            "Якщо у клієнта (або серед авто без клієнта) вже є авто з таким номером, маркою і моделлю "
+            "(номер — з точністю до пробілів і розкладки, марка/модель — без регістру) — "
+            "повертається існуючий запис зі статусом 200, інакше створюється новий (201).\n"
+            "Для створення необхідно вказати brand та model."
         ),
         request=VehicleSerializer,
-        responses=VehicleSerializer,
+        responses={200: VehicleSerializer, 201: VehicleSerializer},
     )
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
 
-        plate = data.get("plate_number", "").strip()
         brand = data.get("brand", "").strip()
         model = data.get("model", "").strip()
 
@@ -320,20 +558,17 @@ class VehicleViewSet(viewsets.ModelViewSet):
                 status=400
             )
 
-        # --- валидация: проверяем, существует ли машина с такими же номером, брендом и моделью одновременно
-        existing_vehicle = Vehicle.objects.filter(
-            plate_number__iexact=plate,
-            brand__iexact=brand,
-            model__iexact=model
-        ).first()
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
 
-        if existing_vehicle:
-            return Response(
-                {"error": "Машина з такими номером, брендом та моделлю вже існує"},
-                status=400
-            )
+        # --- один INSERT ... ON CONFLICT: паралельні запити не створять дубліката
+        vehicle = Vehicle(**serializer.validated_data)
+        created = Vehicle.objects.upsert([vehicle])[0]
 
-        return super().create(request, *args, **kwargs)
+        return Response(
+            self.get_serializer(vehicle).data,
+            status=201 if created else 200,
+        )
 
     def update(self, request, *args, **kwargs):
         """Переопределяем update для обработки редактирования машины и привязки к клиенту"""
@@ -378,44 +613,70 @@ class VehicleViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(ReferenceCacheListMixin, ConditionalGetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    conditional_models = (Service,)
+    reference_cache = refdata.services
 
 
-class JournalRecordViewSet(viewsets.ModelViewSet):
-    queryset = JournalRecord.objects.all()
+class JournalRecordViewSet(ConditionalGetMixin, SparseFieldsViewSetMixin, CursorPaginationMixin, viewsets.ModelViewSet):
+    # Сериализатор вкладывает client, vehicle, service и services — грузим их сразу,
+    # чтобы список выполнялся за фиксированное число запросов независимо от размера страницы
+    queryset = (
+        JournalRecord.objects
+        .select_related("client", "vehicle", "service")
+        .prefetch_related("services", "comment_entries")
+    )
     serializer_class = JournalRecordSerializer
     permission_classes = [IsAuthenticated]
+    cursor_pagination_class = JournalCursorPagination
+    # пошук упорядкований за релевантністю — лише посторінково
+    cursor_exclusive_params = ("q",)
+    conditional_models = (JournalRecord, Client, Vehicle, Service)
 
-    def get_header(self):
-        local_tz = pytz.timezone('Europe/Kiev')
-        now = timezone.now()
-        if timezone.is_aware(now):
-            local_now = now.astimezone(local_tz)
-        else:
-            local_now = local_tz.localize(now)
+    EXPORT_CHUNK_SIZE = 2000
+    EXPORT_COLUMNS = [
+        "id", "date", "department", "is_priority", "client", "phone",
+        "vehicle", "plate_number", "service", "services", "comment",
+    ]
 
-        username = self.request.user.username
-        date_str = local_now.strftime("%d.%m.%Y %H:%M")
-        header = f"[ADD][{username}][{date_str}]"
-        return header
+    def _date_param(self, name):
+        return _local_date_param(self.request, name)
 
     # ------------------------------------
-    # ФИЛЬТРАЦИЯ ДЛЯ /journal/?department=
+    # ФИЛЬТРАЦИЯ ДЛЯ /journal/?department=&q=&date_from=&date_to=&is_priority=
     # ------------------------------------
     def get_queryset(self):
         qs = super().get_queryset()
         department = self.request.query_params.get("department")
+        q = self.request.query_params.get("q", "").strip()
+        is_priority = self.request.query_params.get("is_priority")
+        date_from = self._date_param("date_from")
+        date_to = self._date_param("date_to")
 
         if department in ["sales", "service"]:
             qs = qs.filter(department=department)
 
+        if is_priority in ("true", "false", "1", "0"):
+            qs = qs.filter(is_priority=is_priority in ("true", "1"))
+
+        if date_from:
+            qs = qs.filter(date__gte=date_from)
+
+        # date_to включительно: до начала следующего дня
+        if date_to:
+            qs = qs.filter(date__lt=date_to + timedelta(days=1))
+
+        # Пошук: результати вже впорядковані за релевантністю
+        if q:
+            return qs.search(q)
+
         return qs.order_by("-date")
 
     # ---------------------------------------------------
-    # SWAGGER: добавить department в список параметров
+    # SWAGGER: добавить department и q в список параметров
     # ---------------------------------------------------
     @extend_schema(
         parameters=[
@@ -424,12 +685,93 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
                 type=str,
                 description="Фільтрація по відділу: sales або service",
                 required=False
-            )
+            ),
+            OpenApiParameter(
+                name="q",
+                type=str,
+                description="Пошук по коментарю, клієнту, телефону та номеру авто (за релевантністю)",
+                required=False
+            ),
+            OpenApiParameter(
+                name="pagination",
+                type=str,
+                description="cursor — keyset-пагінація (next/previous без count); з q ігнорується — "
+                            "результати пошуку завжди посторінкові (page), щоб зберегти порядок за релевантністю",
+                required=False
+            ),
+            OpenApiParameter(name="date_from", type=str, description="Дата з (YYYY-MM-DD)", required=False),
+            OpenApiParameter(name="date_to", type=str, description="Дата по (YYYY-MM-DD, включно)", required=False),
+            OpenApiParameter(name="is_priority", type=bool, description="Тільки пріоритетні / непріоритетні", required=False),
         ]
     )
     def list(self, *args, **kwargs):
         return super().list(*args, **kwargs)
 
+    # ---------------------------------------------------
+    # ЭКСПОРТ CSV / NDJSON (потоково, без пагинации)
+    # ---------------------------------------------------
+    def _export_rows(self, qs):
+        """Строки экспорта; server-side cursor, в памяти — только текущий chunk."""
+        local_tz = pytz.timezone('Europe/Kiev')
+        for record in qs.iterator(chunk_size=self.EXPORT_CHUNK_SIZE):
+            vehicle = record.vehicle
+            yield {
+                "id": record.id,
+                "date": record.date.astimezone(local_tz).isoformat(),
+                "department": record.department,
+                "is_priority": record.is_priority,
+                "client": record.client.name if record.client else "",
+                "phone": record.phone or "",
+                "vehicle": f"{vehicle.brand} {vehicle.model}" if vehicle else "",
+                "plate_number": vehicle.plate_number if vehicle else "",
+                "service": record.service.name if record.service else "",
+                "services": ", ".join(s.name for s in record.services.all()),
+                "comment": record.full_comment or "",
+            }
+
+    @extend_schema(
+        summary="Експорт журналу (CSV або NDJSON)",
+        description="Потокова вивантажка з фільтрами department, date_from, date_to, is_priority, q.",
+        parameters=[
+            OpenApiParameter(name="output", type=str, description="csv (за замовчуванням) або ndjson", required=False),
+            OpenApiParameter(name="department", type=str, required=False),
+            OpenApiParameter(name="date_from", type=str, required=False),
+            OpenApiParameter(name="date_to", type=str, required=False),
+            OpenApiParameter(name="is_priority", type=bool, required=False),
+        ],
+        responses={200: OpenApiResponse(description="Файл CSV / NDJSON")},
+    )
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        output = request.query_params.get("output", "csv")
+        if output not in ("csv", "ndjson"):
+            raise ValidationError({"output": "Допустимі значення: csv, ndjson"})
+
+        # Порядок по ключу индекса (-date, -id), без сортировки по relevance
+        qs = self.get_queryset().order_by("-date", "-id")
+        rows = self._export_rows(qs)
+        stamp = timezone.now().strftime("%Y%m%d_%H%M")
+
+        if output == "ndjson":
+            content = (json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            response = StreamingHttpResponse(content, content_type="application/x-ndjson; charset=utf-8")
+        else:
+            response = StreamingHttpResponse(self._csv_stream(rows), content_type="text/csv; charset=utf-8")
+
+        response["Content-Disposition"] = f'attachment; filename="journal_{stamp}.{output}"'
+        return response
+
+    def _csv_stream(self, rows):
+        class Echo:
+            def write(self, value):
+                return value
+
+        writer = csv.DictWriter(Echo(), fieldnames=self.EXPORT_COLUMNS)
+        # BOM — чтобы Excel правильно открыл кириллицу
+        yield "\ufeff" + writer.writeheader()
+        for row in rows:
+            yield writer.writerow(row)
+
     # ---------------------------------------------------
     # ПЕРЕОПРЕДЕЛЁННЫЙ create() С ТВОЕЙ ЛОГИКОЙ
     # ---------------------------------------------------
@@ -437,6 +779,7 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
         summary="Створення запису журналу з автопошуком",
         description="Автоматичний пошук/створення клієнта та авто при створенні запису."
     )
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         # Берём данные из запиту і акуратно працюємо з допоміжними полями
         data = request.data.copy()
@@ -467,15 +810,24 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
         # ---------------------------
         # 2. Автопошук клієнта (якщо client_id не знайшли)
         # ---------------------------
+        # Повний номер однозначно визначає клієнта — ім'я ("Петренко Іван" / "Іван Петренко")
+        # лише розрізняє кількох власників номера; частковий номер звужується ім'ям
+        full_phone = bool(phone) and len(normalize_phone(phone)) >= FULL_PHONE_LENGTH
+        phone_taken = False
         if not client and (name or phone):
             qs = Client.objects.all()
-            if name:
-                qs = qs.filter(name__icontains=name)
             if phone:
-                qs = qs.filter(phone__icontains=phone)
+                qs = qs.phone_lookup(phone)
+            if name and not full_phone:
+                qs = qs.filter(name__icontains=name)
+
+            matches = list(qs[:2])
+            phone_taken = full_phone and bool(matches)
+            if len(matches) > 1 and name and full_phone:
+                matches = list(qs.filter(name__icontains=name)[:2])
 
-            if qs.count() == 1:
-                client = qs.first()
+            if len(matches) == 1:
+                client = matches[0]
                 data["client_id"] = client.id
                 if not phone and client.phone:
                     data["phone"] = client.phone
@@ -501,7 +853,7 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
         # 4. Автопошук машини по номеру (якщо vehicle не знайшли)
         # ---------------------------
         if not vehicle and plate_number:
-            vqs = Vehicle.objects.filter(plate_number__icontains=plate_number)
+            vqs = Vehicle.objects.plate_search(plate_number)
 
             if vqs.count() == 1:
                 vehicle = vqs.first()
@@ -523,6 +875,18 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
                     {"error": "Для створення нового клієнта потрібно і name, і phone"},
                     status=400
                 )
+            # з частини номера клієнта не створюємо (як у find-by-phone)
+            if not full_phone:
+                return Response(
+                    {"error": "Для створення нового клієнта потрібен повний номер телефону"},
+                    status=400
+                )
+            # номер уже мають кілька клієнтів, і ім'я не вказало на одного — не дублюємо
+            if phone_taken:
+                return Response(
+                    {"error": "Цей номер мають кілька клієнтів — вкажіть client_id"},
+                    status=400
+                )
             client = Client.objects.create(name=name, phone=phone)
             data["client_id"] = client.id
 
@@ -540,12 +904,14 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
                     {"error": "Для створення нового авто потрібно brand і model"},
                     status=400
                 )
-            vehicle = Vehicle.objects.create(
+            # таке авто клієнта вже може бути (інший формат номера, паралельний запит)
+            vehicle = Vehicle(
                 plate_number=plate_number,
                 brand=brand,
                 model=model,
                 client=client
             )
+            Vehicle.objects.upsert([vehicle])
             data["vehicle_id"] = vehicle.id
 
         # ---------------------------
@@ -565,13 +931,12 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
         service_ids = [int(sid) for sid in service_ids if sid]
 
         # ---------------------------
-        # 7.5 Добавление header к комментарию при создании
+        # 7.5 Комментарий сохраняется первым дописом (с header [ADD][user][date])
         # ---------------------------
-        comment = data.get("comment", "").strip()
-        if comment:
-            header = self.get_header()
-
-            data["comment"] = f"{header}\n{comment}"
+        comment = (data.pop("comment", None) or "")
+        if isinstance(comment, list):
+            comment = comment[0] if comment else ""
+        comment = comment.strip()
 
         # ---------------------------
         # 8. Создание записи журнала
@@ -580,13 +945,44 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         journal_record = serializer.save()
 
+        if comment:
+            journal_record.append_comment(comment, request.user)
+
         # Привязываем множественные сервисы
         if service_ids:
-            services = Service.objects.filter(id__in=service_ids, is_active=True)
-            journal_record.services.set(services)
+            journal_record.services.set(refdata.active_service_ids(service_ids))
 
         return Response(self.get_serializer(journal_record).data, status=201)
 
+    # ---------------------------------------------------
+    # МАССОВОЕ СОЗДАНИЕ ЗАПИСЕЙ
+    # ---------------------------------------------------
+    @extend_schema(
+        summary="Масове створення записів журналу",
+        description=(
+            "Приймає {\"records\": [...]} (до 500 елементів, поля як у звичайному create). "
+            "Клієнти, авто та послуги шукаються пакетно, вставка — bulk_create в одній транзакції. "
+            "Повертає результат по кожному елементу."
+        ),
+        request=None,
+    )
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        items = request.data.get("records") if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({"records": "Потрібно передати непорожній список records"})
+        if len(items) > MAX_BULK_RECORDS:
+            raise ValidationError({"records": f"Не більше {MAX_BULK_RECORDS} записів за один запит"})
+
+        results = bulk_create_journal_records(items, request.user)
+        created = sum(1 for r in results if r["status"] == "created")
+
+        return Response({
+            "created": created,
+            "failed": len(results) - created,
+            "results": results,
+        }, status=201 if created else 400)
+
     # ---------------------------------------------------
     # ПЕРЕОПРЕДЕЛЁННЫЙ update() ДЛЯ ДОПОЛНЕНИЯ КОММЕНТАРИЯ
     # ---------------------------------------------------
@@ -607,20 +1003,13 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
                 status=400
             )
 
-        header = self.get_header()
-
-
-        # Если комментарий уже существует, добавляем новое дополнение
-        if instance.comment:
-            updated_comment = f"{instance.comment}\n\n{header}\n{new_comment}"
-        else:
-            updated_comment = f"{header}\n{new_comment}"
+        # Дополнение — отдельная строка в comment_entries (один INSERT),
+        # старый текст не перезаписывается, параллельные дополнения не теряются
+        instance.append_comment(new_comment, request.user)
+        # append_comment — UPDATE без post_save, событие публикуем сами
+        events.schedule(events.JOURNAL, events.UPDATED, [instance])
 
-        # Обновляем только комментарий
-        instance.comment = updated_comment
-        instance.save(update_fields=['comment'])
-
-        serializer = self.get_serializer(instance)
+        serializer = self.get_serializer(self.get_queryset().get(pk=instance.pk))
         return Response(serializer.data)
 
     def partial_update(self, request, *args, **kwargs):
@@ -639,14 +1028,87 @@ class JournalRecordViewSet(viewsets.ModelViewSet):
         # Инвертируем значение
         instance.is_priority = not instance.is_priority
         # Сохраняем только это поле для оптимизации
-        instance.save(update_fields=['is_priority'])
+        instance.save(update_fields=['is_priority', 'updated_at'])
 
         return Response(self.get_serializer(instance).data)
 
 
-class UserCreateViewSet(viewsets.ModelViewSet):
+class StatsViewSet(viewsets.ViewSet):
+    """
+    Статистика з денних агрегатів (DailyStat).
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Статистика журналу та записів на сервіс за період",
+        parameters=[
+            OpenApiParameter(name="date_from", type=str, description="Дата з (YYYY-MM-DD), за замовчуванням — 30 днів тому", required=False),
+            OpenApiParameter(name="date_to", type=str, description="Дата по (YYYY-MM-DD, включно), за замовчуванням — сьогодні", required=False),
+        ],
+        responses={200: OpenApiResponse(description="Кількість записів по відділах, послугах, пріоритету та статусах")},
+    )
+    def list(self, request):
+        today = timezone.now().astimezone(pytz.timezone('Europe/Kiev')).date()
+        dates = {}
+        for name, default in (("date_from", today - timedelta(days=30)), ("date_to", today)):
+            value = request.query_params.get(name)
+            dates[name] = parse_date(value) if value else default
+            if not dates[name]:
+                raise ValidationError({name: "Очікується дата у форматі YYYY-MM-DD"})
+
+        if dates["date_from"] > dates["date_to"]:
+            raise ValidationError({"date_from": "date_from не може бути пізніше date_to"})
+
+        return Response(stats.summary(dates["date_from"], dates["date_to"]))
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Єдиний typeahead по клієнтах (ім'я, телефон) і авто (номер).
+    """
+    permission_classes = [IsAuthenticated]
+
+    SUGGEST_LIMIT = 10
+    SUGGEST_MAX_LIMIT = 20
+
+    @extend_schema(
+        summary="Підказки для пошуку: клієнти та авто",
+        description=(
+            "Префіксний пошук по in-process індексу імен (кирилиця/латиниця), телефонів і номерів авто. "
+            "Повертає не більше limit результатів і прапорець truncated."
+        ),
+        parameters=[
+            OpenApiParameter(name="q", type=str, required=True),
+            OpenApiParameter(name="types", type=str, required=False, description="client,vehicle (за замовчуванням обидва)"),
+            OpenApiParameter(name="limit", type=int, required=False, description="До 20, за замовчуванням 10"),
+        ],
+        responses={200: OpenApiResponse(description="{results: [{type, id, ...}], truncated}")},
+    )
+    @action(detail=False, methods=["get"], url_path="suggest")
+    def suggest(self, request):
+        q = request.query_params.get("q", "").strip()
+        if not q:
+            return Response({"results": [], "truncated": False})
+
+        types = request.query_params.get("types")
+        kinds = tuple(t for t in types.split(",") if t in suggest.KINDS) if types else suggest.KINDS
+        if not kinds:
+            raise ValidationError({"types": f"Допустимі значення: {', '.join(suggest.KINDS)}"})
+
+        try:
+            limit = min(max(int(request.query_params.get("limit", self.SUGGEST_LIMIT)), 1), self.SUGGEST_MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({"limit": "Очікується ціле число"})
+
+        results, truncated = suggest.index.search(q, limit, kinds)
+        return Response({"results": results, "truncated": truncated})
+
+
+class UserCreateViewSet(ReferenceCacheListMixin, ConditionalGetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    conditional_models = (User,)
+    reference_cache = refdata.staff
 
     def get_queryset(self):
         # На календаре нужно выбирать всех пользователей кроме суперадминов.
@@ -660,13 +1122,20 @@ class UserCreateViewSet(viewsets.ModelViewSet):
         return [permissions.IsAdminUser()]
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(ConditionalGetMixin, SparseFieldsViewSetMixin, CursorPaginationMixin, viewsets.ModelViewSet):
     """
     Записи на сервіс (календар).
     """
-    queryset = Appointment.objects.select_related("client", "vehicle").prefetch_related("users", "services")
+    # vehicle__client нужен для fallback клиента в AppointmentSerializer.get_client
+    queryset = (
+        Appointment.objects
+        .select_related("client", "vehicle", "vehicle__client")
+        .prefetch_related("users", "services")
+    )
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    cursor_pagination_class = AppointmentCursorPagination
+    conditional_models = (Appointment, Client, Vehicle, Service, User)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -681,66 +1150,14 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             start_dt = parse_datetime(start)
             end_dt = parse_datetime(end)
             if start_dt and end_dt:
-                # Пересечение интервалов по времени
-                # [existing_start, existing_end) пересекается с [start_dt, end_dt)
-                from datetime import timedelta
-                # end_time считается как start_time + duration_minutes
-                qs = qs.filter(
-                    start_time__lt=end_dt,
-                    start_time__gte=start_dt - timedelta(days=1),  # лёгкий буфер
-                )
+                # [start_time, end_time) пересекается с [start_dt, end_dt) — по GiST-индексу
+                qs = qs.overlapping(start_dt, end_dt)
 
         return qs.order_by("start_time")
 
-    def perform_create(self, serializer):
-        """
-        При создании проверяем пересечения по времени для того же авто.
-        Если есть пересечения и не передан флаг force=true — возвращаем 400 с информацией.
-        """
-        from datetime import timedelta
-        data = serializer.validated_data
-        start_time = data["start_time"]
-        duration = data["duration_minutes"]
-
-        end_time = start_time + timedelta(minutes=duration)
-
-        request = self.request
-        force = str(request.data.get("force", "")).lower() in ("1", "true", "yes")
-
-        # После вызова create() client и vehicle мы подставляем в сериализаторе,
-        # поэтому для поиска конфликтов нужно отдельно получить объекты по id из request.data.
-        client_id = request.data.get("client_id")
-        vehicle_id = request.data.get("vehicle_id")
-
-        vehicle = None
-        if vehicle_id:
-            try:
-                vehicle = Vehicle.objects.get(pk=vehicle_id)
-            except Vehicle.DoesNotExist:
-                raise ValidationError({"vehicle_id": "Автомобиль не найден"})
-
-        # Фильтруем только по одному ресурсу (машина). Можно расширить и на клієнта/менеджера.
-        conflict_qs = Appointment.objects.all()
-        if vehicle:
-            conflict_qs = conflict_qs.filter(vehicle=vehicle)
-
-        # Условие пересечения интервалов
-        conflict_qs = conflict_qs.filter(
-            start_time__lt=end_time,
-            start_time__gt=start_time - timedelta(days=1),  # простой буфер
-        )
-
-        if conflict_qs.exists() and not force:
-            conflicts = AppointmentSerializer(conflict_qs, many=True).data
-            raise ValidationError({
-                "has_conflicts": True,
-                "conflicts": conflicts,
-                "message": "Существуют другие записи, которые пересекаются по времени. Всё равно создать эту запись?"
-            })
-
-        # Сотрудники (user/user2) задаются с фронта через user_ids.
-        serializer.save()
-
+    # Пересечения по авто и сотрудникам проверяет AppointmentSerializer (apps.booking):
+    # 409 с компактным списком конфликтов, force=true — сохранить всё равно
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -793,6 +1210,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if services.exists():
             journal_record.services.set(services)
 
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         previous_status = instance.status
@@ -810,6 +1228,72 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
 
+    # ------------------------------------
+    # ВІЛЬНІ ВІКНА /appointments/free-slots/?duration=&user_ids=&vehicle_id=&date_from=&date_to=
+    # ------------------------------------
+    FREE_SLOTS_LIMIT = 10
+    FREE_SLOTS_MAX_LIMIT = 100
+    FREE_SLOTS_DAYS = 7
+    FREE_SLOTS_MAX_DAYS = 31
+
+    @extend_schema(
+        summary="Найближчі вільні вікна для запису",
+        description=(
+            "Вікна по 15-хвилинній сітці в робочі години (08:00–21:00), не раніше поточного моменту. "
+            "Якщо передано user_ids — вільні мають бути всі вказані співробітники, інакше хоча б один "
+            "(у відповіді — хто саме). Рахується по бітових картах зайнятості в пам'яті (apps.occupancy)."
+        ),
+        parameters=[
+            OpenApiParameter(name="duration", type=int, required=True, description="Тривалість, хв"),
+            OpenApiParameter(name="user_ids", type=str, required=False, description="id співробітників через кому"),
+            OpenApiParameter(name="vehicle_id", type=int, required=False),
+            OpenApiParameter(name="date_from", type=str, required=False, description="YYYY-MM-DD, за замовчуванням — сьогодні"),
+            OpenApiParameter(name="date_to", type=str, required=False, description="YYYY-MM-DD, до 31 дня від date_from"),
+            OpenApiParameter(name="limit", type=int, required=False, description="Кількість вікон (до 100)"),
+        ],
+    )
+    @action(detail=False, methods=["get"], url_path="free-slots")
+    def free_slots(self, request):
+        duration = _int_param(request, "duration")
+        if not duration or duration <= 0:
+            raise ValidationError({"duration": "Потрібна тривалість у хвилинах"})
+
+        try:
+            user_ids = [int(part) for part in request.query_params.get("user_ids", "").split(",") if part.strip()]
+        except ValueError:
+            raise ValidationError({"user_ids": "Очікуються id через кому"})
+        if len(refdata.staff_ids(user_ids)) != len(user_ids):
+            raise ValidationError({"user_ids": "Один або кілька співробітників не знайдені."})
+
+        now = timezone.now()
+        date_from = _local_date_param(request, "date_from")
+        date_from = date_from.date() if date_from else stats.local_day(now)
+        date_to = _local_date_param(request, "date_to")
+        date_to = date_to.date() if date_to else date_from + timedelta(days=self.FREE_SLOTS_DAYS - 1)
+        if date_to < date_from or (date_to - date_from).days >= self.FREE_SLOTS_MAX_DAYS:
+            raise ValidationError({"date_to": f"Діапазон — від 1 до {self.FREE_SLOTS_MAX_DAYS} днів"})
+
+        limit = min(max(_int_param(request, "limit") or self.FREE_SLOTS_LIMIT, 1), self.FREE_SLOTS_MAX_LIMIT)
+
+        days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+        team = [user.pk for user in refdata.staff.snapshot().rows if user.is_active]
+        slots = occupancy.index.free_slots(
+            duration, days,
+            user_ids=user_ids,
+            vehicle_id=_int_param(request, "vehicle_id"),
+            team=team,
+            not_before=now,
+            limit=limit,
+        )
+        return Response({
+            "duration_minutes": duration,
+            "results": [
+                {"start_time": timezone.localtime(start), "end_time": timezone.localtime(end), "user_ids": free}
+                for start, end, free in slots
+            ],
+        })
+
+
 
 
 
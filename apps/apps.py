@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AppsConfig(AppConfig):
+    name = 'apps'
+    verbose_name = "Журнал"
+
+    def ready(self):
+        from . import signals  # noqa: F401
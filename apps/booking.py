@@ -0,0 +1,155 @@
+"""
+Конфлікти записів на сервіс: одне авто і один співробітник не можуть мати два
+записи, що перетинаються в часі.
+
+Гарантію дає PostgreSQL: exclusion-обмеження appointment_vehicle_no_overlap
+(vehicle =, tstzrange &&) на Appointment і appointment_user_no_overlap
+(user =, tstzrange &&) на AppointmentUser, куди sync_assignments копіює інтервал
+запису. Перевірка перед збереженням (reserve) потрібна лише для зрозумілої
+відповіді і прапорця force; гонку двох одночасних записів ловить guard(),
+перетворюючи порушення обмеження (SQLSTATE 23P01) на ту саму відповідь 409.
+
+Записи зі статусом "canceled" і збережені з force (allow_overlap) нікого не блокують.
+"""
+from contextlib import contextmanager
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from apps.models import Appointment, AppointmentUser
+
+
+EXCLUSION_VIOLATION = "23P01"
+MAX_CONFLICTS = 20  # у відповіді — лише перші; решта позначається truncated
+
+CONFLICT_MESSAGE = "Существуют другие записи, которые пересекаются по времени. Всё равно сохранить?"
+
+
+class BookingConflict(APIException):
+    """409 з компактним описом конфліктів (has_conflicts, message, conflicts, truncated)."""
+
+    status_code = 409
+    default_code = "conflict"
+
+    def __init__(self, conflicts, truncated=False):
+        # без перетворення в ErrorDetail — id і дати лишаються числами / датами
+        self.detail = {
+            "has_conflicts": True,
+            "message": CONFLICT_MESSAGE,
+            "conflicts": conflicts,
+            "truncated": truncated,
+        }
+
+
+# =========================================
+# ПОШУК КОНФЛІКТІВ
+# =========================================
+def find_conflicts(appointment, user_ids, limit=MAX_CONFLICTS):
+    """
+    Записи, що перетинаються з appointment за авто або за кимось із user_ids.
+    Два запити (записи по GiST-індексу + співробітники знайдених) незалежно від їх кількості.
+    Повертає (conflicts, truncated).
+    """
+    appointment.prepare_lookup_fields()
+    user_ids = list(user_ids or ())
+
+    resources = Q(vehicle_id=appointment.vehicle_id)
+    if user_ids:
+        resources |= Q(pk__in=AppointmentUser.objects.filter(user_id__in=user_ids).values("appointment"))
+
+    rows = list(
+        Appointment.objects
+        .overlapping(appointment.start_time, appointment.end_time)
+        .filter(resources)
+        .exclude(status__in=Appointment.RELEASED_STATUSES)
+        .exclude(pk=appointment.pk)
+        .order_by("start_time", "id")
+        .values("id", "start_time", "end_time", "status", "vehicle_id", "vehicle__plate_number")[:limit + 1]
+    )
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+
+    busy_users = {}
+    if user_ids and rows:
+        for appointment_id, user_id in AppointmentUser.objects.filter(
+            appointment_id__in=[row["id"] for row in rows], user_id__in=user_ids,
+        ).order_by("user_id").values_list("appointment_id", "user_id"):
+            busy_users.setdefault(appointment_id, []).append(user_id)
+
+    conflicts = []
+    for row in rows:
+        shared_users = busy_users.get(row["id"], [])
+        reasons = [
+            reason for reason, matched in (
+                ("vehicle", row["vehicle_id"] == appointment.vehicle_id),
+                ("users", bool(shared_users)),
+            ) if matched
+        ]
+        conflicts.append({
+            "id": row["id"],
+            "start_time": timezone.localtime(row["start_time"]).isoformat(),
+            "end_time": timezone.localtime(row["end_time"]).isoformat(),
+            "status": row["status"],
+            "vehicle": {"id": row["vehicle_id"], "plate_number": row["vehicle__plate_number"]},
+            "user_ids": shared_users,
+            "reasons": reasons,
+        })
+    return conflicts, truncated
+
+
+def reserve(appointment, user_ids, force=False):
+    """
+    Перевірка перед збереженням. Є конфлікти і немає force — BookingConflict;
+    з force запис зберігається з allow_overlap і не бере участі в обмеженнях.
+    """
+    if appointment.status in Appointment.RELEASED_STATUSES:
+        appointment.allow_overlap = False
+        return
+
+    conflicts, truncated = find_conflicts(appointment, user_ids)
+    if conflicts and not force:
+        raise BookingConflict(conflicts, truncated)
+    appointment.allow_overlap = bool(conflicts)
+
+
+@contextmanager
+def guard(appointment, user_ids):
+    """
+    Збереження запису і його співробітників у savepoint: якщо між reserve() і записом
+    інша транзакція зайняла той самий інтервал, обмеження відхилить запис — відповідаємо 409.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as exc:
+        if getattr(exc.__cause__, "pgcode", None) != EXCLUSION_VIOLATION:
+            raise
+        raise BookingConflict(*find_conflicts(appointment, user_ids)) from exc
+
+
+# =========================================
+# КОПІЯ ІНТЕРВАЛУ ДЛЯ СПІВРОБІТНИКІВ
+# =========================================
+def sync_assignments(appointment_ids):
+    """
+    Переносить start_time / end_time / blocking запису в його рядки AppointmentUser
+    одним UPDATE ... FROM. Викликається сигналами після збереження запису і додавання співробітників.
+    """
+    appointment_ids = [pk for pk in appointment_ids if pk]
+    if not appointment_ids:
+        return
+    assignments = connection.ops.quote_name(AppointmentUser._meta.db_table)
+    appointments = connection.ops.quote_name(Appointment._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {assignments} AS au "
+            f"SET start_time = a.start_time, end_time = a.end_time, "
+            f"blocking = (NOT a.allow_overlap AND a.status <> ALL(%s)) "
+            f"FROM {appointments} AS a "
+            f"WHERE a.id = au.appointment_id AND au.appointment_id = ANY(%s) "
+            f"AND (au.start_time, au.end_time, au.blocking) "
+            f"IS DISTINCT FROM (a.start_time, a.end_time, NOT a.allow_overlap AND a.status <> ALL(%s))",
+            [list(Appointment.RELEASED_STATUSES), appointment_ids, list(Appointment.RELEASED_STATUSES)],
+        )
@@ -0,0 +1,120 @@
+"""
+Довідник марок і моделей авто (VehicleBrand / VehicleModel).
+
+Vehicle.save() прив'язує авто до записів довідника (brand_ref / model_ref), а
+vehicles_count у довіднику оновлюється сигналами Vehicle в тій самій транзакції
+(count + delta). Фасети, фільтри й пошук за маркою/моделлю читають лише ці
+маленькі таблиці. rebuild() (команда rebuild_vehicle_catalog) прив'язує
+неприв'язані авто і перераховує лічильники з нуля.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.models import ChangeMarker, Vehicle, VehicleBrand, VehicleModel
+from apps.normalize import catalog_key
+
+
+STATE_FIELDS = ("brand_ref_id", "model_ref_id")
+
+
+# =========================================
+# ЛІЧИЛЬНИКИ
+# =========================================
+def state(instance, loaded_only=False):
+    """(brand_ref_id, model_ref_id); loaded_only — для post_init, без відкладених полів."""
+    if loaded_only:
+        if not instance.pk or any(field not in instance.__dict__ for field in STATE_FIELDS):
+            return None
+        return tuple(instance.__dict__[field] for field in STATE_FIELDS)
+    return tuple(getattr(instance, field) for field in STATE_FIELDS)
+
+
+def load_state(pk):
+    return Vehicle.objects.filter(pk=pk).values_list(*STATE_FIELDS).first()
+
+
+def changes(values):
+    """Counter{(модель довідника, id): 1} — внесок авто з таким станом."""
+    result = Counter()
+    if values:
+        brand_id, model_id = values
+        if brand_id:
+            result[(VehicleBrand, brand_id)] += 1
+        if model_id:
+            result[(VehicleModel, model_id)] += 1
+    return result
+
+
+def track(previous, current):
+    delta = changes(current)
+    delta.subtract(changes(previous))
+    apply(delta)
+
+
+def track_created(vehicles):
+    """Лічильники для авто, вставлених через bulk_create (сигналів немає)."""
+    delta = Counter()
+    for vehicle in vehicles:
+        delta.update(changes(state(vehicle)))
+    apply(delta)
+
+
+def apply(delta):
+    for (model, pk), value in delta.items():
+        if value:
+            model.objects.filter(pk=pk).update(vehicles_count=F("vehicles_count") + value)
+
+
+# =========================================
+# ПРИВ'ЯЗКА ПАКЕТОМ (bulk_create не викликає save())
+# =========================================
+def assign(vehicles):
+    """Заповнює brand_ref / model_ref, кожну пару марка+модель шукає в довіднику один раз."""
+    brands, models = {}, {}
+    for vehicle in vehicles:
+        brand_key = catalog_key(vehicle.brand)
+        if brand_key not in brands:
+            brands[brand_key] = VehicleBrand.resolve(vehicle.brand)
+        vehicle.brand_ref = brands[brand_key]
+
+        model_key = (brand_key, catalog_key(vehicle.model))
+        if model_key not in models:
+            models[model_key] = VehicleModel.resolve(vehicle.brand_ref, vehicle.model)
+        vehicle.model_ref = models[model_key]
+
+
+# =========================================
+# ПОВНА ПЕРЕБУДОВА
+# =========================================
+def rebuild(chunk_size=2000):
+    """
+    Прив'язує авто без brand_ref / model_ref (пакетами по id) і перераховує
+    vehicles_count довідника з таблиці авто. Повертає кількість прив'язаних авто.
+    """
+    assigned = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                Vehicle.objects.filter(Q(brand_ref__isnull=True) | Q(model_ref__isnull=True), id__gt=last_id)
+                .order_by("id")[:chunk_size]
+            )
+            if not chunk:
+                break
+            assign(chunk)
+            Vehicle.objects.bulk_update(chunk, ["brand_ref", "model_ref"])
+            ChangeMarker.touch(Vehicle)
+        assigned += sum(1 for vehicle in chunk if vehicle.brand_ref_id)
+        last_id = chunk[-1].id
+
+    for model in (VehicleBrand, VehicleModel):
+        field = "brand_ref" if model is VehicleBrand else "model_ref"
+        counts = (
+            Vehicle.objects.filter(**{field: OuterRef("pk")}).order_by()
+            .values(field).annotate(n=Count("id")).values("n")
+        )
+        model.objects.update(vehicles_count=Coalesce(Subquery(counts), 0))
+    return assigned
@@ -0,0 +1,194 @@
+"""
+Денормалізовані лічильники клієнта (Client.COUNTER_FIELDS).
+
+Оновлюються сигналами в тій самій транзакції, що й зміна авто / запису журналу /
+запису на сервіс: дельти лічильників і нові "останні" дати — одним
+UPDATE ... FROM (VALUES ...) (count + delta, GREATEST), а якщо дата прибрана
+чи змінена — MAX перераховується підзапитом по індексу (client, -date).
+Масові операції (bulk_create, QuerySet.update) викликають refresh() самі,
+розбіжності виправляє команда reconcile_client_counters (reconcile()).
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.models import Appointment, ChangeMarker, Client, JournalRecord, Vehicle
+
+
+# Візит — закритий запис на сервіс з виконаними роботами
+VISIT_STATUSES = ("done", "partially_done")
+
+COUNTS = ("vehicles_count", "journals_count", "visits_count")
+LATEST = ("last_journal_at", "last_visit_at")
+
+# Поля моделі, від яких залежить її внесок у лічильники (перше — клієнт)
+TRACKED_FIELDS = {
+    Vehicle: ("client_id",),
+    JournalRecord: ("client_id", "date"),
+    Appointment: ("client_id", "status", "start_time"),
+}
+
+
+# =========================================
+# СТАН ЗАПИСУ ТА ЙОГО ВНЕСОК
+# =========================================
+def state(instance, loaded_only=False):
+    """
+    Значення TRACKED_FIELDS. loaded_only — для post_init: не звертатися до
+    відкладених (only/defer) полів, тоді None (стан дочитає load_state).
+    """
+    fields = TRACKED_FIELDS[type(instance)]
+    if loaded_only:
+        if not instance.pk or any(field not in instance.__dict__ for field in fields):
+            return None
+        return tuple(instance.__dict__[field] for field in fields)
+    return tuple(getattr(instance, field) for field in fields)
+
+
+def load_state(model, pk):
+    return model.objects.filter(pk=pk).values_list(*TRACKED_FIELDS[model]).first()
+
+
+def contribution(model, values):
+    """Внесок запису: (Counter{(client_id, лічильник): 1}, {(client_id, поле дати): дата})."""
+    if not values or not values[0]:
+        return Counter(), {}
+    client_id = values[0]
+    if model is Vehicle:
+        return Counter({(client_id, "vehicles_count"): 1}), {}
+    if model is JournalRecord:
+        return Counter({(client_id, "journals_count"): 1}), {(client_id, "last_journal_at"): values[1]}
+    status, start_time = values[1:]
+    if status not in VISIT_STATUSES:
+        return Counter(), {}
+    return Counter({(client_id, "visits_count"): 1}), {(client_id, "last_visit_at"): start_time}
+
+
+def track(model, previous, current):
+    """Застосовує різницю між станом запису до і після зміни (None — запису немає)."""
+    old_counts, old_dates = contribution(model, previous)
+    deltas, dates = contribution(model, current)
+    deltas.subtract(old_counts)
+
+    # дата прибрана або змінена — MAX перераховуємо; нова дата — досить GREATEST
+    stale = {key for key, value in old_dates.items() if dates.get(key) != value}
+    latest = {key: value for key, value in dates.items() if key not in stale and old_dates.get(key) != value}
+    apply(deltas, latest, stale)
+
+
+# =========================================
+# ЗАПИС У БАЗУ
+# =========================================
+def apply(deltas, latest=None, stale=()):
+    """
+    deltas — Counter{(client_id, лічильник): дельта}, latest — {(client_id, поле дати): дата}
+    (піднімається через GREATEST), stale — {(client_id, поле дати)} для перерахунку.
+    """
+    latest = latest or {}
+    rows = {}
+    for (client_id, field), delta in deltas.items():
+        if delta:
+            rows.setdefault(client_id, dict.fromkeys(COUNTS, 0))[field] = delta
+    for (client_id, field), value in latest.items():
+        rows.setdefault(client_id, dict.fromkeys(COUNTS, 0))[field] = value
+
+    now = timezone.now()
+    if rows or stale:
+        ChangeMarker.touch(Client)
+    if rows:
+        table = connection.ops.quote_name(Client._meta.db_table)
+        columns = COUNTS + LATEST
+        values = ", ".join(
+            ["(%s::bigint, " + ", ".join(["%s::integer"] * len(COUNTS) + ["%s::timestamptz"] * len(LATEST)) + ")"]
+            * len(rows)
+        )
+        params = [
+            value
+            for client_id, row in rows.items()
+            for value in (client_id, *(row.get(column) for column in columns))
+        ]
+        assignments = [f"{column} = c.{column} + v.{column}" for column in COUNTS]
+        assignments += [f"{column} = GREATEST(c.{column}, v.{column})" for column in LATEST]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS c SET {', '.join(assignments)}, updated_at = %s "
+                f"FROM (VALUES {values}) AS v(id, {', '.join(columns)}) WHERE c.id = v.id",
+                [now, *params],
+            )
+
+    by_field = {}
+    for client_id, field in stale:
+        by_field.setdefault(field, set()).add(client_id)
+    for field, client_ids in by_field.items():
+        Client.objects.filter(id__in=client_ids).update(updated_at=now, **computed((field,)))
+
+
+def computed(fields=Client.COUNTER_FIELDS):
+    """Вирази з фактичними значеннями лічильників (корельовані підзапити по FK-індексах)."""
+    def count(queryset):
+        return Coalesce(
+            Subquery(queryset.order_by().values("client").annotate(n=Count("id")).values("n")), 0,
+        )
+
+    journals = JournalRecord.objects.filter(client=OuterRef("pk"))
+    visits = Appointment.objects.filter(client=OuterRef("pk"), status__in=VISIT_STATUSES)
+    expressions = {
+        "vehicles_count": count(Vehicle.objects.filter(client=OuterRef("pk"))),
+        "journals_count": count(journals),
+        "last_journal_at": Subquery(journals.order_by("-date", "-id").values("date")[:1]),
+        "visits_count": count(visits),
+        "last_visit_at": Subquery(visits.order_by("-start_time").values("start_time")[:1]),
+    }
+    return {field: expressions[field] for field in fields}
+
+
+def refresh(client_ids):
+    """Перераховує всі лічильники вказаних клієнтів (після масових операцій)."""
+    client_ids = {client_id for client_id in client_ids if client_id}
+    if client_ids:
+        Client.objects.filter(id__in=client_ids).update(updated_at=timezone.now(), **computed())
+        ChangeMarker.touch(Client)
+
+
+# =========================================
+# ЗВІРКА
+# =========================================
+def reconcile(chunk_size=2000):
+    """
+    Звіряє лічильники всіх клієнтів з вихідними таблицями пакетами по id
+    (кожен пакет — окрема коротка транзакція), виправляє лише розбіжності.
+    Повертає (перевірено, виправлено).
+    """
+    checked = fixed = 0
+    last_id = 0
+    actual = {f"actual_{field}": expression for field, expression in computed().items()}
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                Client.objects.filter(id__gt=last_id).order_by("id")
+                .select_for_update(of=("self",))
+                .only("id", *Client.COUNTER_FIELDS)
+                .annotate(**actual)[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            drifted = []
+            for client in chunk:
+                values = {field: getattr(client, f"actual_{field}") for field in Client.COUNTER_FIELDS}
+                if any(getattr(client, field) != value for field, value in values.items()):
+                    for field, value in values.items():
+                        setattr(client, field, value)
+                    client.updated_at = timezone.now()
+                    drifted.append(client)
+            Client.objects.bulk_update(drifted, [*Client.COUNTER_FIELDS, "updated_at"])
+            if drifted:
+                ChangeMarker.touch(Client)
+
+        checked += len(chunk)
+        fixed += len(drifted)
+        last_id = chunk[-1].id
+    return checked, fixed
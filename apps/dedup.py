@@ -0,0 +1,256 @@
+"""
+Пошук і об'єднання дублікатів клієнтів.
+
+Пари-кандидати шукаються лише всередині блоків, а не всі з усіма:
+  * телефонний блок — однаковий phone_normalized (GROUP BY по індексу);
+  * іменний блок — sorted neighbourhood: клієнти впорядковані за name_search
+    (btree-індекс), кожен порівнюється з WINDOW попередніми за trigram-схожістю.
+Пари зводяться в кластери (union-find), злиття — пакетами set-based UPDATE
+з маппінгом old_id -> new_id (CASE WHEN) в одній транзакції на пакет.
+"""
+import re
+from collections import deque
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from apps import booking, counters, occupancy
+from apps.models import Appointment, ChangeMarker, Client, JournalRecord, Vehicle
+
+
+NAME_THRESHOLD = 0.75       # схожість імен без спільного телефону
+PHONE_NAME_THRESHOLD = 0.4  # при однаковому телефоні достатньо слабшої схожості
+WINDOW = 5
+MAX_PHONE_BLOCK = 50        # "загальні" номери (0000000000 тощо) не розбираємо попарно
+PLACEHOLDER_NAMES = {"", "—", "-"}
+
+
+# =========================================
+# СХОЖІСТЬ (як pg_trgm.similarity)
+# =========================================
+def trigrams(text):
+    result = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(a, b):
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+
+
+# =========================================
+# КЛАСТЕРИ
+# =========================================
+class _UnionFind:
+    """Union-find, що не зливає кластери з різними телефонами (через транзитивність)."""
+
+    def __init__(self):
+        self.parent = {}
+        self.phone = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b, phone_a="", phone_b=""):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        pa = self.phone.get(ra) or phone_a
+        pb = self.phone.get(rb) or phone_b
+        if pa and pb and pa != pb:
+            return
+        root, child = min(ra, rb), max(ra, rb)
+        self.parent[child] = root
+        self.phone[root] = pa or pb
+
+    def groups(self):
+        result = {}
+        for x in self.parent:
+            result.setdefault(self.find(x), []).append(x)
+        return [sorted(ids) for ids in result.values() if len(ids) > 1]
+
+
+def find_clusters(queryset=None, name_threshold=NAME_THRESHOLD, window=WINDOW):
+    """
+    Повертає (clusters, skipped_blocks): clusters — список {"keep": id, "merge": [id, ...]}.
+    queryset обмежує пошук (напр. вибрані в адмінці клієнти).
+    """
+    queryset = (queryset if queryset is not None else Client.objects.all()).order_by()
+    uf = _UnionFind()
+    phones_by_id = {}
+    skipped_blocks = 0
+
+    # --- 1. Телефонні блоки ---
+    phones = (
+        queryset.exclude(phone_normalized="")
+        .values("phone_normalized").annotate(n=Count("id")).filter(n__gt=1)
+        .values_list("phone_normalized", "n")
+    )
+    for phone, size in phones.iterator(chunk_size=2000):
+        if size > MAX_PHONE_BLOCK:
+            skipped_blocks += 1
+            continue
+        block = list(queryset.filter(phone_normalized=phone).values_list("id", "name", "name_search"))
+        phones_by_id.update((pk, phone) for pk, _, _ in block)
+        for (a, name_a, key_a), (b, name_b, key_b) in combinations(block, 2):
+            if (
+                name_a.strip() in PLACEHOLDER_NAMES or name_b.strip() in PLACEHOLDER_NAMES
+                or similarity(key_a, key_b) >= PHONE_NAME_THRESHOLD
+            ):
+                uf.union(a, b, phone, phone)
+
+    # --- 2. Іменні блоки: sorted neighbourhood по name_search ---
+    recent = deque(maxlen=window)
+    rows = queryset.exclude(name_search="").order_by("name_search", "id").values_list(
+        "id", "name_search", "phone_normalized",
+    )
+    for pk, key, phone in rows.iterator(chunk_size=5000):
+        for other_pk, other_key, other_phone in recent:
+            # різні телефони — різні люди, навіть з однаковим ім'ям
+            if phone and other_phone and phone != other_phone:
+                continue
+            if key == other_key or similarity(key, other_key) >= name_threshold:
+                uf.union(pk, other_pk, phone, other_phone)
+                phones_by_id.setdefault(pk, phone)
+                phones_by_id.setdefault(other_pk, other_phone)
+        recent.append((pk, key, phone))
+
+    clusters = []
+    for ids in uf.groups():
+        # зберігаємо найстарішого клієнта з телефоном (або просто найстарішого)
+        keep = min(ids, key=lambda pk: (not phones_by_id.get(pk), pk))
+        clusters.append({"keep": keep, "merge": [pk for pk in ids if pk != keep]})
+    return clusters, skipped_blocks
+
+
+# =========================================
+# ЗЛИТТЯ
+# =========================================
+def _remap_fk(model, field, mapping, **extra):
+    if not mapping:
+        return 0
+    whens = [When(**{f"{field}_id": old}, then=Value(new)) for old, new in mapping.items()]
+    # update() без сигналів — маркер ETag таблиці збільшуємо самі
+    ChangeMarker.touch(model)
+    return model.objects.filter(**{f"{field}_id__in": list(mapping)}).update(
+        **{f"{field}_id": Case(*whens, output_field=IntegerField())}, **extra,
+    )
+
+
+def _release_overlaps(vehicle_map, now):
+    """
+    Записи дублікатів авто, що після переносу перетнуться із записами авто, яке лишається
+    (або між собою), позначаються allow_overlap — як збережені з force. Інакше UPDATE
+    порушить appointment_vehicle_no_overlap і відкотить увесь пакет. Повертає їх кількість.
+    """
+    rows = (
+        Appointment.objects
+        .filter(vehicle_id__in=[*vehicle_map, *set(vehicle_map.values())], allow_overlap=False)
+        .exclude(status__in=Appointment.RELEASED_STATUSES)
+        .values_list("id", "vehicle_id", "start_time", "end_time")
+    )
+    by_target = {}
+    for pk, vehicle_id, start, end in rows:
+        by_target.setdefault(vehicle_map.get(vehicle_id, vehicle_id), []).append(
+            (vehicle_id in vehicle_map, start, end, pk)
+        )
+
+    released = []
+    for group in by_target.values():
+        kept = []
+        # записи авто, що лишається, — першими (між собою вони не перетинаються), далі перенесені за часом
+        for _, start, end, pk in sorted(group):
+            if any(start < kept_end and end > kept_start for kept_start, kept_end in kept):
+                released.append(pk)
+            else:
+                kept.append((start, end))
+
+    if released:
+        Appointment.objects.filter(id__in=released).update(allow_overlap=True, updated_at=now)
+        booking.sync_assignments(released)
+    return len(released)
+
+
+def merge_clusters(clusters):
+    """
+    Зливає кластери одним пакетом у транзакції. Повертає статистику.
+    Однакові авто (plate_key, brand, model) різних дублікатів теж зводяться в одне.
+    """
+    client_map = {dup: cluster["keep"] for cluster in clusters for dup in cluster["merge"]}
+    if not client_map:
+        return {"clients": 0, "vehicles": 0, "journals": 0, "appointments": 0, "overlaps": 0}
+
+    now = timezone.now()
+    with transaction.atomic():
+        all_ids = set(client_map) | set(client_map.values())
+        clients = Client.objects.select_for_update().in_bulk(all_ids)
+
+        # --- Авто: дублікати (канонічний номер, brand, model) у межах кластера ---
+        vehicle_map = {}
+        kept_vehicles = {}
+        for vehicle in Vehicle.objects.filter(client_id__in=all_ids).order_by("id"):
+            owner = client_map.get(vehicle.client_id, vehicle.client_id)
+            key = (owner, vehicle.plate_key, vehicle.brand.lower(), vehicle.model.lower())
+            if key in kept_vehicles:
+                vehicle_map[vehicle.id] = kept_vehicles[key]
+            else:
+                kept_vehicles[key] = vehicle.id
+
+        # для статистики: записи, що зачепить злиття (без подвійного рахунку vehicle+client)
+        touched = Q(client_id__in=list(client_map)) | Q(vehicle_id__in=list(vehicle_map))
+        journals = JournalRecord.objects.filter(touched).count()
+        appointments = Appointment.objects.filter(touched).count()
+
+        _remap_fk(JournalRecord, "vehicle", vehicle_map, updated_at=now)
+        overlaps = _release_overlaps(vehicle_map, now) if vehicle_map else 0
+        _remap_fk(Appointment, "vehicle", vehicle_map, updated_at=now)
+        Vehicle.objects.filter(id__in=list(vehicle_map)).delete()
+
+        # --- Клієнти ---
+        _remap_fk(Vehicle, "client", client_map, updated_at=now)
+        _remap_fk(JournalRecord, "client", client_map, updated_at=now)
+        _remap_fk(Appointment, "client", client_map, updated_at=now)
+
+        # Телефон дубліката переносимо, якщо у того, хто лишається, його немає
+        for cluster in clusters:
+            keep = clients.get(cluster["keep"])
+            if keep and not keep.phone:
+                phone = next((clients[pk].phone for pk in cluster["merge"] if pk in clients and clients[pk].phone), None)
+                if phone:
+                    keep.phone = phone
+                    keep.save(update_fields=["phone", "updated_at"])
+
+        # Посилань уже немає; post_delete оновить маркер ETag і typeahead-індекс
+        deleted = Client.objects.filter(id__in=list(client_map)).delete()[1].get(Client._meta.label, 0)
+
+        # У пошуковому документі журналу — ім'я/телефон клієнта
+        JournalRecord.objects.filter(client_id__in=set(client_map.values())).refresh_search_documents()
+
+        # FK переписані через update() — лічильники тих, хто лишився, рахуємо заново
+        counters.refresh(set(client_map.values()))
+        # записи переведені на інші авто без сигналів — карти зайнятості перечитаються
+        if vehicle_map:
+            transaction.on_commit(occupancy.index.reset)
+
+    return {
+        "clients": deleted, "vehicles": len(vehicle_map), "journals": journals,
+        "appointments": appointments, "overlaps": overlaps,
+    }
+
+
+def merge_all(clusters, batch_size=500):
+    """Зливає кластери пакетами по batch_size (кожен пакет — окрема транзакція)."""
+    totals = {"clients": 0, "vehicles": 0, "journals": 0, "appointments": 0, "overlaps": 0}
+    for start in range(0, len(clusters), batch_size):
+        for key, value in merge_clusters(clusters[start:start + batch_size]).items():
+            totals[key] += value
+    return totals
@@ -0,0 +1,208 @@
+"""
+Живий потік змін журналу та календаря.
+
+Брокер працює в межах одного процесу (одна ASGI-машина, без Redis/channels):
+сигнали моделей ставлять подію в transaction.on_commit, після коміту запис
+один раз серіалізується і розсилається в asyncio-черги підписників.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import uuid
+from collections import deque
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from apps.stats import local_day
+
+
+JOURNAL = "journal"
+APPOINTMENT = "appointment"
+TOPICS = (JOURNAL, APPOINTMENT)
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+# Маркер для підписника: події втрачено, список треба перезавантажити
+RESET = object()
+
+# topic -> функция(pks) -> {pk: dict}; регистрируются слоем API (apps/api/stream.py)
+RENDERERS = {}
+
+
+def renderer(topic):
+    def decorator(func):
+        RENDERERS[topic] = func
+        return func
+    return decorator
+
+
+# =========================================
+# ПОДПИСКА
+# =========================================
+class Subscription:
+    """Фильтр подписчика + очередь в его event loop."""
+
+    def __init__(self, topics=TOPICS, department=None, date_from=None, date_to=None, maxsize=500):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.topics = set(topics)
+        self.department = department
+        self.date_from = date_from
+        self.date_to = date_to
+
+    def _matches_key(self, department, day):
+        if self.department and department and department != self.department:
+            return False
+        if self.date_from and day < self.date_from:
+            return False
+        if self.date_to and day > self.date_to:
+            return False
+        return True
+
+    def matches(self, event):
+        # keys содержит и старое, и новое положение записи — подписчик узнаёт,
+        # что запись ушла из его диапазона
+        return event["topic"] in self.topics and any(
+            self._matches_key(department, day) for department, day in event["keys"]
+        )
+
+    def deliver(self, event):
+        """Вызывается в loop подписчика (call_soon_threadsafe)."""
+        if not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # медленный клиент: вместо неограниченного буфера — сброс
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+
+# =========================================
+# БРОКЕР
+# =========================================
+class Broker:
+    HISTORY_SIZE = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=self.HISTORY_SIZE)
+        self._counter = itertools.count(1)
+        self._last = 0
+        # id событий уникальны в рамках запуска процесса: после рестарта старый
+        # Last-Event-ID не совпадёт по префиксу и клиент получит reset
+        self.boot = uuid.uuid4().hex[:8]
+
+    def event_id(self, number):
+        return f"{self.boot}-{number}"
+
+    @property
+    def last_event_id(self):
+        return self.event_id(self._last)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, subscription, last_event_id=None):
+        """
+        Регистрирует подписчика. Возвращает события после Last-Event-ID, которые нужно дослать,
+        или None, если их уже нет в истории (нужен reset).
+        """
+        with self._lock:
+            self._subscribers.add(subscription)
+            if not last_event_id:
+                return []
+
+            boot, _, number = last_event_id.partition("-")
+            if boot != self.boot or not number.isdigit() or int(number) > self._last:
+                return None
+
+            number = int(number)
+            missed = [event for event in self._history if event["number"] > number]
+            if number < self._last and missed[0]["number"] != number + 1:
+                return None  # часть событий уже вытеснена из истории
+            if any(event["payload"] is None for event in missed):
+                return None
+            return [event for event in missed if subscription.matches(event)]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, topic, keys, payload):
+        """Потокобезопасно: вызывается из sync-потока после коммита."""
+        with self._lock:
+            self._last = next(self._counter)
+            event = {
+                "number": self._last,
+                "id": self.event_id(self._last),
+                "topic": topic,
+                "keys": keys,
+                "payload": payload,
+            }
+            self._history.append(event)
+            dead = []
+            for subscription in self._subscribers:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+                except RuntimeError:
+                    # цикл подписчика уже закрыт (воркер остановлен) — отписываем,
+                    # иначе одна мёртвая подписка обрывает рассылку остальным
+                    dead.append(subscription)
+            self._subscribers.difference_update(dead)
+
+
+broker = Broker()
+
+
+# =========================================
+# ПУБЛИКАЦИЯ ИЗ СИГНАЛОВ / VIEW
+# =========================================
+def event_keys(topic, instance):
+    """(department, day) для фильтрации подписок."""
+    if topic == JOURNAL:
+        return {(instance.department, local_day(instance.date))} if instance.date else set()
+    return {(None, local_day(instance.start_time))} if instance.start_time else set()
+
+
+def schedule(topic, action, instances, previous_keys=None):
+    """
+    Ставит события в очередь на момент коммита текущей транзакции.
+    Данные читаются из БД уже после коммита — в событие попадают и m2m,
+    и дописи, сохранённые в той же транзакции.
+    """
+    items = []
+    for instance in instances:
+        keys = event_keys(topic, instance)
+        if previous_keys:
+            keys |= previous_keys.get(instance.pk, set())
+        items.append((instance.pk, keys))
+
+    if items:
+        transaction.on_commit(lambda: _publish(topic, action, items))
+
+
+def _publish(topic, action, items):
+    if not broker.has_subscribers():
+        # Никто не слушает — не сериализуем; пустой payload при досылке означает reset
+        for pk, keys in items:
+            broker.publish(topic, keys, None)
+        return
+
+    rendered = {} if action == DELETED else RENDERERS[topic]([pk for pk, _ in items])
+
+    for pk, keys in items:
+        data = rendered.get(pk)
+        if action != DELETED and data is None:
+            continue  # уже удалена следующей транзакцией
+        payload = json.dumps(
+            {"action": action, "id": pk, "data": data},
+            cls=DjangoJSONEncoder, ensure_ascii=False,
+        )
+        broker.publish(topic, keys, payload)
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps import dedup
+
+
+class Command(BaseCommand):
+    help = (
+        "Шукає дублікати клієнтів (блоки: однаковий телефон, схожі імена) "
+        "і зливає їх: авто, журнал і записи на сервіс переносяться на клієнта, що лишається."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Лише показати знайдені кластери")
+        parser.add_argument("--threshold", type=float, default=dedup.NAME_THRESHOLD,
+                            help="Мінімальна trigram-схожість імен без спільного телефону (0..1)")
+        parser.add_argument("--window", type=int, default=dedup.WINDOW,
+                            help="Скільки сусідів за name_search порівнювати з кожним клієнтом")
+        parser.add_argument("--batch-size", type=int, default=500, help="Кластерів на одну транзакцію")
+
+    def handle(self, *args, dry_run=False, threshold=None, window=None, batch_size=None, **options):
+        if not 0 < threshold <= 1:
+            raise CommandError("--threshold: очікується число від 0 до 1")
+        if window < 1 or batch_size < 1:
+            raise CommandError("--window і --batch-size мають бути додатними")
+
+        clusters, skipped = dedup.find_clusters(name_threshold=threshold, window=window)
+        duplicates = sum(len(cluster["merge"]) for cluster in clusters)
+        self.stdout.write(f"Кластерів: {len(clusters)}, дублікатів: {duplicates}")
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Пропущено телефонних блоків понад {dedup.MAX_PHONE_BLOCK} клієнтів: {skipped}"
+            ))
+
+        if dry_run:
+            for cluster in clusters:
+                self.stdout.write(f"  {cluster['keep']} <- {', '.join(map(str, cluster['merge']))}")
+            return
+
+        totals = dedup.merge_all(clusters, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            "Готово: видалено клієнтів {clients}, авто {vehicles}; "
+            "перенесено записів журналу {journals}, записів на сервіс {appointments}".format(**totals)
+        ))
+        if totals["overlaps"]:
+            self.stdout.write(self.style.WARNING(
+                "Записів на сервіс, що після злиття авто перетинаються в часі "
+                "(позначені як дозволений перетин): {overlaps}".format(**totals)
+            ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps import stats
+
+
+class Command(BaseCommand):
+    help = "Перебудовує денну статистику (DailyStat) з журналу та записів на сервіс."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="Дата з (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", help="Дата по (YYYY-MM-DD, включно)")
+
+    def handle(self, *args, date_from=None, date_to=None, **options):
+        parsed = {}
+        for name, value in (("--from", date_from), ("--to", date_to)):
+            if value and not parse_date(value):
+                raise CommandError(f"{name}: очікується дата у форматі YYYY-MM-DD")
+            parsed[name] = parse_date(value) if value else None
+
+        count = stats.rebuild(parsed["--from"], parsed["--to"])
+        self.stdout.write(self.style.SUCCESS(f"Готово: {count} рядків статистики"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps import catalog
+
+
+class Command(BaseCommand):
+    help = "Прив'язує авто до довідника марок/моделей і перераховує кількість авто в довіднику."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Авто на одну транзакцію")
+
+    def handle(self, *args, chunk_size=2000, **options):
+        if chunk_size < 1:
+            raise CommandError("--chunk-size має бути додатним")
+
+        assigned = catalog.rebuild(chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f"Готово: прив'язано авто {assigned}, лічильники довідника перераховано"))
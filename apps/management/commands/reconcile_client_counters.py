@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps import counters
+
+
+class Command(BaseCommand):
+    help = "Звіряє лічильники клієнтів (авто, журнал, візити) з вихідними таблицями і виправляє розбіжності."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Клієнтів на одну транзакцію")
+
+    def handle(self, *args, chunk_size=2000, **options):
+        if chunk_size < 1:
+            raise CommandError("--chunk-size має бути додатним")
+
+        checked, fixed = counters.reconcile(chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f"Готово: перевірено {checked} клієнтів, виправлено {fixed}"))
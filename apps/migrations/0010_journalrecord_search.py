@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-18 11:14
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+BACKFILL_SEARCH_DOCUMENT = r"""
+UPDATE apps_journalrecord AS j
+SET search_document = d.doc
+FROM (
+    SELECT
+        jr.id,
+        lower(btrim(regexp_replace(concat_ws(' ',
+            jr.comment, jr.phone,
+            c.name, c.phone,
+            v.brand, v.model, v.plate_number, replace(v.plate_number, ' ', ''),
+            nullif(regexp_replace(jr.phone, '\D', '', 'g'), ''),
+            nullif(regexp_replace(c.phone, '\D', '', 'g'), '')
+        ), '\s+', ' ', 'g'))) AS doc
+    FROM apps_journalrecord jr
+    LEFT JOIN apps_client c ON c.id = jr.client_id
+    LEFT JOIN apps_vehicle v ON v.id = jr.vehicle_id
+) AS d
+WHERE d.id = j.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0009_vehicle_unique_vehicle_per_client'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='journalrecord',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_DOCUMENT, migrations.RunSQL.noop),
+        migrations.AddField(
+            model_name='journalrecord',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('search_document', config='simple'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='journalrecord',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='journal_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='journalrecord',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='journal_search_doc_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 11:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0010_journalrecord_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['start_time', 'id'], name='appointment_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalrecord',
+            index=models.Index(fields=['department', '-date', '-id'], name='journal_dept_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalrecord',
+            index=models.Index(fields=['-date', '-id'], name='journal_date_idx'),
+        ),
+    ]
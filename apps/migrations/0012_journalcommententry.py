@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0011_journal_appointment_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalCommentEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author_name', models.CharField(blank=True, max_length=150)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+                ('text', models.TextField()),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_comment_entries', to=settings.AUTH_USER_MODEL)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_entries', to='apps.journalrecord')),
+            ],
+            options={
+                'verbose_name': 'Доповнення коментаря',
+                'verbose_name_plural': 'Доповнення коментарів',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['record', 'created_at', 'id'], name='journal_comment_record_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+POPULATE_DAILY_STATS = """
+INSERT INTO apps_dailystat (day, metric, key, count)
+SELECT (date AT TIME ZONE 'Europe/Kiev')::date, 'journal_department', department, count(*)
+FROM apps_journalrecord GROUP BY 1, 3
+UNION ALL
+SELECT (date AT TIME ZONE 'Europe/Kiev')::date, 'journal_priority', '', count(*)
+FROM apps_journalrecord WHERE is_priority GROUP BY 1
+UNION ALL
+SELECT (j.date AT TIME ZONE 'Europe/Kiev')::date, 'journal_service', s.service_id::text, count(*)
+FROM apps_journalrecord_services s JOIN apps_journalrecord j ON j.id = s.journalrecord_id GROUP BY 1, 3
+UNION ALL
+SELECT (start_time AT TIME ZONE 'Europe/Kiev')::date, 'appointment_status', status, count(*)
+FROM apps_appointment GROUP BY 1, 3
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0012_journalcommententry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('metric', models.CharField(choices=[('journal_department', 'Записи журналу по відділах'), ('journal_service', 'Записи журналу по послугах'), ('journal_priority', 'Пріоритетні записи журналу'), ('appointment_status', 'Записи на сервіс по статусах')], max_length=32)),
+                ('key', models.CharField(blank=True, default='', max_length=64)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Денна статистика',
+                'verbose_name_plural': 'Денна статистика',
+                'ordering': ['day', 'metric', 'key'],
+                'indexes': [models.Index(fields=['metric', 'day'], name='daily_stat_metric_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'metric', 'key'), name='unique_daily_stat')],
+            },
+        ),
+        migrations.RunSQL(POPULATE_DAILY_STATS, migrations.RunSQL.noop),
+    ]
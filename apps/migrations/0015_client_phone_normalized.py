@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 11:32
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+from apps.normalize import normalize_phone
+
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_phone_normalized(apps, schema_editor):
+    """Пакетами по id: кожен пакет — окрема коротка транзакція (міграція не atomic)."""
+    Client = apps.get_model("apps", "Client")
+    last_id = 0
+    while True:
+        chunk = list(
+            Client.objects.filter(id__gt=last_id).order_by("id").only("id", "phone")[:BACKFILL_CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        for client in chunk:
+            client.phone_normalized = normalize_phone(client.phone)
+        Client.objects.bulk_update(chunk, ["phone_normalized"])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apps', '0014_changemarker_client_updated_at_and_more'),
+    ]
+
+    operations = [
+        # Індекси створюються після заповнення, щоб backfill не перебудовував їх на кожному UPDATE
+        migrations.AddField(
+            model_name='client',
+            name='phone_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_phone_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='client',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Reverse('phone_normalized'), name='text_pattern_ops'), name='client_phone_suffix_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 12:05
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from apps.normalize import name_search_key
+
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_name_search(apps, schema_editor):
+    """Пакетами по id: кожен пакет — окрема коротка транзакція (міграція не atomic)."""
+    Client = apps.get_model("apps", "Client")
+    last_id = 0
+    while True:
+        chunk = list(
+            Client.objects.filter(id__gt=last_id).order_by("id").only("id", "name")[:BACKFILL_CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        for client in chunk:
+            client.name_search = name_search_key(client.name)
+        Client.objects.bulk_update(chunk, ["name_search"])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apps', '0015_client_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='name_search',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_name_search, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_search'], name='client_name_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['name_search'], name='client_name_search_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0016_client_name_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journalrecord',
+            index=models.Index(fields=['client', '-date', '-id'], name='journal_client_date_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 6.0 on 2026-10-18 13:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+BACKFILL_CHUNK_SIZE = 2000
+VISIT_STATUSES = ("done", "partially_done")
+
+
+def backfill_client_counters(apps, schema_editor):
+    """Пакетами по id: кожен пакет — окрема коротка транзакція (міграція не atomic)."""
+    Client = apps.get_model("apps", "Client")
+    Vehicle = apps.get_model("apps", "Vehicle")
+    JournalRecord = apps.get_model("apps", "JournalRecord")
+    Appointment = apps.get_model("apps", "Appointment")
+
+    def count(queryset):
+        return Coalesce(Subquery(queryset.order_by().values("client").annotate(n=Count("id")).values("n")), 0)
+
+    journals = JournalRecord.objects.filter(client=OuterRef("pk"))
+    visits = Appointment.objects.filter(client=OuterRef("pk"), status__in=VISIT_STATUSES)
+    counters = {
+        "vehicles_count": count(Vehicle.objects.filter(client=OuterRef("pk"))),
+        "journals_count": count(journals),
+        "last_journal_at": Subquery(journals.order_by("-date", "-id").values("date")[:1]),
+        "visits_count": count(visits),
+        "last_visit_at": Subquery(visits.order_by("-start_time").values("start_time")[:1]),
+    }
+
+    last_id = 0
+    while True:
+        ids = list(Client.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:BACKFILL_CHUNK_SIZE])
+        if not ids:
+            break
+        Client.objects.filter(id__gte=ids[0], id__lte=ids[-1]).update(**counters)
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apps', '0017_journalrecord_journal_client_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='journals_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Записів журналу'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='last_journal_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Останній запис журналу'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='last_visit_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Останній візит'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='vehicles_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Авто'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='visits_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Візитів'),
+        ),
+        # Індекси — після заповнення, щоб backfill не перебудовував їх на кожному UPDATE
+        migrations.RunPython(backfill_client_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(models.OrderBy(models.F('last_visit_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='client_last_visit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(models.OrderBy(models.F('last_journal_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='client_last_journal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['-visits_count', '-id'], name='client_visits_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['-journals_count', '-id'], name='client_journals_count_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 14:20
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from apps.normalize import plate_key
+
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_plate_key(apps, schema_editor):
+    """Пакетами по id: кожен пакет — окрема коротка транзакція (міграція не atomic)."""
+    Vehicle = apps.get_model("apps", "Vehicle")
+    last_id = 0
+    while True:
+        chunk = list(
+            Vehicle.objects.filter(id__gt=last_id).order_by("id").only("id", "plate_number")[:BACKFILL_CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        for vehicle in chunk:
+            vehicle.plate_key = plate_key(vehicle.plate_number)
+        Vehicle.objects.bulk_update(chunk, ["plate_key"])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apps', '0018_client_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='plate_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_plate_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['plate_key'], name='vehicle_plate_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['plate_key'], name='vehicle_plate_key_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 6.0 on 2026-10-18 14:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.normalize import catalog_key
+
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_vehicle_catalog(apps, schema_editor):
+    """
+    Довідник — з різних пар (brand, model); далі авто пакетами по id
+    (кожен пакет — окрема коротка транзакція, міграція не atomic) і лічильники.
+    """
+    Vehicle = apps.get_model("apps", "Vehicle")
+    VehicleBrand = apps.get_model("apps", "VehicleBrand")
+    VehicleModel = apps.get_model("apps", "VehicleModel")
+
+    brands, models_by_key = {}, {}
+    pairs = Vehicle.objects.order_by().values_list("brand", "model").distinct()
+    for brand, model in pairs.iterator(chunk_size=BACKFILL_CHUNK_SIZE):
+        brand_key, model_key = catalog_key(brand), catalog_key(model)
+        if not brand_key:
+            continue
+        if brand_key not in brands:
+            brands[brand_key] = VehicleBrand.objects.get_or_create(key=brand_key, defaults={"name": brand.strip()})[0]
+        if model_key and (brand_key, model_key) not in models_by_key:
+            models_by_key[(brand_key, model_key)] = VehicleModel.objects.get_or_create(
+                brand=brands[brand_key], key=model_key, defaults={"name": model.strip()},
+            )[0]
+
+    last_id = 0
+    while True:
+        chunk = list(
+            Vehicle.objects.filter(id__gt=last_id).order_by("id").only("id", "brand", "model")[:BACKFILL_CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        for vehicle in chunk:
+            brand_key, model_key = catalog_key(vehicle.brand), catalog_key(vehicle.model)
+            vehicle.brand_ref = brands.get(brand_key)
+            vehicle.model_ref = models_by_key.get((brand_key, model_key))
+        Vehicle.objects.bulk_update(chunk, ["brand_ref", "model_ref"])
+        last_id = chunk[-1].id
+
+    for model, field in ((VehicleBrand, "brand_ref"), (VehicleModel, "model_ref")):
+        counts = (
+            Vehicle.objects.filter(**{field: OuterRef("pk")}).order_by()
+            .values(field).annotate(n=Count("id")).values("n")
+        )
+        model.objects.update(vehicles_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apps', '0019_vehicle_plate_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleBrand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(editable=False, max_length=100, unique=True)),
+                ('vehicles_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Авто')),
+            ],
+            options={
+                'verbose_name': 'Марка авто',
+                'verbose_name_plural': 'Марки авто',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='brand_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='vehicles', to='apps.vehiclebrand', verbose_name='Марка (довідник)'),
+        ),
+        migrations.CreateModel(
+            name='VehicleModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(editable=False, max_length=100)),
+                ('vehicles_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Авто')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='models', to='apps.vehiclebrand')),
+            ],
+            options={
+                'verbose_name': 'Модель авто',
+                'verbose_name_plural': 'Моделі авто',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='model_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='vehicles', to='apps.vehiclemodel', verbose_name='Модель (довідник)'),
+        ),
+        migrations.AddConstraint(
+            model_name='vehiclemodel',
+            constraint=models.UniqueConstraint(fields=('brand', 'key'), name='unique_vehicle_model_key'),
+        ),
+        migrations.RunPython(backfill_vehicle_catalog, migrations.RunPython.noop),
+    ]
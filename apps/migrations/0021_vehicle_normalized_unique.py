@@ -0,0 +1,80 @@
+# Generated by Django 6.0 on 2026-10-18 15:40
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models, transaction
+from django.db.models import Case, Count, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+MERGE_CHUNK_SIZE = 500
+
+
+def merge_normalized_duplicates(apps, schema_editor):
+    """
+    Старе обмеження порівнювало номер/марку/модель буквально, тож "ВС 7777 АК" і
+    "BC7777AK" одного клієнта могли існувати двічі. Лишаємо найстаріше авто:
+    записи журналу й записи на сервіс переводимо на нього, дублікати видаляємо,
+    лічильники клієнтів і довідника перераховуємо для зачеплених рядків.
+    Пакет злиття — окрема транзакція (міграція не atomic).
+    """
+    Vehicle = apps.get_model("apps", "Vehicle")
+    JournalRecord = apps.get_model("apps", "JournalRecord")
+    Appointment = apps.get_model("apps", "Appointment")
+    Client = apps.get_model("apps", "Client")
+    VehicleBrand = apps.get_model("apps", "VehicleBrand")
+    VehicleModel = apps.get_model("apps", "VehicleModel")
+
+    kept, mapping = {}, {}
+    client_ids, brand_ids, model_ids = set(), set(), set()
+    rows = Vehicle.objects.order_by("id").values_list("id", "plate_key", "brand", "model", "client_id", "brand_ref_id", "model_ref_id")
+    for pk, plate, brand, model, client_id, brand_id, model_id in rows.iterator(chunk_size=2000):
+        key = (plate, brand.lower(), model.lower(), client_id or 0)
+        if key in kept:
+            mapping[pk] = kept[key]
+            client_ids.add(client_id)
+            brand_ids.add(brand_id)
+            model_ids.add(model_id)
+        else:
+            kept[key] = pk
+    if not mapping:
+        return
+
+    items = list(mapping.items())
+    for start in range(0, len(items), MERGE_CHUNK_SIZE):
+        chunk = dict(items[start:start + MERGE_CHUNK_SIZE])
+        remapped = Case(*[When(vehicle_id=old, then=Value(new)) for old, new in chunk.items()], output_field=models.BigIntegerField())
+        with transaction.atomic(using=schema_editor.connection.alias):
+            JournalRecord.objects.filter(vehicle_id__in=list(chunk)).update(vehicle_id=remapped)
+            Appointment.objects.filter(vehicle_id__in=list(chunk)).update(vehicle_id=remapped)
+            Vehicle.objects.filter(id__in=list(chunk)).delete()
+
+    def count(field):
+        return Coalesce(Subquery(
+            Vehicle.objects.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("id")).values("n")
+        ), 0)
+
+    Client.objects.filter(id__in=client_ids - {None}).update(vehicles_count=count("client"))
+    VehicleBrand.objects.filter(id__in=brand_ids - {None}).update(vehicles_count=count("brand_ref"))
+    VehicleModel.objects.filter(id__in=model_ids - {None}).update(vehicles_count=count("model_ref"))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apps', '0020_vehicle_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_normalized_duplicates, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='vehicle',
+            name='unique_vehicle_per_client',
+        ),
+        migrations.AddConstraint(
+            model_name='vehicle',
+            constraint=models.UniqueConstraint(models.F('plate_key'), django.db.models.functions.text.Lower('brand'), django.db.models.functions.text.Lower('model'), django.db.models.functions.comparison.Coalesce('client', models.Value(0), output_field=models.BigIntegerField()), name='unique_vehicle_normalized'),
+        ),
+    ]
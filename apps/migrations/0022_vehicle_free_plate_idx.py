@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0021_vehicle_normalized_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(condition=models.Q(('client__isnull', True)), fields=['plate_key', 'id'], name='vehicle_free_plate_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 17:05
+
+from datetime import timedelta
+
+import apps.models
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_end_time(apps, schema_editor):
+    """Пакетами по id: кожен пакет — окрема коротка транзакція (міграція не atomic)."""
+    Appointment = apps.get_model("apps", "Appointment")
+    last_id = 0
+    while True:
+        chunk = list(
+            Appointment.objects.filter(id__gt=last_id).order_by("id")
+            .only("id", "start_time", "duration_minutes")[:BACKFILL_CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        for appointment in chunk:
+            appointment.end_time = appointment.start_time + timedelta(minutes=appointment.duration_minutes)
+        Appointment.objects.bulk_update(chunk, ["end_time"])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apps', '0022_vehicle_free_plate_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='end_time',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Кінець'),
+        ),
+        migrations.RunPython(backfill_end_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='end_time',
+            field=models.DateTimeField(editable=False, verbose_name='Кінець'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=django.contrib.postgres.indexes.GistIndex(apps.models.TsTzRange('start_time', 'end_time'), name='appointment_period_gist'),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 6.0 on 2026-10-18 18:20
+
+import apps.models
+import django.contrib.postgres.constraints
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models, transaction
+
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def _chunked_sql(schema_editor, sql, params=()):
+    """SQL з умовою "a.id > %s AND a.id <= %s" пакетами по id — кожен пакет окремою транзакцією."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM apps_appointment")
+        max_id = cursor.fetchone()[0]
+    for start in range(0, max_id, BACKFILL_CHUNK_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(sql, [*params, start, start + BACKFILL_CHUNK_SIZE])
+
+
+def grandfather_overlaps(apps, schema_editor):
+    """
+    Перетини, що вже є в базі, не дадуть створити обмеження. Старіший запис лишається
+    "звичайним", а кожен пізніший, що з ним перетинається (те саме авто або спільний
+    співробітник), позначається allow_overlap — ніби його збережено з force.
+    """
+    _chunked_sql(schema_editor, """
+        UPDATE apps_appointment AS a SET allow_overlap = true
+        WHERE a.id > %s AND a.id <= %s AND a.status <> 'canceled' AND EXISTS (
+            SELECT 1 FROM apps_appointment AS b
+            WHERE b.id < a.id AND b.status <> 'canceled'
+              AND tstzrange(b.start_time, b.end_time) && tstzrange(a.start_time, a.end_time)
+              AND (
+                  b.vehicle_id = a.vehicle_id
+                  OR EXISTS (
+                      SELECT 1 FROM apps_appointment_users AS ua
+                      JOIN apps_appointment_users AS ub ON ub.user_id = ua.user_id
+                      WHERE ua.appointment_id = a.id AND ub.appointment_id = b.id
+                  )
+              )
+        )
+    """)
+
+
+def backfill_assignments(apps, schema_editor):
+    """Копія інтервалу запису в рядки співробітників (як apps.booking.sync_assignments)."""
+    _chunked_sql(schema_editor, """
+        UPDATE apps_appointment_users AS au
+        SET start_time = a.start_time, end_time = a.end_time,
+            blocking = (NOT a.allow_overlap AND a.status <> 'canceled')
+        FROM apps_appointment AS a
+        WHERE a.id = au.appointment_id AND a.id > %s AND a.id <= %s
+    """)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apps', '0023_appointment_end_time'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='allow_overlap',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Дозволено перетин'),
+        ),
+        migrations.RunPython(grandfather_overlaps, migrations.RunPython.noop),
+        # таблиця apps_appointment_users уже є (автоматична M2M) — лише описуємо її моделлю
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='AppointmentUser',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='apps.appointment')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'verbose_name': 'Співробітник запису',
+                        'verbose_name_plural': 'Співробітники записів',
+                        'db_table': 'apps_appointment_users',
+                        'unique_together': {('appointment', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='appointment',
+                    name='users',
+                    field=models.ManyToManyField(blank=True, related_name='appointments_managed', through='apps.AppointmentUser', to=settings.AUTH_USER_MODEL, verbose_name='Сотрудники'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='appointmentuser',
+            name='start_time',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointmentuser',
+            name='end_time',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointmentuser',
+            name='blocking',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_assignments, migrations.RunPython.noop),
+        # "=" по vehicle_id / user_id в GiST-обмеженні
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('allow_overlap', False), models.Q(('status', 'canceled'), _negated=True)), expressions=[('vehicle', '='), (apps.models.TsTzRange('start_time', 'end_time'), '&&')], name='appointment_vehicle_no_overlap'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentuser',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('blocking', True)), expressions=[('user', '='), (apps.models.TsTzRange('start_time', 'end_time'), '&&')], name='appointment_user_no_overlap'),
+        ),
+    ]
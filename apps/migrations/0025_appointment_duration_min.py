@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 19:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0024_appointment_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(help_text='Тривалість візиту у хвилинах', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Тривалість, хв'),
+        ),
+    ]
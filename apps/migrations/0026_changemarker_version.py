@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 21:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0025_appointment_duration_min'),
+    ]
+
+    operations = [
+        # лічильник видалень стає лічильником усіх змін таблиці
+        migrations.RenameField(
+            model_name='changemarker',
+            old_name='deletions',
+            new_name='version',
+        ),
+    ]
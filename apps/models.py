@@ -1,26 +1,352 @@
+import re
+import threading
+from datetime import timedelta
+
+import pytz
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, SearchVectorField, TrigramWordSimilarity,
+)
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import connection, connections, models, transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import Case, F, Func, Q, Value, When
+from django.db.models.functions import Coalesce, Concat, Lower, Now, Reverse
+from django.db.models.signals import post_save
 
 from SkyltdJournal import settings
+from apps.normalize import FULL_PHONE_LENGTH, MIN_PHONE_SUFFIX, catalog_key, name_search_key, normalize_phone, plate_key
+
+
+class ClientQuerySet(models.QuerySet):
+
+    def fuzzy_name(self, q):
+        """
+        Нечіткий пошук за ім'ям по name_search (латиниця, див. apps.normalize).
+        Кандидати — через GIN trigram-індекс (%> або LIKE '%q%'), порядок — за схожістю.
+        Для 1–2 символів trigram не працює: тоді префікс по btree (varchar_pattern_ops).
+        """
+        key = name_search_key(q)
+        if not key:
+            return self.none()
+        if len(key) < 3:
+            return self.filter(name_search__startswith=key).order_by("name_search", "id")
+        return (
+            self.filter(Q(name_search__trigram_word_similar=key) | Q(name_search__contains=key))
+            .annotate(similarity=TrigramWordSimilarity(Value(key), "name_search"))
+            .order_by("-similarity", "name", "id")
+        )
+
+    def phone_lookup(self, phone):
+        """
+        Пошук за телефоном по phone_normalized.
+        Повний номер — точний збіг (btree), частковий — збіг за закінченням номера
+        через індекс на reverse(phone_normalized) (LIKE 'prefix%' по перевернутому рядку),
+        але не коротшим за MIN_PHONE_SUFFIX цифр.
+        """
+        digits = normalize_phone(phone)
+        if len(digits) < MIN_PHONE_SUFFIX:
+            return self.none()
+        if len(digits) >= FULL_PHONE_LENGTH:
+            return self.filter(phone_normalized=digits)
+        return self.alias(phone_reversed=Reverse("phone_normalized")).filter(
+            phone_reversed__startswith=digits[::-1],
+        )
 
 
 class Client(models.Model):
     name = models.CharField(max_length=255)
     phone = models.CharField(max_length=20, blank=True, null=True, db_index=True)
+    # Канонічні форми для пошуку, заповнюються в save() (bulk_create — через prepare_lookup_fields)
+    phone_normalized = models.CharField(max_length=20, blank=True, default="", editable=False, db_index=True)
+    name_search = models.CharField(max_length=255, blank=True, default="", editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Оновлено")
+
+    # Денормалізовані лічильники (apps.counters): оновлюються сигналами в тій самій транзакції,
+    # звіряються командою reconcile_client_counters
+    vehicles_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Авто")
+    journals_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Записів журналу")
+    last_journal_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Останній запис журналу")
+    visits_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Візитів")
+    last_visit_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Останній візит")
+
+    objects = ClientQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.name} ({self.phone})" if self.phone else self.name
 
+    LOOKUP_FIELDS = {"phone": "phone_normalized", "name": "name_search"}
+    COUNTER_FIELDS = ("vehicles_count", "journals_count", "last_journal_at", "visits_count", "last_visit_at")
+
+    def prepare_lookup_fields(self):
+        self.phone_normalized = normalize_phone(self.phone)
+        self.name_search = name_search_key(self.name)
+
+    def save(self, *args, **kwargs):
+        self.prepare_lookup_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields, *(target for source, target in self.LOOKUP_FIELDS.items() if source in update_fields)
+            }
+        elif not self._state.adding and not kwargs.get("force_insert"):
+            # Лічильники змінюються атомарними UPDATE з apps.counters — повний save()
+            # застарілого екземпляра не повинен їх перезаписати
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ["name"]
         verbose_name = "Клієнт"
         verbose_name_plural = "Клієнти"
+        indexes = [
+            # суфіксний пошук: reverse(phone_normalized) LIKE '7654321%'
+            models.Index(
+                OpClass(Reverse("phone_normalized"), name="text_pattern_ops"),
+                name="client_phone_suffix_idx",
+            ),
+            GinIndex(fields=["name_search"], name="client_name_search_trgm", opclasses=["gin_trgm_ops"]),
+            models.Index(fields=["name_search"], name="client_name_search_prefix_idx", opclasses=["varchar_pattern_ops"]),
+            # сортування списку клієнтів за лічильниками (NULL — в кінці)
+            models.Index(F("last_visit_at").desc(nulls_last=True), F("id").desc(), name="client_last_visit_idx"),
+            models.Index(F("last_journal_at").desc(nulls_last=True), F("id").desc(), name="client_last_journal_idx"),
+            models.Index(fields=["-visits_count", "-id"], name="client_visits_count_idx"),
+            models.Index(fields=["-journals_count", "-id"], name="client_journals_count_idx"),
+        ]
+
+
+class VehicleBrand(models.Model):
+    """Довідник марок: одна марка незалежно від регістру, розкладки й пробілів (catalog_key)."""
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True, editable=False)
+    # Кешована кількість авто (apps.catalog) — для фасетів і фільтрів без COUNT по Vehicle
+    vehicles_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Авто")
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name = "Марка авто"
+        verbose_name_plural = "Марки авто"
+
+    def __str__(self):
+        return self.name
+
+    # key -> запис: довідник малий і майже не змінюється, тож після першого звернення
+    # створення авто не читає його з бази. Кеш процесний (як suggest.index),
+    # скидається сигналом видалення (apps.signals)
+    _resolved = {}
+
+    @classmethod
+    def resolve(cls, name):
+        key = catalog_key(name)
+        if not key:
+            return None
+        brand = cls._resolved.get(key)
+        if brand is None:
+            brand = cls.objects.get_or_create(key=key, defaults={"name": name.strip()})[0]
+            # новий запис може ще відкотитися разом з транзакцією
+            transaction.on_commit(lambda: cls._resolved.setdefault(key, brand))
+        return brand
+
+
+class VehicleModel(models.Model):
+    """Довідник моделей у межах марки."""
+    brand = models.ForeignKey(VehicleBrand, on_delete=models.CASCADE, related_name="models")
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, editable=False)
+    vehicles_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Авто")
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name = "Модель авто"
+        verbose_name_plural = "Моделі авто"
+        constraints = [
+            models.UniqueConstraint(fields=["brand", "key"], name="unique_vehicle_model_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.brand} {self.name}"
+
+    # (brand_id, key) -> запис, як VehicleBrand._resolved
+    _resolved = {}
+
+    @classmethod
+    def resolve(cls, brand, name):
+        key = catalog_key(name)
+        if brand is None or not key:
+            return None
+        model = cls._resolved.get((brand.pk, key))
+        if model is None:
+            model = cls.objects.get_or_create(brand=brand, key=key, defaults={"name": name.strip()})[0]
+            transaction.on_commit(lambda: cls._resolved.setdefault((brand.pk, key), model))
+        return model
+
+
+class VehicleQuerySet(models.QuerySet):
+
+    # Ті самі вирази, що в unique_vehicle_normalized, — інакше PostgreSQL не підбере індекс
+    CONFLICT_TARGET = "(plate_key, LOWER(brand), LOWER(model), COALESCE(client_id, 0))"
+
+    def upsert(self, vehicles, send_signals=True):
+        """
+        Зберігає нові (ще без pk) авто одним INSERT ... ON CONFLICT по unique_vehicle_normalized:
+        якщо таке авто клієнта вже є (з точністю до нормалізації), береться наявний запис.
+        Перевірки й вставки окремо немає, тож паралельні запити не створять дубліката
+        і не впадуть з IntegrityError. Екземпляри заповнюються з бази (pk і поля);
+        повертає список created у тому ж порядку.
+        send_signals — post_save для створених (лічильники, довідник, typeahead), як save();
+        масові операції вимикають його й оновлюють усе пакетом самі.
+        """
+        vehicles = list(vehicles)
+        unique = {}
+        for vehicle in vehicles:
+            vehicle._prepare_related_fields_for_save(operation_name="upsert")
+            vehicle.prepare_lookup_fields()
+            unique.setdefault(
+                (vehicle.plate_key, vehicle.brand.lower(), vehicle.model.lower(), vehicle.client_id or 0), vehicle,
+            )
+        if not unique:
+            return []
+        for vehicle in unique.values():
+            vehicle.assign_catalog()
+
+        db_connection = connections[self.db]
+        quote = db_connection.ops.quote_name
+        opts = self.model._meta
+        fields = [field for field in opts.concrete_fields if not field.primary_key]
+        params = [
+            field.get_db_prep_save(field.pre_save(vehicle, add=True), db_connection)
+            for vehicle in unique.values()
+            for field in fields
+        ]
+        row = "(" + ", ".join(["%s"] * len(fields)) + ")"
+        # DO UPDATE, а не DO NOTHING: лише так RETURNING віддає і наявні рядки;
+        # xmax = 0 — рядок щойно вставлено
+        sql = (
+            f"INSERT INTO {quote(opts.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+            f"VALUES {', '.join([row] * len(unique))} "
+            f"ON CONFLICT {self.CONFLICT_TARGET} DO UPDATE SET plate_key = EXCLUDED.plate_key "
+            f"RETURNING {quote(opts.pk.column)}, "
+            f"{', '.join(quote(field.column) for field in fields)}, (xmax = 0)"
+        )
+        with db_connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            returned = cursor.fetchall()
+
+        # RETURNING повертає рядки в порядку VALUES
+        rows = dict(zip(unique, returned))
+        created = []
+        for vehicle in vehicles:
+            key = (vehicle.plate_key, vehicle.brand.lower(), vehicle.model.lower(), vehicle.client_id or 0)
+            pk, *values, inserted = rows[key]
+            inserted = inserted and unique[key] is vehicle
+            vehicle.pk = pk
+            for field, value in zip(fields, values):
+                if field.attname != field.name and getattr(vehicle, field.attname) != value:
+                    # інший запис (наявне авто) — прибираємо закешовані зв'язки
+                    vehicle._state.fields_cache.pop(field.name, None)
+                setattr(vehicle, field.attname, value)
+            vehicle._state.adding = False
+            vehicle._state.db = self.db
+            if inserted and send_signals:
+                post_save.send(
+                    sender=self.model, instance=vehicle, created=True, update_fields=None, raw=False, using=self.db,
+                )
+            created.append(inserted)
+        return created
+
+
+    def plate_lookup(self, plate):
+        """Точний збіг номера за канонічною формою (btree по plate_key)."""
+        return self.filter(plate_key=plate_key(plate))
+
+    def matching(self, q):
+        """
+        Кожне слово q — частина номера (plate_key), марки чи моделі: "bmw х5", "7777 audi".
+        Марка / модель шукаються в малому довіднику за catalog_key, авто — по brand_ref / model_ref.
+        """
+        condition = Q()
+        for term in q.split():
+            term_condition = Q()
+            if plate_key(term):
+                term_condition |= Q(plate_key__contains=plate_key(term))
+            key = catalog_key(term)
+            if key:
+                term_condition |= Q(brand_ref__in=VehicleBrand.objects.filter(key__contains=key))
+                term_condition |= Q(model_ref__in=VehicleModel.objects.filter(key__contains=key))
+            if not term_condition:
+                return self.none()
+            condition &= term_condition
+        return self.filter(condition)
+
+    def search(self, plate="", brand="", model="", owner="", q=""):
+        """
+        Пошук для вибору авто: будь-яка комбінація номера, марки, моделі, власника
+        (ім'я або телефон) і q (слова по номеру / марці / моделі, див. matching).
+        Усі умови — в одному запиті: номер по plate_key, марка / модель — через довідник,
+        власник — підзапит по індексах клієнта. Збіги з початку номера — першими.
+        """
+        queryset = self.matching(q) if q.strip() else self
+        key = plate_key(plate)
+        if plate.strip() and not key:
+            return self.none()
+
+        for value, dictionary, field in (
+            (brand, VehicleBrand.objects.all(), "brand_ref__in"),
+            (model, VehicleModel.objects.all(), "model_ref__in"),
+        ):
+            if value.strip():
+                catalog = catalog_key(value)
+                if not catalog:
+                    return self.none()
+                queryset = queryset.filter(**{field: dictionary.filter(key__contains=catalog)})
+
+        owner = owner.strip()
+        if owner:
+            # телефон — якщо запит з цифр і символів форматування (як у typeahead)
+            if len(re.sub(r"\D", "", owner)) >= MIN_PHONE_SUFFIX and not re.search(r"[^\d\s()+\-]", owner):
+                clients = Client.objects.phone_lookup(owner)
+            else:
+                clients = Client.objects.fuzzy_name(owner)
+            queryset = queryset.filter(client__in=clients.values("id"))
+
+        if not key:
+            return queryset.order_by("plate_key", "id")
+        queryset = queryset.filter(plate_key__startswith=key) if len(key) < 3 else queryset.filter(plate_key__contains=key)
+        return (
+            queryset.alias(prefix_rank=Case(When(plate_key__startswith=key, then=Value(0)), default=Value(1)))
+            .order_by("prefix_rank", "plate_key", "id")
+        )
+
+    def plate_search(self, q):
+        """
+        Пошук за номером по plate_key: "ВС 7777 АК", "bc7777ak" і "BC-7777-AK" однакові.
+        Початок номера — по btree (varchar_pattern_ops); від 3 символів ще й входження
+        всередині номера ("7777") через GIN trigram-індекс. Збіги з початку — першими.
+        """
+        return self.search(plate=q) if plate_key(q) else self.none()
 
 
 class Vehicle(models.Model):
     brand = models.CharField(max_length=100)
     model = models.CharField(max_length=100)
     plate_number = models.CharField(max_length=20)
+    # Канонічний номер для пошуку (apps.normalize.plate_key), заповнюється в save()
+    plate_key = models.CharField(max_length=20, blank=True, default="", editable=False)
+    # Записи довідника для brand / model (фасети, фільтри), заповнюються в save()
+    brand_ref = models.ForeignKey(
+        VehicleBrand, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+        related_name="vehicles", verbose_name="Марка (довідник)",
+    )
+    model_ref = models.ForeignKey(
+        VehicleModel, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+        related_name="vehicles", verbose_name="Модель (довідник)",
+    )
 
     client = models.ForeignKey(
         Client,
@@ -29,25 +355,66 @@ class Vehicle(models.Model):
         blank=True,
         related_name="vehicles"
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Оновлено")
+
+    objects = VehicleQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.brand} {self.model} — {self.plate_number}"
 
+    LOOKUP_FIELDS = {"plate_number": "plate_key", "brand": "brand_ref", "model": "model_ref"}
+
+    def prepare_lookup_fields(self):
+        self.plate_key = plate_key(self.plate_number)
+
+    def assign_catalog(self):
+        """Прив'язує brand_ref / model_ref до довідника (створює записи за потреби)."""
+        if self.brand_ref is None or self.brand_ref.key != catalog_key(self.brand):
+            self.brand_ref = VehicleBrand.resolve(self.brand)
+        if self.model_ref is None or self.model_ref.brand_id != self.brand_ref_id or self.model_ref.key != catalog_key(self.model):
+            self.model_ref = VehicleModel.resolve(self.brand_ref, self.model)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        self.prepare_lookup_fields()
+        if update_fields is None or {"brand", "model"} & set(update_fields):
+            self.assign_catalog()
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields, *(target for source, target in self.LOOKUP_FIELDS.items() if source in update_fields)
+            }
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ["brand", "model"]
         verbose_name = "Автомобіль"
         verbose_name_plural = "Автомобілі"
         constraints = [
+            # Одне авто на клієнта з точністю до нормалізації номера і регістру марки/моделі;
+            # ціль ON CONFLICT у VehicleQuerySet.upsert (CONFLICT_TARGET) — ті самі вирази.
+            # Авто без клієнта теж унікальні (COALESCE замість NULL)
             models.UniqueConstraint(
-                fields=["plate_number", "brand", "model", "client"],
-                name="unique_vehicle_per_client"
-            )
+                F("plate_key"), Lower("brand"), Lower("model"),
+                Coalesce("client", Value(0), output_field=models.BigIntegerField()),
+                name="unique_vehicle_normalized",
+            ),
+        ]
+        indexes = [
+            # точний збіг і LIKE 'BC77%'
+            models.Index(fields=["plate_key"], name="vehicle_plate_key_idx", opclasses=["varchar_pattern_ops"]),
+            # входження всередині номера: LIKE '%7777%'
+            GinIndex(fields=["plate_key"], name="vehicle_plate_key_trgm", opclasses=["gin_trgm_ops"]),
+            # авто без власника (/api/vehicles/free/): лише вони в індексі, порядок сторінок — (plate_key, id)
+            models.Index(
+                fields=["plate_key", "id"], name="vehicle_free_plate_idx", condition=Q(client__isnull=True),
+            ),
         ]
 
 
 class Service(models.Model):
     name = models.CharField(max_length=255, unique=True)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Оновлено")
 
     def __str__(self):
         return self.name
@@ -58,6 +425,55 @@ class Service(models.Model):
         verbose_name_plural = "Послуги"
 
 
+class JournalRecordQuerySet(models.QuerySet):
+
+    def search(self, q):
+        """
+        Повнотекстовий пошук по журналу (коментар, клієнт, телефон, авто).
+        Кожне слово шукається як префікс у tsvector, а весь рядок — як підрядок
+        через trigram-індекс. Результат відсортований за релевантністю.
+        """
+        terms = [re.sub(r"[^\w]", "", term) for term in q.lower().split()]
+        terms = [term for term in terms if term]
+        if not terms:
+            return self.none()
+
+        query = SearchQuery(
+            " & ".join(f"{term}:*" for term in terms),
+            search_type="raw",
+            config="simple",
+        )
+        needle = " ".join(q.lower().split())
+
+        return (
+            self.filter(Q(search_vector=query) | Q(search_document__contains=needle))
+            .annotate(
+                rank=SearchRank(F("search_vector"), query)
+                + TrigramWordSimilarity(needle, "search_document")
+            )
+            .order_by("-rank", "-date")
+        )
+
+    def refresh_search_documents(self, batch_size=1000):
+        """Перераховує search_document для записів (після зміни клієнта чи авто)."""
+        batch = []
+        qs = self.select_related("client", "vehicle").only(
+            "id", "comment", "phone",
+            "client__name", "client__phone",
+            "vehicle__brand", "vehicle__model", "vehicle__plate_number",
+        ).prefetch_related(
+            models.Prefetch("comment_entries", JournalCommentEntry.objects.only("id", "record_id", "text"))
+        )
+        for record in qs.iterator(chunk_size=batch_size):
+            record.search_document = record.build_search_document()
+            batch.append(record)
+            if len(batch) >= batch_size:
+                JournalRecord.objects.bulk_update(batch, ["search_document"])
+                batch = []
+        if batch:
+            JournalRecord.objects.bulk_update(batch, ["search_document"])
+
+
 class JournalRecord(models.Model):
 
     DEPARTMENT_CHOICES = (
@@ -113,18 +529,166 @@ class JournalRecord(models.Model):
     )
 
     comment = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Оновлено")
+
+    # Денормалізований текст для пошуку: коментар, клієнт, телефон, авто (lowercase)
+    search_document = models.TextField(blank=True, default="", editable=False)
+    search_vector = models.GeneratedField(
+        expression=SearchVector("search_document", config="simple"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = JournalRecordQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.get_department_display()} — {self.date}"
 
+    # Поля, від яких залежить search_document
+    SEARCH_FIELDS = {"comment", "phone", "client", "client_id", "vehicle", "vehicle_id"}
+
+    def build_search_document(self):
+        client = self.client if self.client_id else None
+        vehicle = self.vehicle if self.vehicle_id else None
+
+        parts = [self.comment, self.phone]
+        if self.pk:
+            parts += [entry.text for entry in self.comment_entries.all()]
+        phones = [self.phone]
+        if client:
+            parts += [client.name, client.phone]
+            phones.append(client.phone)
+        if vehicle:
+            plate = vehicle.plate_number or ""
+            parts += [vehicle.brand, vehicle.model, plate, plate.replace(" ", "")]
+        # Телефон ще й цифрами, щоб "067..." знаходило "+38 (067) ..."
+        parts += [re.sub(r"\D", "", phone) for phone in phones if phone]
+
+        return " ".join(" ".join(p.split()) for p in parts if p).lower()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            self.search_document = self.build_search_document()
+        elif self.SEARCH_FIELDS & set(update_fields):
+            self.search_document = self.build_search_document()
+            kwargs["update_fields"] = {*update_fields, "search_document"}
+        super().save(*args, **kwargs)
+
+    def append_comment(self, text, user=None):
+        """
+        Дописує коментар окремим рядком (один INSERT), без перезапису всього тексту.
+        search_document доповнюється атомарно в БД, тож паралельні дописи не губляться.
+        """
+        entry = JournalCommentEntry.objects.create(
+            record=self,
+            author=user,
+            author_name=user.username if user else "",
+            text=text,
+        )
+        JournalRecord.objects.filter(pk=self.pk).update(
+            search_document=Concat(F("search_document"), Value(" " + " ".join(text.split()).lower())),
+            updated_at=Now(),
+        )
+        return entry
+
+    @property
+    def full_comment(self):
+        """
+        Коментар у старому форматі: legacy-текст + дописи з заголовками [ADD][user][date].
+        Збирається з comment_entries (бажано попередньо prefetch_related).
+        """
+        blocks = [self.comment] if self.comment else []
+        blocks += [f"{entry.header}\n{entry.text}" for entry in self.comment_entries.all()]
+        return "\n\n".join(blocks) or self.comment
+
     class Meta:
         ordering = ["-is_priority", "-date"]
         verbose_name = "Запис журналу"
         verbose_name_plural = "Записи журналу"
+        indexes = [
+            # keyset-пагінація: WHERE department = ? AND date < ? ORDER BY date DESC, id DESC
+            models.Index(fields=["department", "-date", "-id"], name="journal_dept_date_idx"),
+            models.Index(fields=["-date", "-id"], name="journal_date_idx"),
+            # історія клієнта (/clients/{id}/overview/): WHERE client_id = ? ORDER BY date DESC, id DESC
+            models.Index(fields=["client", "-date", "-id"], name="journal_client_date_idx"),
+            GinIndex(fields=["search_vector"], name="journal_search_vector_gin"),
+            GinIndex(
+                fields=["search_document"],
+                name="journal_search_doc_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
+
+class JournalCommentEntry(models.Model):
+    """Доповнення коментаря до запису журналу (append-only)."""
+
+    record = models.ForeignKey(
+        JournalRecord,
+        on_delete=models.CASCADE,
+        related_name="comment_entries"
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="journal_comment_entries"
+    )
+    # Знімок username на момент запису — так само, як він потрапляв у заголовок [ADD]
+    author_name = models.CharField(max_length=150, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Створено")
+    text = models.TextField()
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        verbose_name = "Доповнення коментаря"
+        verbose_name_plural = "Доповнення коментарів"
+        indexes = [
+            models.Index(fields=["record", "created_at", "id"], name="journal_comment_record_idx"),
+        ]
+
+    def __str__(self):
+        return self.header
+
+    @property
+    def header(self):
+        local_dt = self.created_at.astimezone(pytz.timezone('Europe/Kiev'))
+        return f"[ADD][{self.author_name}][{local_dt.strftime('%d.%m.%Y %H:%M')}]"
 
 
 # models.py
 
+class TsTzRange(Func):
+    """tstzrange(start, end) — напіввідкритий інтервал [start, end)."""
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
+
+
+class AppointmentQuerySet(models.QuerySet):
+
+    def overlapping(self, start, end):
+        """
+        Записи, що перетинаються з [start, end): tstzrange(start_time, end_time) && [start, end)
+        по GiST-індексу appointment_period_gist — лише ті рядки, що справді перетинаються.
+        """
+        return self.alias(period=TsTzRange("start_time", "end_time")).filter(
+            period__overlap=DateTimeTZRange(start, end),
+        )
+
+    def for_client(self, client_id, vehicle_ids=()):
+        """
+        Записи клієнта: з явним client або (як у AppointmentSerializer.get_client)
+        без client, але на авто клієнта. vehicle_ids — id авто клієнта, щоб обидві
+        умови йшли по FK-індексах без JOIN.
+        """
+        condition = Q(client_id=client_id)
+        if vehicle_ids:
+            condition |= Q(client__isnull=True, vehicle_id__in=list(vehicle_ids))
+        return self.filter(condition)
+
+
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Ожидает'),
@@ -137,6 +701,7 @@ class Appointment(models.Model):
     # Сотрудники (many-to-many вместо user + user2)
     users = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
+        through='AppointmentUser',
         related_name='appointments_managed',
         verbose_name="Сотрудники",
         blank=True,  # временно, пока мигрируем данные
@@ -166,8 +731,11 @@ class Appointment(models.Model):
     start_time = models.DateTimeField(verbose_name="Початок")
     duration_minutes = models.PositiveIntegerField(
         verbose_name="Тривалість, хв",
-        help_text="Тривалість візиту у хвилинах"
+        help_text="Тривалість візиту у хвилинах",
+        validators=[MinValueValidator(1)],
     )
+    # start_time + duration_minutes, заповнюється в save() — для індексу перетинів
+    end_time = models.DateTimeField(editable=False, verbose_name="Кінець")
 
     description = models.TextField(blank=True, verbose_name="Описание работ")
     status = models.CharField(
@@ -176,24 +744,56 @@ class Appointment(models.Model):
         default='pending',
         verbose_name="Статус"
     )
+    # Збережено з force=true поверх конфліктів (або перетин був ще до обмежень) —
+    # запис не бере участі в exclusion-обмеженнях і не блокує інші (apps.booking)
+    allow_overlap = models.BooleanField(default=False, editable=False, verbose_name="Дозволено перетин")
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
-    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Обновлено")
+
+    objects = AppointmentQuerySet.as_manager()
+
+    # Статуси, що не займають авто і співробітників
+    RELEASED_STATUSES = ("canceled",)
 
     class Meta:
         verbose_name = "Запис на сервіс"
         verbose_name_plural = "Записи на сервіс"
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=["start_time", "id"], name="appointment_start_idx"),
+            # перетин інтервалів (календар, перевірка конфліктів): period && [start, end)
+            GistIndex(TsTzRange("start_time", "end_time"), name="appointment_period_gist"),
+        ]
+        constraints = [
+            # одне авто не може бути записане на два інтервали, що перетинаються (потребує btree_gist)
+            ExclusionConstraint(
+                name="appointment_vehicle_no_overlap",
+                expressions=[
+                    ("vehicle", RangeOperators.EQUAL),
+                    (TsTzRange("start_time", "end_time"), RangeOperators.OVERLAPS),
+                ],
+                condition=Q(allow_overlap=False) & ~Q(status="canceled"),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.vehicle} ({self.start_time.strftime('%d.%m %H:%M')})"
 
-    @property
-    def end_time(self):
-        from datetime import timedelta
-        if not self.start_time or not self.duration_minutes:
-            return None
-        return self.start_time + timedelta(minutes=self.duration_minutes)
+    LOOKUP_FIELDS = {"start_time": "end_time", "duration_minutes": "end_time"}
+
+    def prepare_lookup_fields(self):
+        if self.start_time is not None and self.duration_minutes is not None:
+            self.end_time = self.start_time + timedelta(minutes=self.duration_minutes)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        self.prepare_lookup_fields()
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields, *(target for source, target in self.LOOKUP_FIELDS.items() if source in update_fields)
+            }
+        super().save(*args, **kwargs)
 
     @property
     def users_display(self):
@@ -205,10 +805,133 @@ class Appointment(models.Model):
         return ", ".join(names) if names else "—"
 
     def clean(self):
-        if self.duration_minutes and self.duration_minutes <= 0:
+        if self.duration_minutes is not None and self.duration_minutes <= 0:
             raise ValidationError("Длительность должна быть больше 0 минут.")
 
     def overlaps_with(self, other: "Appointment") -> bool:
+        self.prepare_lookup_fields()
+        other.prepare_lookup_fields()
         if not self.start_time or not self.end_time or not other.start_time or not other.end_time:
             return False
         return self.start_time < other.end_time and self.end_time > other.start_time
+
+class AppointmentUser(models.Model):
+    """
+    Співробітник запису на сервіс. Інтервал і ознака blocking — копія з Appointment
+    (apps.booking.sync_assignments): exclusion-обмеження не бачить інших таблиць,
+    а без них не заборонити співробітнику два записи, що перетинаються.
+    """
+
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+
+    start_time = models.DateTimeField(null=True, editable=False)
+    end_time = models.DateTimeField(null=True, editable=False)
+    blocking = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        db_table = "apps_appointment_users"
+        unique_together = [("appointment", "user")]
+        verbose_name = "Співробітник запису"
+        verbose_name_plural = "Співробітники записів"
+        constraints = [
+            ExclusionConstraint(
+                name="appointment_user_no_overlap",
+                expressions=[
+                    ("user", RangeOperators.EQUAL),
+                    (TsTzRange("start_time", "end_time"), RangeOperators.OVERLAPS),
+                ],
+                condition=Q(blocking=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.appointment_id} / {self.user_id}"
+
+
+class DailyStat(models.Model):
+    """
+    Денні агрегати для статистики (/api/stats/).
+    Оновлюються інкрементально сигналами (apps/stats.py), перебудовуються командою rebuild_daily_stats.
+    """
+    JOURNAL_DEPARTMENT = "journal_department"
+    JOURNAL_SERVICE = "journal_service"
+    JOURNAL_PRIORITY = "journal_priority"
+    APPOINTMENT_STATUS = "appointment_status"
+
+    METRIC_CHOICES = (
+        (JOURNAL_DEPARTMENT, "Записи журналу по відділах"),
+        (JOURNAL_SERVICE, "Записи журналу по послугах"),
+        (JOURNAL_PRIORITY, "Пріоритетні записи журналу"),
+        (APPOINTMENT_STATUS, "Записи на сервіс по статусах"),
+    )
+
+    day = models.DateField(verbose_name="День")
+    metric = models.CharField(max_length=32, choices=METRIC_CHOICES)
+    key = models.CharField(max_length=64, blank=True, default="")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["day", "metric", "key"]
+        verbose_name = "Денна статистика"
+        verbose_name_plural = "Денна статистика"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "metric", "key"], name="unique_daily_stat"),
+        ]
+        indexes = [
+            models.Index(fields=["metric", "day"], name="daily_stat_metric_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.metric}[{self.key}] = {self.count}"
+
+
+# Таблиці, змінені в поточній транзакції потоку (ChangeMarker.touch)
+_changed_tables = threading.local()
+
+
+class ChangeMarker(models.Model):
+    """
+    Лічильник змін по таблиці для ETag (apps.api.mixins.ConditionalGetMixin).
+    Збільшується після коміту кожної транзакції, що вставила, змінила чи видалила рядки
+    (сигнали, а масові операції без сигналів викликають touch() самі). На відміну
+    від MAX(updated_at), що ставиться до коміту, змінюється з кожним комітом — у порядку комітів.
+    """
+    table = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Маркер змін"
+        verbose_name_plural = "Маркери змін"
+
+    def __str__(self):
+        return f"{self.table}: {self.version}"
+
+    @classmethod
+    def touch(cls, *models):
+        """
+        Позначає зміну таблиць моделей. Лічильники збільшуються одним запитом після коміту
+        (усі таблиці транзакції разом): блокування рядка лічильника не тримається до коміту
+        і не впорядковує паралельні транзакції між собою.
+        """
+        pending = _changed_tables.__dict__.setdefault("tables", set())
+        pending.update(model._meta.db_table for model in models)
+        transaction.on_commit(cls._flush)
+
+    @classmethod
+    def _flush(cls):
+        # перший callback після коміту забирає все; решта — без запитів.
+        # Таблиці з відкоченої транзакції дадуть лише зайвий інкремент (кеш-промах)
+        tables = sorted(getattr(_changed_tables, "tables", ()))
+        if not tables:
+            return
+        _changed_tables.tables = set()
+        table = connection.ops.quote_name(cls._meta.db_table)
+        column = connection.ops.quote_name("table")
+        values = ", ".join(["(%s, 1)"] * len(tables))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({column}, version) VALUES {values} "
+                f"ON CONFLICT ({column}) DO UPDATE SET version = {table}.version + 1",
+                tables,
+            )
@@ -0,0 +1,81 @@
+"""
+Канонічні форми для пошуку: телефони, імена клієнтів, номери авто.
+Використовуються моделями в save(), масовими операціями та міграціями-backfill.
+"""
+import re
+
+
+# Повний український номер у канонічному вигляді: 380XXXXXXXXX
+FULL_PHONE_LENGTH = 12
+# Коротше закінчення номера збігається із занадто великою часткою клієнтів
+MIN_PHONE_SUFFIX = 4
+
+
+def normalize_phone(value):
+    """
+    Телефон -> лише цифри у канонічному вигляді, щоб "+380 67…", "8067…" і "067…"
+    давали один рядок. Невідомі формати залишаються просто цифрами.
+    """
+    digits = re.sub(r"\D", "", value or "")
+    if len(digits) == 10 and digits.startswith("0"):
+        return "38" + digits
+    if len(digits) == 11 and digits.startswith("80"):
+        return "3" + digits
+    return digits
+
+
+# Спрощена транслітерація (укр. + рос. літери) — лише для порівняння,
+# тому неоднозначні пари зведені до однієї латинської форми
+CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "h", "ґ": "g", "д": "d", "е": "e", "є": "ie",
+    "ё": "e", "ж": "zh", "з": "z", "и": "y", "і": "i", "ї": "i", "й": "i", "к": "k",
+    "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "iu", "я": "ia", "'": "", "’": "", "ʼ": "",
+}
+
+# Латинські варіанти, що пишуть по-різному: зводимо до тієї ж форми, що й транслітерація
+LATIN_FOLDING = (
+    ("yi", "i"), ("y", "i"), ("j", "i"),
+    ("w", "v"), ("x", "ks"), ("q", "k"), ("g", "h"),
+)
+
+
+def transliterate(value):
+    return "".join(CYRILLIC_TO_LATIN.get(char, char) for char in value)
+
+
+def name_search_key(value):
+    """
+    Ім'я -> нижній регістр, латиниця, одиничні пробіли.
+    "Іван Петренко", "Ivan Petrenko" і "Иван Петренко" дають однаковий або близький ключ,
+    решту відмінностей (одруківки, варіанти транслітерації) покриває trigram-схожість.
+    """
+    key = transliterate((value or "").lower())
+    for source, target in LATIN_FOLDING:
+        key = key.replace(source, target)
+    key = re.sub(r"[^\w\s]", " ", key)
+    return " ".join(key.split())
+
+
+# Кириличні літери, що на номерних знаках виглядають як латинські
+PLATE_HOMOGLYPHS = str.maketrans("АВЕІКМНОРСТХУ", "ABEIKMHOPCTXY")
+
+
+def plate_key(value):
+    """Номер авто -> верхній регістр, без пробілів/дефісів, кирилиця-двійники -> латиниця."""
+    return re.sub(r"[\W_]", "", (value or "").upper()).translate(PLATE_HOMOGLYPHS)
+
+
+def catalog_key(value):
+    """
+    Марка / модель -> ключ довідника: "BMW", "bmw" і "Бмв" дають "bmv",
+    "Mercedes-Benz" і "mercedes benz" — "mercedesbenz".
+    Слова з цифрами чи латиницею ("Х5" з кириличною Х) — спершу як на номерах:
+    кирилиця-двійники -> латиниця, решта — транслітерація.
+    """
+    words = [
+        word.upper().translate(PLATE_HOMOGLYPHS) if re.search(r"[0-9A-Za-z]", word) else word
+        for word in (value or "").split()
+    ]
+    return name_search_key(" ".join(words)).replace(" ", "")
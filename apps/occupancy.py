@@ -0,0 +1,219 @@
+"""
+In-process бітові карти зайнятості для пошуку вільних вікон (/api/appointments/free-slots/).
+
+Доба за Києвом ділиться на 15-хвилинні кошики. Для кожного завантаженого дня
+зберігається рядок NumPy (int16[96], кількість записів у кошику) на кожного
+співробітника і кожне авто, зайняті того дня; запис займає кошики від початку
+(вниз) до кінця (вгору), тож вікно по сітці ніколи не перетинає реальний запис.
+Як і в apps.booking, займають усі записи, крім скасованих (включно з force).
+
+Дні завантажуються за потреби двома запитами на весь діапазон і тримаються
+в пам'яті (не більше MAX_DAYS, найдавніше використані витісняються).
+Зміни записів застосовуються після коміту (сигнали -> refresh): внесок запису
+в кожен завантажений день віднімається і додається заново з актуальних даних.
+Пошук — векторні проходи по масиву (ресурси x дні x кошики): префіксні суми
+вільних кошиків дають усі вікна потрібної довжини одразу.
+Як і suggest.index, індекс локальний для процесу: розраховано на один сервер.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+
+import numpy as np
+
+from apps.stats import LOCAL_TZ, local_day
+
+
+BUCKET_MINUTES = 15
+BUCKET_SECONDS = BUCKET_MINUTES * 60
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+# Робочі години — як slotMinTime / slotMaxTime календаря
+WORK_START_BUCKET = 8 * 60 // BUCKET_MINUTES
+WORK_END_BUCKET = 21 * 60 // BUCKET_MINUTES
+
+MAX_DAYS = 120
+
+USER = "u"
+VEHICLE = "v"
+
+
+def _day_start(day):
+    return LOCAL_TZ.localize(datetime.combine(day, time.min))
+
+
+def _bucket(dt, day, round_up=False):
+    """Номер кошика моменту dt у дні day (0 / BUCKETS_PER_DAY, якщо dt в інший день)."""
+    local = dt.astimezone(LOCAL_TZ)
+    if local.date() != day:
+        return 0 if local.date() < day else BUCKETS_PER_DAY
+    seconds = local.hour * 3600 + local.minute * 60 + local.second + (1 if local.microsecond else 0)
+    return -(-seconds // BUCKET_SECONDS) if round_up else seconds // BUCKET_SECONDS
+
+
+def _windows(free, length):
+    """Маска початків, з яких length кошиків поспіль вільні (по останній осі)."""
+    sums = np.cumsum(free, axis=-1, dtype=np.int32)
+    sums = np.concatenate([np.zeros(sums.shape[:-1] + (1,), dtype=np.int32), sums], axis=-1)
+    return (sums[..., length:] - sums[..., :-length]) == length
+
+
+class DayGrid:
+    """Зайнятість одного дня: рядки кошиків по ресурсах і внесок кожного запису."""
+
+    def __init__(self):
+        self.rows = {}
+        self.spans = {}
+
+    def add(self, appointment_id, keys, lo, hi):
+        for key in keys:
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = np.zeros(BUCKETS_PER_DAY, dtype=np.int16)
+            row[lo:hi] += 1
+        self.spans[appointment_id] = (keys, lo, hi)
+
+    def remove(self, appointment_id):
+        span = self.spans.pop(appointment_id, None)
+        if span:
+            keys, lo, hi = span
+            for key in keys:
+                self.rows[key][lo:hi] -= 1
+
+    def busy(self, key):
+        row = self.rows.get(key)
+        return row > 0 if row is not None else None
+
+
+class OccupancyIndex:
+
+    def __init__(self):
+        # завантаження дня тримає lock разом із запитами: refresh після коміту
+        # не може "проскочити" між читанням бази і записом у індекс
+        self._lock = threading.RLock()
+        self._days = OrderedDict()
+
+    # ---------------------------
+    # Завантаження
+    # ---------------------------
+    def _load(self, days):
+        from apps.models import Appointment, AppointmentUser
+
+        grids = {day: DayGrid() for day in days}
+        start = _day_start(min(days))
+        end = _day_start(max(days) + timedelta(days=1))
+        appointments = (
+            Appointment.objects.overlapping(start, end)
+            .exclude(status__in=Appointment.RELEASED_STATUSES)
+            .order_by()
+        )
+        self._fill(grids, appointments, AppointmentUser.objects.filter(appointment__in=appointments.values("id")))
+        return grids
+
+    def _fill(self, grids, appointments, assignments):
+        users = {}
+        for appointment_id, user_id in assignments.values_list("appointment_id", "user_id"):
+            users.setdefault(appointment_id, []).append((USER, user_id))
+
+        for pk, start, end, vehicle_id in appointments.values_list("id", "start_time", "end_time", "vehicle_id"):
+            keys = [(VEHICLE, vehicle_id), *users.get(pk, ())]
+            day = local_day(start)
+            while day <= local_day(end):
+                grid = grids.get(day)
+                if grid is not None:
+                    lo, hi = _bucket(start, day), _bucket(end, day, round_up=True)
+                    if hi > lo:
+                        grid.add(pk, keys, lo, hi)
+                day += timedelta(days=1)
+
+    def _ensure(self, days):
+        missing = [day for day in days if day not in self._days]
+        if missing:
+            self._days.update(self._load(missing))
+        for day in days:
+            self._days.move_to_end(day)
+        while len(self._days) > MAX_DAYS:
+            self._days.popitem(last=False)
+        return [self._days[day] for day in days]
+
+    def reset(self):
+        with self._lock:
+            self._days.clear()
+
+    # ---------------------------
+    # Інкрементальні оновлення (з сигналів, після коміту)
+    # ---------------------------
+    def refresh(self, appointment_ids):
+        """Перечитує внесок записів (змінених, видалених, зі зміненими співробітниками)."""
+        from apps.models import Appointment, AppointmentUser
+
+        appointment_ids = set(appointment_ids)
+        with self._lock:
+            if not self._days or not appointment_ids:
+                return
+            for grid in self._days.values():
+                for pk in appointment_ids:
+                    grid.remove(pk)
+            appointments = Appointment.objects.filter(pk__in=appointment_ids).exclude(
+                status__in=Appointment.RELEASED_STATUSES,
+            ).order_by()
+            self._fill(self._days, appointments, AppointmentUser.objects.filter(appointment_id__in=appointment_ids))
+
+    # ---------------------------
+    # Пошук
+    # ---------------------------
+    def free_slots(self, duration_minutes, days, user_ids=(), vehicle_id=None, team=(), not_before=None, limit=10):
+        """
+        Найраніші вікна тривалістю duration_minutes по сітці кошиків у робочі години днів days.
+        Вільними мають бути всі user_ids і авто vehicle_id; якщо user_ids не задані —
+        хоча б один співробітник з team. Повертає [(початок, кінець, [id вільних співробітників])].
+        """
+        length = -(-duration_minutes // BUCKET_MINUTES)
+        if not days or length > WORK_END_BUCKET - WORK_START_BUCKET:
+            return []
+
+        # робочі години і не раніше not_before
+        allowed = np.zeros((len(days), BUCKETS_PER_DAY), dtype=bool)
+        allowed[:, WORK_START_BUCKET:WORK_END_BUCKET] = True
+        if not_before:
+            for i, day in enumerate(days):
+                allowed[i, :_bucket(not_before, day, round_up=True)] = False
+
+        required = [(USER, user_id) for user_id in user_ids]
+        if vehicle_id:
+            required.append((VEHICLE, vehicle_id))
+        team = [] if user_ids else list(team)
+
+        busy = np.zeros((len(days), BUCKETS_PER_DAY), dtype=bool)
+        team_busy = np.zeros((len(team), len(days), BUCKETS_PER_DAY), dtype=bool)
+        with self._lock:
+            for i, grid in enumerate(self._ensure(days)):
+                for key in required:
+                    row = grid.busy(key)
+                    if row is not None:
+                        busy[i] |= row
+                for j, user_id in enumerate(team):
+                    row = grid.busy((USER, user_id))
+                    if row is not None:
+                        team_busy[j, i] = row
+
+        fits = _windows(allowed & ~busy, length)
+        if team:
+            team_fits = _windows(allowed & ~team_busy, length)
+            fits &= team_fits.any(axis=0)
+
+        slots = []
+        team = np.array(team)
+        # np.nonzero іде по днях, а в межах дня — по кошиках: одразу хронологічний порядок
+        for i, position in zip(*np.nonzero(fits)):
+            if len(slots) >= limit:
+                break
+            start = LOCAL_TZ.localize(
+                datetime.combine(days[i], time.min) + timedelta(minutes=int(position) * BUCKET_MINUTES)
+            )
+            free = team[team_fits[:, i, position]].tolist() if len(team) else list(user_ids)
+            slots.append((start, start + timedelta(minutes=duration_minutes), free))
+        return slots
+
+
+index = OccupancyIndex()
@@ -0,0 +1,103 @@
+"""
+In-process кеш довідників: послуги і співробітники (користувачі без суперадмінів).
+
+Їх читає кожне відкриття модалок календаря / журналу і кожна валідація запису
+на сервіс, а змінюються вони рідко. У кожного довідника є лічильник версії:
+сигнали Service / User збільшують його після коміту (apps.signals), а наступне
+звернення перечитує таблицю одним запитом. У стабільному стані — жодного запиту.
+Сигнали доходять лише до свого процесу, тож знімок живе не довше SNAPSHOT_TTL,
+а перевірка послуг при записі (active_service_ids) на промах кешу звертається до бази.
+"""
+import hashlib
+import threading
+import time
+
+from django.db import connection, transaction
+
+
+SNAPSHOT_TTL = 60  # секунд: зміни з інших процесів (воркерів) видно не пізніше
+
+class Snapshot:
+    """Незмінний знімок довідника: рядки в порядку списку, індекс за id і відбиток для ETag."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.rows = rows
+        self.by_id = {row.pk: row for row in rows}
+        updated = [row.updated_at for row in rows if row.updated_at]
+        self.last_modified = max(updated) if updated else None
+        # залежить від складу і змін рядків, а не від версії: однаковий у різних процесах
+        self.fingerprint = hashlib.md5(
+            "|".join(f"{row.pk}:{row.updated_at.isoformat() if row.updated_at else ''}" for row in rows).encode()
+        ).hexdigest()
+
+
+class ReferenceCache:
+
+    def __init__(self, name, load):
+        self.name = name
+        self._load = load
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot = None
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+
+    def bump_on_commit(self):
+        # до коміту інші потоки ще читають старі дані — інакше закешували б їх під новою версією
+        transaction.on_commit(self.bump)
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if (
+            snapshot is not None and snapshot.version == self._version
+            and time.monotonic() - snapshot.loaded_at < SNAPSHOT_TTL
+        ):
+            return snapshot
+
+        version = self._version
+        snapshot = Snapshot(version, self._load())
+        # всередині транзакції могли бути незакомічені зміни довідника — такий знімок не зберігаємо
+        if not connection.in_atomic_block:
+            with self._lock:
+                if self._version == version:
+                    self._snapshot = snapshot
+        return snapshot
+
+
+def _load_services():
+    from apps.models import Service
+    return list(Service.objects.order_by("name", "id"))
+
+
+def _load_staff():
+    from apps.accounts.models import User
+    return list(User.objects.filter(is_superuser=False).order_by("id"))
+
+
+services = ReferenceCache("services", _load_services)
+staff = ReferenceCache("staff", _load_staff)
+
+
+def active_service_ids(ids):
+    """
+    Ті з ids, що є серед активних послуг (порядок збережено). Якщо знімок знає
+    не всі — послугу могли створити чи змінити в іншому процесі — уточнюємо одним запитом.
+    """
+    from apps.models import Service
+
+    by_id = services.snapshot().by_id
+    found = [pk for pk in ids if pk in by_id and by_id[pk].is_active]
+    if len(found) == len(ids):
+        return found
+    active = set(Service.objects.filter(id__in=ids, is_active=True).values_list("id", flat=True))
+    return [pk for pk in ids if pk in active]
+
+
+def staff_ids(ids):
+    """Ті з ids, що належать співробітникам (без суперадмінів)."""
+    by_id = staff.snapshot().by_id
+    return [pk for pk in ids if pk in by_id]
@@ -0,0 +1,368 @@
+from collections import Counter
+
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+from apps import booking, catalog, counters, events, occupancy, refdata, stats, suggest
+from apps.accounts.models import User
+from apps.models import (
+    Client, Vehicle, VehicleBrand, VehicleModel, Service, JournalRecord, JournalCommentEntry, Appointment,
+    AppointmentUser, DailyStat, ChangeMarker,
+)
+
+
+# -----------------------------
+# Пошуковий документ журналу
+# -----------------------------
+# Поля клієнта / авто, що входять у search_document записів журналу
+SEARCH_DOCUMENT_FIELDS = {
+    Client: ("name", "phone"),
+    Vehicle: ("plate_number", "brand", "model"),
+}
+
+
+def search_document_state(instance):
+    """Значення SEARCH_DOCUMENT_FIELDS без звернення до відкладених полів (інакше None)."""
+    loaded = instance.__dict__
+    fields = SEARCH_DOCUMENT_FIELDS[type(instance)]
+    if not instance.pk or any(field not in loaded for field in fields):
+        return None
+    return tuple(loaded[field] for field in fields)
+
+
+@receiver(post_init, sender=Client)
+@receiver(post_init, sender=Vehicle)
+def remember_search_document_state(sender, instance, **kwargs):
+    instance._search_document_state = search_document_state(instance)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Vehicle)
+def refresh_journal_search_documents(sender, instance, created, update_fields=None, **kwargs):
+    # історію журналу переписуємо лише коли змінилося те, що в неї потрапляє
+    # (прив'язка авто до клієнта, лічильники, updated_at — не змінюють документ)
+    if update_fields is not None and not set(SEARCH_DOCUMENT_FIELDS[sender]) & set(update_fields):
+        return
+    previous = instance._search_document_state
+    instance._search_document_state = search_document_state(instance)
+    if created or (previous is not None and previous == instance._search_document_state):
+        return
+    owner = "client" if sender is Client else "vehicle"
+    JournalRecord.objects.filter(**{owner: instance}).refresh_search_documents()
+
+
+# -----------------------------
+# Денна статистика (DailyStat)
+# -----------------------------
+# В post_init нельзя обращаться к отложенным (only/defer) полям — это вызовет
+# refresh_from_db и новый post_init. Если поле не загружено, состояние
+# дочитывается в pre_save.
+@receiver(post_init, sender=JournalRecord)
+def remember_journal_stats_state(sender, instance, **kwargs):
+    instance._stats_is_priority = instance.__dict__.get("is_priority")
+
+
+@receiver(pre_save, sender=JournalRecord)
+def load_journal_stats_state(sender, instance, **kwargs):
+    if instance.pk and instance._stats_is_priority is None:
+        instance._stats_is_priority = (
+            JournalRecord.objects.filter(pk=instance.pk).values_list("is_priority", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=JournalRecord)
+def update_journal_stats(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(stats.journal_changes(instance))
+    elif instance._stats_is_priority is not None and instance.is_priority != instance._stats_is_priority:
+        stats.bump(Counter({
+            (stats.local_day(instance.date), DailyStat.JOURNAL_PRIORITY, ""): 1 if instance.is_priority else -1
+        }))
+    instance._stats_is_priority = instance.is_priority
+
+
+@receiver(pre_delete, sender=JournalRecord)
+def remove_journal_stats(sender, instance, **kwargs):
+    # pre_delete: связи services ещё на месте
+    load_journal_stats_state(sender, instance)
+    changes = stats.journal_changes(instance, -1, is_priority=instance._stats_is_priority)
+    service_ids = instance.services.values_list("id", flat=True)
+    changes.update(stats.journal_service_changes(
+        {instance.pk: instance}, [(instance.pk, sid) for sid in service_ids], -1,
+    ))
+    stats.bump(changes)
+
+
+@receiver(m2m_changed, sender=JournalRecord.services.through)
+def update_journal_service_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    sign = 1 if action == "post_add" else -1
+
+    if action == "pre_clear":
+        if reverse:
+            pk_set = set(sender.objects.filter(service_id=instance.pk).values_list("journalrecord_id", flat=True))
+        else:
+            pk_set = set(instance.services.values_list("id", flat=True))
+
+    if not pk_set:
+        return
+
+    if reverse:
+        records = JournalRecord.objects.only("id", "date").in_bulk(pk_set)
+        pairs = [(record_id, instance.pk) for record_id in records]
+    else:
+        records = {instance.pk: instance}
+        pairs = [(instance.pk, service_id) for service_id in pk_set]
+
+    stats.bump(stats.journal_service_changes(records, pairs, sign))
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_stats_state(sender, instance, **kwargs):
+    loaded = instance.__dict__
+    if instance.pk and "start_time" in loaded and "status" in loaded:
+        instance._stats_state = (loaded["start_time"], loaded["status"])
+    else:
+        instance._stats_state = None
+
+
+@receiver(pre_save, sender=Appointment)
+def load_appointment_stats_state(sender, instance, **kwargs):
+    if instance.pk and instance._stats_state is None:
+        instance._stats_state = (
+            Appointment.objects.filter(pk=instance.pk).values_list("start_time", "status").first()
+        )
+
+
+@receiver(post_save, sender=Appointment)
+def update_appointment_stats(sender, instance, created, **kwargs):
+    changes = stats.appointment_changes(instance.start_time, instance.status)
+    previous = instance._stats_state
+    if not created and previous:
+        changes.subtract(stats.appointment_changes(*previous))
+    stats.bump(changes)
+    instance._stats_state = (instance.start_time, instance.status)
+
+
+@receiver(pre_delete, sender=Appointment)
+def remove_appointment_stats(sender, instance, **kwargs):
+    load_appointment_stats_state(sender, instance)
+    if instance._stats_state:
+        stats.bump(stats.appointment_changes(*instance._stats_state, sign=-1))
+
+
+# -----------------------------
+# Інтервал запису у співробітників (apps.booking)
+# -----------------------------
+BOOKING_FIELDS = {"start_time", "duration_minutes", "end_time", "status", "allow_overlap"}
+
+
+@receiver(post_save, sender=Appointment)
+def sync_appointment_assignments(sender, instance, created, update_fields=None, **kwargs):
+    # у щойно створеного запису співробітників ще немає — їх синхронізує post_add
+    if created or (update_fields is not None and not BOOKING_FIELDS & set(update_fields)):
+        return
+    booking.sync_assignments([instance.pk])
+
+
+@receiver(m2m_changed, sender=AppointmentUser)
+def sync_added_assignments(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_add":
+        booking.sync_assignments(pk_set if reverse else [instance.pk])
+
+
+# -----------------------------
+# Бітові карти зайнятості (apps.occupancy) — після коміту
+# -----------------------------
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def refresh_appointment_occupancy(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: occupancy.index.refresh([pk]))
+
+
+@receiver(m2m_changed, sender=AppointmentUser)
+def refresh_assignment_occupancy(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        # reverse post_clear не передає pk_set — які записи зачеплено, невідомо
+        if reverse and pk_set is None:
+            transaction.on_commit(occupancy.index.reset)
+            return
+        pks = set(pk_set) if reverse else [instance.pk]
+        transaction.on_commit(lambda: occupancy.index.refresh(pks))
+
+
+# -----------------------------
+# Лічильники клієнта (apps.counters)
+# -----------------------------
+# Як і для DailyStat: стан до змін запам'ятовується в post_init (без відкладених полів)
+# і дочитується в pre_save / pre_delete; дельта застосовується після запису —
+# тоді перерахунок MAX уже бачить нові дані.
+def remember_counter_state(sender, instance, **kwargs):
+    instance._counter_state = counters.state(instance, loaded_only=True)
+
+
+def load_counter_state(sender, instance, **kwargs):
+    if instance.pk and instance._counter_state is None:
+        instance._counter_state = counters.load_state(sender, instance.pk)
+
+
+def update_client_counters(sender, instance, **kwargs):
+    current = counters.state(instance)
+    counters.track(sender, instance._counter_state, current)
+    instance._counter_state = current
+
+
+def remove_from_client_counters(sender, instance, **kwargs):
+    counters.track(sender, instance._counter_state, None)
+
+
+for _model in counters.TRACKED_FIELDS:
+    _uid = _model._meta.label_lower
+    post_init.connect(remember_counter_state, sender=_model, dispatch_uid=f"remember_counter_state_{_uid}")
+    pre_save.connect(load_counter_state, sender=_model, dispatch_uid=f"load_counter_state_{_uid}")
+    post_save.connect(update_client_counters, sender=_model, dispatch_uid=f"update_client_counters_{_uid}")
+    pre_delete.connect(load_counter_state, sender=_model, dispatch_uid=f"load_counter_state_delete_{_uid}")
+    post_delete.connect(remove_from_client_counters, sender=_model, dispatch_uid=f"remove_from_client_counters_{_uid}")
+
+
+# -----------------------------
+# Довідник марок / моделей: vehicles_count (apps.catalog)
+# -----------------------------
+@receiver(post_init, sender=Vehicle)
+def remember_catalog_state(sender, instance, **kwargs):
+    instance._catalog_state = catalog.state(instance, loaded_only=True)
+
+
+@receiver(pre_save, sender=Vehicle)
+@receiver(pre_delete, sender=Vehicle)
+def load_catalog_state(sender, instance, **kwargs):
+    if instance.pk and instance._catalog_state is None:
+        instance._catalog_state = catalog.load_state(instance.pk)
+
+
+@receiver(post_save, sender=Vehicle)
+def update_catalog_counts(sender, instance, **kwargs):
+    current = catalog.state(instance)
+    catalog.track(instance._catalog_state, current)
+    instance._catalog_state = current
+
+
+@receiver(post_delete, sender=Vehicle)
+def remove_from_catalog_counts(sender, instance, **kwargs):
+    catalog.track(instance._catalog_state, None)
+
+
+@receiver(post_delete, sender=VehicleBrand)
+@receiver(post_delete, sender=VehicleModel)
+def forget_resolved_catalog(sender, instance, **kwargs):
+    # разом з маркою каскадом видаляються її моделі — скидаємо обидва кеші
+    VehicleBrand._resolved.clear()
+    VehicleModel._resolved.clear()
+
+
+# -----------------------------
+# Маркеры изменений для ETag: вставки, изменения, удаления и m2m (после коммита)
+# -----------------------------
+# модель -> таблица, чей маркер меняется (дописи видны только внутри записи журнала)
+CHANGE_MARKER_MODELS = {
+    Client: Client, Vehicle: Vehicle, Service: Service, JournalRecord: JournalRecord,
+    JournalCommentEntry: JournalRecord, Appointment: Appointment, User: User,
+}
+
+
+def track_changes(sender, **kwargs):
+    ChangeMarker.touch(CHANGE_MARKER_MODELS[sender])
+
+
+def track_m2m_changes(sender, instance, action, model, **kwargs):
+    if action.startswith("post_"):
+        # с обеих сторон: запись журнала / на сервис и услуга / сотрудник
+        ChangeMarker.touch(type(instance), model)
+
+
+for _model in CHANGE_MARKER_MODELS:
+    _uid = _model._meta.label_lower
+    post_save.connect(track_changes, sender=_model, dispatch_uid=f"track_changes_{_uid}")
+    post_delete.connect(track_changes, sender=_model, dispatch_uid=f"track_deletions_{_uid}")
+
+for _through in (JournalRecord.services.through, AppointmentUser, Appointment.services.through):
+    m2m_changed.connect(track_m2m_changes, sender=_through, dispatch_uid=f"track_m2m_changes_{_through._meta.label_lower}")
+
+
+# -----------------------------
+# Кеш довідників (apps.refdata): нова версія після коміту
+# -----------------------------
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_services_cache(sender, **kwargs):
+    refdata.services.bump_on_commit()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_staff_cache(sender, **kwargs):
+    refdata.staff.bump_on_commit()
+
+
+# -----------------------------
+# Префіксний індекс typeahead (apps.suggest)
+# -----------------------------
+@receiver(post_save, sender=Client)
+def index_client(sender, instance, **kwargs):
+    pk, name, phone = instance.pk, instance.name, instance.phone
+    transaction.on_commit(lambda: suggest.index.put_client(pk, name, phone))
+
+
+@receiver(post_delete, sender=Client)
+def unindex_client(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: suggest.index.remove(suggest.CLIENT, pk))
+
+
+@receiver(post_save, sender=Vehicle)
+def index_vehicle(sender, instance, **kwargs):
+    pk, plate, brand, model = instance.pk, instance.plate_number, instance.brand, instance.model
+    transaction.on_commit(lambda: suggest.index.put_vehicle(pk, plate, brand, model))
+
+
+@receiver(post_delete, sender=Vehicle)
+def unindex_vehicle(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: suggest.index.remove(suggest.VEHICLE, pk))
+
+
+# -----------------------------
+# Живий потік змін (SSE)
+# -----------------------------
+@receiver(post_save, sender=JournalRecord)
+def publish_journal_saved(sender, instance, created, **kwargs):
+    events.schedule(events.JOURNAL, events.CREATED if created else events.UPDATED, [instance])
+
+
+@receiver(post_delete, sender=JournalRecord)
+def publish_journal_deleted(sender, instance, **kwargs):
+    events.schedule(events.JOURNAL, events.DELETED, [instance])
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_appointment_event_keys(sender, instance, **kwargs):
+    # _stats_state уже дочитан в load_appointment_stats_state: старый день записи
+    previous = instance._stats_state
+    instance._event_keys = {(None, stats.local_day(previous[0]))} if previous else set()
+
+
+@receiver(post_save, sender=Appointment)
+def publish_appointment_saved(sender, instance, created, **kwargs):
+    events.schedule(
+        events.APPOINTMENT, events.CREATED if created else events.UPDATED, [instance],
+        previous_keys={instance.pk: getattr(instance, "_event_keys", set())},
+    )
+
+
+@receiver(post_delete, sender=Appointment)
+def publish_appointment_deleted(sender, instance, **kwargs):
+    events.schedule(events.APPOINTMENT, events.DELETED, [instance])
@@ -0,0 +1,181 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+import pytz
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from apps.models import DailyStat, JournalRecord, Appointment, Service
+
+
+LOCAL_TZ = pytz.timezone('Europe/Kiev')
+
+
+def local_day(dt):
+    return dt.astimezone(LOCAL_TZ).date()
+
+
+# =========================================
+# ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ
+# =========================================
+def bump(changes):
+    """
+    Применяет дельты {(day, metric, key): delta} одним INSERT ... ON CONFLICT DO UPDATE,
+    поэтому параллельные записи не затирают счётчики друг друга.
+    """
+    changes = [(day, metric, str(key), delta) for (day, metric, key), delta in changes.items() if delta]
+    if not changes:
+        return
+
+    table = connection.ops.quote_name(DailyStat._meta.db_table)
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(changes))
+    params = [value for change in changes for value in change]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (day, metric, key, count) VALUES {values} "
+            f"ON CONFLICT (day, metric, key) DO UPDATE SET count = {table}.count + EXCLUDED.count",
+            params,
+        )
+
+
+def journal_changes(record, sign=1, is_priority=None):
+    """Дельты отдела и приоритета для записи журнала (без услуг)."""
+    day = local_day(record.date)
+    changes = Counter({(day, DailyStat.JOURNAL_DEPARTMENT, record.department): sign})
+    if record.is_priority if is_priority is None else is_priority:
+        changes[(day, DailyStat.JOURNAL_PRIORITY, "")] += sign
+    return changes
+
+
+def journal_service_changes(records_by_id, pairs, sign=1):
+    """Дельты по услугам; pairs — итерируемое (journalrecord_id, service_id)."""
+    changes = Counter()
+    for record_id, service_id in pairs:
+        changes[(local_day(records_by_id[record_id].date), DailyStat.JOURNAL_SERVICE, service_id)] += sign
+    return changes
+
+
+def appointment_changes(start_time, status, sign=1):
+    return Counter({(local_day(start_time), DailyStat.APPOINTMENT_STATUS, status): sign})
+
+
+# =========================================
+# ПОЛНАЯ ПЕРЕСБОРКА
+# =========================================
+def _day_bounds(date_from, date_to):
+    filters = {}
+    if date_from:
+        filters["gte"] = LOCAL_TZ.localize(datetime.combine(date_from, time.min))
+    if date_to:
+        filters["lt"] = LOCAL_TZ.localize(datetime.combine(date_to + timedelta(days=1), time.min))
+    return filters
+
+
+def _lock_for_rebuild():
+    """
+    SHARE ROW EXCLUSIVE конфликтует с ROW EXCLUSIVE, который берёт INSERT ... ON CONFLICT в bump():
+    ждём завершения транзакций, уже применивших дельты, а новые bump() ждут нашего коммита.
+    Режим конфликтует и сам с собой — две пересборки не пересекаются.
+    """
+    table = connection.ops.quote_name(DailyStat._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+
+
+@transaction.atomic
+def rebuild(date_from=None, date_to=None):
+    """
+    Пересчитывает агрегаты за период (или за всё время) из исходных таблиц.
+    Подсчёт идёт в той же транзакции после блокировки: запись, закоммиченная до
+    подсчёта, учтена в нём, а её bump() — до него; после — только bump() поверх.
+    """
+    _lock_for_rebuild()
+
+    bounds = _day_bounds(date_from, date_to)
+    journal_filter = {f"date__{op}": value for op, value in bounds.items()}
+    through_filter = {f"journalrecord__date__{op}": value for op, value in bounds.items()}
+    appointment_filter = {f"start_time__{op}": value for op, value in bounds.items()}
+
+    journals = JournalRecord.objects.filter(**journal_filter).order_by()
+    rows = []
+
+    for row in journals.values(day=TruncDate("date", tzinfo=LOCAL_TZ), key=F("department")).annotate(n=Count("id")):
+        rows.append(DailyStat(day=row["day"], metric=DailyStat.JOURNAL_DEPARTMENT, key=row["key"], count=row["n"]))
+
+    for row in journals.filter(is_priority=True).values(day=TruncDate("date", tzinfo=LOCAL_TZ)).annotate(n=Count("id")):
+        rows.append(DailyStat(day=row["day"], metric=DailyStat.JOURNAL_PRIORITY, key="", count=row["n"]))
+
+    through = JournalRecord.services.through.objects.filter(**through_filter).order_by()
+    for row in through.values(day=TruncDate("journalrecord__date", tzinfo=LOCAL_TZ), key=F("service_id")).annotate(n=Count("id")):
+        rows.append(DailyStat(day=row["day"], metric=DailyStat.JOURNAL_SERVICE, key=str(row["key"]), count=row["n"]))
+
+    appointments = Appointment.objects.filter(**appointment_filter).order_by()
+    for row in appointments.values(day=TruncDate("start_time", tzinfo=LOCAL_TZ), key=F("status")).annotate(n=Count("id")):
+        rows.append(DailyStat(day=row["day"], metric=DailyStat.APPOINTMENT_STATUS, key=row["key"], count=row["n"]))
+
+    stale = DailyStat.objects.all()
+    if date_from:
+        stale = stale.filter(day__gte=date_from)
+    if date_to:
+        stale = stale.filter(day__lte=date_to)
+
+    stale.delete()
+    DailyStat.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
+
+
+# =========================================
+# ЧТЕНИЕ
+# =========================================
+def summary(date_from, date_to):
+    """Сводка за период только по таблице агрегатов (дни × ключи, без сканирования журнала)."""
+    totals = {
+        (row["metric"], row["key"]): row["total"]
+        for row in DailyStat.objects.filter(day__gte=date_from, day__lte=date_to)
+        .values("metric", "key").annotate(total=Sum("count")).order_by()
+    }
+
+    def by_metric(metric):
+        return {key: total for (m, key), total in totals.items() if m == metric and total}
+
+    departments = by_metric(DailyStat.JOURNAL_DEPARTMENT)
+    journal_total = sum(departments.values())
+    priority = totals.get((DailyStat.JOURNAL_PRIORITY, ""), 0)
+
+    service_counts = by_metric(DailyStat.JOURNAL_SERVICE)
+    service_names = Service.objects.in_bulk([int(key) for key in service_counts]) if service_counts else {}
+    by_service = sorted(
+        (
+            {"id": int(key), "name": service_names[int(key)].name if int(key) in service_names else None, "count": count}
+            for key, count in service_counts.items()
+        ),
+        key=lambda row: -row["count"],
+    )
+
+    statuses = by_metric(DailyStat.APPOINTMENT_STATUS)
+
+    by_day = {}
+    for row in DailyStat.objects.filter(
+        day__gte=date_from, day__lte=date_to, metric=DailyStat.JOURNAL_DEPARTMENT,
+    ).values("day", "key", "count"):
+        by_day.setdefault(row["day"], {})[row["key"]] = row["count"]
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "journals": {
+            "total": journal_total,
+            "by_department": departments,
+            "by_service": by_service,
+            "priority": priority,
+            "priority_share": round(priority / journal_total, 4) if journal_total else 0,
+            "by_day": [{"day": day, **counts} for day, counts in sorted(by_day.items())],
+        },
+        "appointments": {
+            "total": sum(statuses.values()),
+            "by_status": statuses,
+        },
+    }
@@ -0,0 +1,195 @@
+"""
+In-process префіксний індекс для typeahead (/api/search/suggest/).
+
+Ключі зберігаються в одному відсортованому списку рядків "простір:ключ\\0тип:id",
+пошук — bisect до першого ключа з потрібним префіксом і лінійний прохід,
+обмежений SCAN_LIMIT. Індекс будується при старті процесу (warm_up) або при
+першому запиті, далі оновлюється сигналами Client/Vehicle після коміту.
+Як і брокер подій, індекс локальний для процесу: розраховано на один сервер.
+"""
+import logging
+import re
+import threading
+from bisect import bisect_left, insort
+
+from apps.normalize import name_search_key, normalize_phone, plate_key
+
+
+logger = logging.getLogger(__name__)
+
+CLIENT = "client"
+VEHICLE = "vehicle"
+KINDS = (CLIENT, VEHICLE)
+
+# Простори ключів: ім'я (слова та повне ім'я), телефон, номер авто
+NAME, PHONE, PLATE = "n", "p", "v"
+
+
+def client_keys(name, phone):
+    name_key = name_search_key(name)
+    keys = {f"{NAME}:{word}" for word in name_key.split()}
+    if name_key:
+        keys.add(f"{NAME}:{name_key}")
+
+    digits = normalize_phone(phone)
+    if digits:
+        keys.add(f"{PHONE}:{digits}")
+        if digits.startswith("380"):
+            # щоб спрацьовував набір з "067…" і "67…"
+            keys.update({f"{PHONE}:{digits[2:]}", f"{PHONE}:{digits[3:]}"})
+    return keys
+
+
+def vehicle_keys(plate_number):
+    key = plate_key(plate_number)
+    return {f"{PLATE}:{key}"} if key else set()
+
+
+class PrefixIndex:
+    SCAN_LIMIT = 2000
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = []
+        self._keys = {}
+        self._items = {}
+        self._built = False
+
+    # ---------------------------
+    # Побудова
+    # ---------------------------
+    def build(self):
+        from apps.models import Client, Vehicle
+
+        entries, keys, items = [], {}, {}
+
+        def add(kind, pk, payload, entity_keys):
+            ref = (kind, pk)
+            items[ref] = payload
+            keys[ref] = {f"{key}\0{kind}:{pk}" for key in entity_keys}
+            entries.extend(keys[ref])
+
+        for pk, name, phone in Client.objects.order_by().values_list("id", "name", "phone").iterator(chunk_size=5000):
+            add(CLIENT, pk, {"id": pk, "name": name, "phone": phone}, client_keys(name, phone))
+
+        for pk, plate, brand, model in (
+            Vehicle.objects.order_by().values_list("id", "plate_number", "brand", "model").iterator(chunk_size=5000)
+        ):
+            add(VEHICLE, pk, {"id": pk, "plate_number": plate, "brand": brand, "model": model}, vehicle_keys(plate))
+
+        entries.sort()
+        with self._lock:
+            self._entries, self._keys, self._items = entries, keys, items
+            self._built = True
+        logger.info("Suggest index built: %s clients/vehicles, %s keys", len(items), len(entries))
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+
+    def warm_up(self):
+        """Будує індекс у фоні, щоб перший запит не чекав."""
+        def run():
+            try:
+                self.ensure_built()
+            except Exception:
+                logger.exception("Suggest index warm-up failed")
+        threading.Thread(target=run, name="suggest-index-warm-up", daemon=True).start()
+
+    # ---------------------------
+    # Інкрементальні оновлення (з сигналів)
+    # ---------------------------
+    def put(self, kind, pk, payload, entity_keys):
+        ref = (kind, pk)
+        new = {f"{key}\0{kind}:{pk}" for key in entity_keys}
+        # build() тримає lock до кінця — оновлення або потрапить у знімок, або застосується після
+        with self._lock:
+            if not self._built:
+                return  # ще не побудований — build() прочитає актуальні дані
+            old = self._keys.get(ref, set())
+            for entry in old - new:
+                self._discard(entry)
+            for entry in new - old:
+                insort(self._entries, entry)
+            self._keys[ref] = new
+            self._items[ref] = payload
+
+    def put_client(self, pk, name, phone):
+        self.put(CLIENT, pk, {"id": pk, "name": name, "phone": phone}, client_keys(name, phone))
+
+    def put_vehicle(self, pk, plate_number, brand, model):
+        self.put(
+            VEHICLE, pk,
+            {"id": pk, "plate_number": plate_number, "brand": brand, "model": model},
+            vehicle_keys(plate_number),
+        )
+
+    def remove(self, kind, pk):
+        with self._lock:
+            for entry in self._keys.pop((kind, pk), ()):
+                self._discard(entry)
+            self._items.pop((kind, pk), None)
+
+    def _discard(self, entry):
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    # ---------------------------
+    # Пошук
+    # ---------------------------
+    def _query_prefixes(self, q, kinds):
+        """Список (префікс ключа, додаткова перевірка кандидата або None)."""
+        prefixes = []
+        if CLIENT in kinds:
+            name = name_search_key(q)
+            words = name.split()
+            if len(words) > 1:
+                # "bulk pers": шукаємо за найдовшим словом, решта слів — префікси інших слів імені
+                prefixes.append((f"{NAME}:{max(words, key=len)}", lambda item: _has_word_prefixes(item["name"], words)))
+            elif name:
+                prefixes.append((f"{NAME}:{name}", None))
+            digits = re.sub(r"\D", "", q)
+            # телефон — якщо запит складається з цифр і символів форматування
+            if len(digits) >= 3 and not re.search(r"[^\d\s()+\-]", q):
+                prefixes.append((f"{PHONE}:{normalize_phone(digits)}", None))
+        if VEHICLE in kinds:
+            plate = plate_key(q)
+            if plate:
+                prefixes.append((f"{PLATE}:{plate}", None))
+        return prefixes
+
+    def search(self, q, limit, kinds=KINDS):
+        """Повертає (results, truncated). results — payload з полем type."""
+        self.ensure_built()
+
+        found = {}
+        truncated = False
+        with self._lock:
+            for prefix, check in self._query_prefixes(q, kinds):
+                position = bisect_left(self._entries, prefix)
+                for entry in self._entries[position:position + self.SCAN_LIMIT]:
+                    if not entry.startswith(prefix):
+                        break
+                    kind, _, pk = entry.rpartition("\0")[2].partition(":")
+                    ref = (kind, int(pk))
+                    if ref in found or (check and not check(self._items[ref])):
+                        continue
+                    if len(found) >= limit:
+                        truncated = True
+                        break
+                    found[ref] = {"type": kind, **self._items[ref]}
+                if truncated:
+                    break
+
+        return list(found.values()), truncated
+
+
+def _has_word_prefixes(name, words):
+    name_words = name_search_key(name).split()
+    return all(any(w.startswith(word) for w in name_words) for word in words)
+
+
+index = PrefixIndex()
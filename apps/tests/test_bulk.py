@@ -0,0 +1,30 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.models import JournalRecord
+
+
+class BulkFieldLengthTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create(username="importer"))
+
+    def test_too_long_fields_fail_only_their_item(self):
+        valid = {"department": "service", "client_name": "Іван", "phone": "0671234567",
+                 "plate_number": "AA1234BB", "brand": "Kia", "model": "Rio"}
+        response = self.api.post("/api/journals/bulk/", {"records": [
+            valid,
+            {**valid, "client_name": "я" * 256},
+            {**valid, "phone": "0" * 21, "plate_number": "A" * 21},
+            {**valid, "brand": "b" * 101, "model": "m" * 101},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["created", "error", "error", "error"])
+        self.assertEqual(set(results[1]["errors"]), {"client_name"})
+        self.assertEqual(set(results[2]["errors"]), {"phone", "plate_number"})
+        self.assertEqual(set(results[3]["errors"]), {"brand", "model"})
+        self.assertEqual(JournalRecord.objects.count(), 1)
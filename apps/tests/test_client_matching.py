@@ -0,0 +1,80 @@
+"""Автопошук клієнта при створенні записів журналу (create і bulk): без дублікатів за номером."""
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.models import Client, JournalRecord
+
+
+class JournalClientMatchingTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create(username="matcher"))
+        self.client_ = Client.objects.create(name="Іван Петренко", phone="0671234567")
+
+    def create(self, **payload):
+        return self.api.post("/api/journals/", {"department": "sales", **payload}, format="json")
+
+    def bulk(self, *records):
+        return self.api.post("/api/journals/bulk/", {"records": [{"department": "sales", **r} for r in records]}, format="json")
+
+    # ---------------------------
+    # create
+    # ---------------------------
+    def test_full_phone_matches_despite_name_order(self):
+        response = self.create(client_name="Петренко Іван", phone="+38 (067) 123-45-67")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(JournalRecord.objects.get().client, self.client_)
+        self.assertEqual(Client.objects.count(), 1)
+
+    def test_name_breaks_ties_between_owners_of_a_number(self):
+        wife = Client.objects.create(name="Олена Петренко", phone="0671234567")
+
+        response = self.create(client_name="Олена", phone="0671234567")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(JournalRecord.objects.get().client, wife)
+
+    def test_unresolved_shared_number_is_not_duplicated(self):
+        Client.objects.create(name="Олена Петренко", phone="0671234567")
+
+        response = self.create(client_name="Петро Сидоренко", phone="0671234567")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Client.objects.count(), 2)
+
+    def test_partial_phone_never_creates_client(self):
+        for phone in ("4567", "12"):
+            response = self.create(client_name="Новий Клієнт", phone=phone)
+            self.assertEqual(response.status_code, 400, phone)
+        self.assertEqual(Client.objects.count(), 1)
+
+    def test_partial_phone_with_name_finds_client(self):
+        response = self.create(client_name="Петренко", phone="4567")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(JournalRecord.objects.get().client, self.client_)
+
+    def test_new_full_number_creates_client(self):
+        response = self.create(client_name="Новий Клієнт", phone="0509998877")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(Client.objects.filter(name="Новий Клієнт").exists())
+
+    # ---------------------------
+    # bulk
+    # ---------------------------
+    def test_bulk_matches_full_phone_and_refuses_partial(self):
+        response = self.bulk(
+            {"client_name": "Петренко Іван", "phone": "380671234567"},
+            {"client_name": "Новий Клієнт", "phone": "4567"},
+            {"client_name": "Новий Клієнт", "phone": "0509998877"},
+            {"client_name": "Клієнт Новий", "phone": "+380509998877"},
+        )
+
+        statuses = [result["status"] for result in response.json()["results"]]
+        self.assertEqual(statuses, ["created", "error", "created", "created"])
+        self.assertEqual(JournalRecord.objects.filter(client=self.client_).count(), 1)
+        self.assertEqual(Client.objects.filter(phone_normalized="380509998877").count(), 1)
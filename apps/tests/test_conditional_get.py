@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.models import ChangeMarker, Client
+
+
+class ChangeMarkerETagTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create(username="etag"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(name="Іван Петренко", phone="0671234567")
+
+    def etag(self):
+        response = self.api.get("/api/clients/")
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.etag()
+        self.assertEqual(self.api.get("/api/clients/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_commit_with_older_updated_at_changes_etag(self):
+        # транзакція поставила updated_at раніше, ніж закомітилась інша, "свіжіша"
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            late = Client.objects.create(name="Олена Петренко", phone="0501234567")
+        Client.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(self.api.get("/api/clients/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_markers_are_bumped_once_per_commit(self):
+        table = Client._meta.db_table
+        before = ChangeMarker.objects.get(table=table).version
+        with self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.create(name="Петро", phone="0631234567")
+            client.name = "Петро Сидоренко"
+            client.save()
+
+        self.assertEqual(ChangeMarker.objects.get(table=table).version, before + 1)
@@ -0,0 +1,64 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TestCase
+
+from apps import dedup
+from apps.accounts.models import User
+from apps.models import Appointment, AppointmentUser, Client, Vehicle
+
+
+class MergeOverlappingAppointmentsTests(TestCase):
+    """Злиття дублікатів авто, на які є записи, що перетинаються в часі."""
+
+    def setUp(self):
+        self.keep = Client.objects.create(name="Іван Петренко", phone="0671234567")
+        self.duplicate = Client.objects.create(name="Ivan Petrenko", phone="+380671234567")
+        self.kept_vehicle = Vehicle.objects.create(plate_number="BC7777AK", brand="BMW", model="X5", client=self.keep)
+        self.duplicate_vehicle = Vehicle.objects.create(
+            plate_number="ВС 7777 АК", brand="bmw", model="x5", client=self.duplicate,
+        )
+
+    def book(self, vehicle, hour, status="pending"):
+        appointment = Appointment.objects.create(
+            vehicle=vehicle,
+            client=vehicle.client,
+            start_time=datetime(2030, 3, 1, hour, tzinfo=dt_timezone.utc),
+            duration_minutes=60,
+            status=status,
+        )
+        # у кожного запису свій співробітник — перетин лише за авто
+        appointment.users.add(User.objects.create_user(username=f"mechanic{Appointment.objects.count()}"))
+        return appointment
+
+    def test_overlapping_appointments_survive_the_merge(self):
+        kept = self.book(self.kept_vehicle, 10)
+        moved = self.book(self.duplicate_vehicle, 10)
+        later = self.book(self.duplicate_vehicle, 12)
+        canceled = self.book(self.duplicate_vehicle, 10, status="canceled")
+
+        totals = dedup.merge_clusters([{"keep": self.keep.pk, "merge": [self.duplicate.pk]}])
+
+        self.assertEqual(totals["vehicles"], 1)
+        self.assertEqual(totals["overlaps"], 1)
+        self.assertFalse(Vehicle.objects.filter(pk=self.duplicate_vehicle.pk).exists())
+        self.assertEqual(
+            set(Appointment.objects.filter(vehicle=self.kept_vehicle).values_list("id", flat=True)),
+            {kept.pk, moved.pk, later.pk, canceled.pk},
+        )
+
+        # лише запис, що перетинається, стає "дозволеним перетином" і перестає блокувати співробітника
+        flags = dict(Appointment.objects.values_list("id", "allow_overlap"))
+        self.assertEqual(
+            flags, {kept.pk: False, moved.pk: True, later.pk: False, canceled.pk: False},
+        )
+        self.assertFalse(AppointmentUser.objects.get(appointment=moved).blocking)
+        self.assertTrue(AppointmentUser.objects.get(appointment=kept).blocking)
+
+    def test_no_overlaps_leaves_appointments_untouched(self):
+        self.book(self.kept_vehicle, 9)
+        self.book(self.duplicate_vehicle, 11)
+
+        totals = dedup.merge_clusters([{"keep": self.keep.pk, "merge": [self.duplicate.pk]}])
+
+        self.assertEqual(totals["overlaps"], 0)
+        self.assertFalse(Appointment.objects.filter(allow_overlap=True).exists())
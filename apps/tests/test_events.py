@@ -0,0 +1,32 @@
+import asyncio
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from apps.events import JOURNAL, Broker, Subscription
+
+
+async def make_subscription():
+    return Subscription()
+
+
+class BrokerPublishTests(SimpleTestCase):
+
+    def test_closed_loop_subscription_is_dropped(self):
+        broker = Broker()
+        dead_loop = asyncio.new_event_loop()
+        dead = dead_loop.run_until_complete(make_subscription())
+        dead_loop.close()
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        alive = loop.run_until_complete(make_subscription())
+
+        broker.subscribe(dead)
+        broker.subscribe(alive)
+        broker.publish(JOURNAL, {("service", date(2030, 1, 1))}, {"id": 1})
+
+        # мёртвая подписка не обрывает рассылку и больше не числится у брокера
+        loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(alive.queue.qsize(), 1)
+        self.assertEqual(broker._subscribers, {alive})
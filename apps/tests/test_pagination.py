@@ -0,0 +1,38 @@
+from django.test import SimpleTestCase
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.api.pagination import AppointmentCursorPagination, JournalCursorPagination
+from apps.api.views import AppointmentViewSet, JournalRecordViewSet
+
+
+class CursorPaginationMixinTests(SimpleTestCase):
+
+    def paginator(self, viewset, params):
+        view = viewset()
+        view.request = Request(APIRequestFactory().get("/", params))
+        return view.paginator
+
+    def test_cursor_on_request(self):
+        self.assertIsInstance(self.paginator(JournalRecordViewSet, {"pagination": "cursor"}), JournalCursorPagination)
+        self.assertIsInstance(self.paginator(JournalRecordViewSet, {"cursor": "abc"}), JournalCursorPagination)
+        self.assertIsInstance(self.paginator(JournalRecordViewSet, {}), PageNumberPagination)
+        self.assertNotIsInstance(self.paginator(JournalRecordViewSet, {}), JournalCursorPagination)
+
+    def test_search_keeps_relevance_order(self):
+        # з q результат упорядкований за релевантністю — cursor перевпорядкував би його за (-date, -id)
+        for params in ({"pagination": "cursor", "q": "масло"}, {"cursor": "abc", "q": "масло"}):
+            paginator = self.paginator(JournalRecordViewSet, params)
+            self.assertNotIsInstance(paginator, JournalCursorPagination)
+            self.assertIsInstance(paginator, PageNumberPagination)
+
+        # порожній q — звичайний список, cursor лишається
+        self.assertIsInstance(
+            self.paginator(JournalRecordViewSet, {"pagination": "cursor", "q": "  "}), JournalCursorPagination,
+        )
+
+    def test_other_viewsets_unaffected(self):
+        self.assertIsInstance(
+            self.paginator(AppointmentViewSet, {"pagination": "cursor", "q": "x"}), AppointmentCursorPagination,
+        )
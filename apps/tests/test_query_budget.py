@@ -0,0 +1,209 @@
+"""
+Бюджет запитів для кожного read-шляху API: list / retrieve (і find-by-name,
+find-by-phone, overview) виконують однакову кількість запитів при 1 і 20 рядках.
+Якщо тест падає — десь з'явився N+1 (або бюджет треба свідомо переглянути).
+"""
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.models import Appointment, Client, JournalRecord, Service, Vehicle
+
+
+def has_extension(name):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = %s", [name])
+        return cursor.fetchone() is not None
+
+
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="budget")
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.sequence = 0
+
+    # ---------------------------
+    # Дані
+    # ---------------------------
+    def next_number(self):
+        self.sequence += 1
+        return self.sequence
+
+    def make_client(self, name="Петренко", phone=None):
+        number = self.next_number()
+        return Client.objects.create(name=f"{name} {number}", phone=phone or f"06700{number:05d}")
+
+    def make_vehicle(self, client=None):
+        number = self.next_number()
+        return Vehicle.objects.create(plate_number=f"AA{number:04d}BB", brand="Kia", model="Rio", client=client)
+
+    def make_service(self):
+        return Service.objects.create(name=f"Послуга {self.next_number()}")
+
+    def make_staff(self):
+        return User.objects.create(username=f"staff{self.next_number()}")
+
+    def make_journal(self, client=None, services=()):
+        client = client or self.make_client()
+        record = JournalRecord.objects.create(
+            department="service", client=client, vehicle=self.make_vehicle(client),
+            phone=client.phone, comment="Заміна масла", service=self.make_service(),
+        )
+        record.services.set(services or [self.make_service()])
+        return record
+
+    def make_appointment(self, client=None, users=(), services=(), days=1):
+        client = client or self.make_client()
+        appointment = Appointment.objects.create(
+            vehicle=self.make_vehicle(client),
+            start_time=timezone.now() + timedelta(days=days, hours=self.next_number()),
+            duration_minutes=30,
+        )
+        appointment.users.set(users or [self.make_staff()])
+        appointment.services.set(services or [self.make_service()])
+        return appointment
+
+    # ---------------------------
+    # Перевірка
+    # ---------------------------
+    def assertBudget(self, budget, url, grow, params=None):
+        """Однаковий budget запитів до і після grow() (1 -> 20 рядків)."""
+        for _ in range(2):
+            with self.assertNumQueries(budget):
+                response = self.api.get(url, params or {})
+            self.assertEqual(response.status_code, 200, response.content[:300])
+            grow()
+
+    def repeat(self, factory, times=19):
+        return lambda: [factory() for _ in range(times)]
+
+    # ---------------------------
+    # Журнал
+    # ---------------------------
+    def test_journal_list(self):
+        self.make_journal()
+        self.assertBudget(5, "/api/journals/", self.repeat(self.make_journal))
+
+    def test_journal_list_cursor(self):
+        self.make_journal()
+        self.assertBudget(4, "/api/journals/", self.repeat(self.make_journal), {"pagination": "cursor"})
+
+    def test_journal_retrieve(self):
+        record = self.make_journal()
+        self.assertBudget(
+            4, f"/api/journals/{record.pk}/",
+            lambda: record.services.add(*[self.make_service() for _ in range(19)]),
+        )
+
+    # ---------------------------
+    # Клієнти
+    # ---------------------------
+    def test_client_list(self):
+        self.make_vehicle(self.make_client())
+        self.assertBudget(4, "/api/clients/", self.repeat(lambda: self.make_vehicle(self.make_client())))
+
+    def test_client_retrieve(self):
+        client = self.make_client()
+        self.make_vehicle(client)
+        self.assertBudget(3, f"/api/clients/{client.pk}/", self.repeat(lambda: self.make_vehicle(client)))
+
+    @skipUnless(has_extension("pg_trgm"), "нечіткий пошук потребує pg_trgm")
+    def test_client_find_by_name(self):
+        self.make_client("Коваленко")
+        self.assertBudget(
+            2, "/api/clients/find-by-name/", self.repeat(lambda: self.make_client("Коваленко")),
+            {"q": "Коваленко", "limit": 50},
+        )
+
+    def test_client_find_by_name_prefix(self):
+        # 1–2 символи — префікс по btree, без trigram
+        self.make_client("Коваленко")
+        self.assertBudget(
+            2, "/api/clients/find-by-name/", self.repeat(lambda: self.make_client("Коваленко")),
+            {"q": "Ко", "limit": 50},
+        )
+
+    def test_client_find_by_phone(self):
+        self.make_client(phone="0671111111")
+        self.assertBudget(
+            2, "/api/clients/find-by-phone/",
+            self.repeat(lambda: self.make_client(phone="+380671111111")),
+            {"q": "0671111111", "limit": 50},
+        )
+
+    def test_client_find_by_phone_suffix(self):
+        self.make_client(phone="0671111111")
+        self.assertBudget(
+            2, "/api/clients/find-by-phone/",
+            self.repeat(lambda: self.make_client(phone="0501111111")),
+            {"q": "1111", "limit": 50},
+        )
+
+    def test_client_overview(self):
+        client = self.make_client()
+        self.make_journal(client)
+        self.make_appointment(client)
+        self.make_appointment(client, days=-1)
+
+        def grow():
+            for _ in range(19):
+                self.make_journal(client)
+                self.make_appointment(client)
+                self.make_appointment(client, days=-1)
+
+        self.assertBudget(10, f"/api/clients/{client.pk}/overview/", grow, {"appointments_limit": 50})
+
+    # ---------------------------
+    # Авто
+    # ---------------------------
+    def test_vehicle_list(self):
+        self.make_vehicle(self.make_client())
+        self.assertBudget(3, "/api/vehicles/", self.repeat(lambda: self.make_vehicle(self.make_client())))
+
+    def test_vehicle_retrieve(self):
+        vehicle = self.make_vehicle(self.make_client())
+        self.assertBudget(2, f"/api/vehicles/{vehicle.pk}/", lambda: None)
+
+    # ---------------------------
+    # Записи на сервіс
+    # ---------------------------
+    def test_appointment_list(self):
+        self.make_appointment()
+        self.assertBudget(5, "/api/appointments/", self.repeat(self.make_appointment))
+
+    def test_appointment_list_cursor(self):
+        self.make_appointment()
+        self.assertBudget(4, "/api/appointments/", self.repeat(self.make_appointment), {"pagination": "cursor"})
+
+    def test_appointment_retrieve(self):
+        appointment = self.make_appointment()
+
+        def grow():
+            appointment.users.add(*[self.make_staff() for _ in range(19)])
+            appointment.services.add(*[self.make_service() for _ in range(19)])
+
+        self.assertBudget(4, f"/api/appointments/{appointment.pk}/", grow)
+
+    # ---------------------------
+    # Довідники
+    # ---------------------------
+    def test_service_list(self):
+        self.make_service()
+        self.assertBudget(2, "/api/services/", self.repeat(self.make_service))
+
+    def test_service_retrieve(self):
+        service = self.make_service()
+        self.assertBudget(2, f"/api/services/{service.pk}/", lambda: None)
+
+    def test_user_list(self):
+        self.assertBudget(2, "/api/users/", self.repeat(self.make_staff))
+
+    def test_user_retrieve(self):
+        self.assertBudget(2, f"/api/users/{self.user.pk}/", lambda: None)
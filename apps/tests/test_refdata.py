@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from apps import refdata
+from apps.models import Service
+
+
+class ActiveServiceIdsTests(TestCase):
+
+    def setUp(self):
+        self.known = Service.objects.create(name="Заміна масла")
+        self.addCleanup(setattr, refdata.services, "_snapshot", None)
+
+    def use_snapshot(self, rows):
+        """Знімок, як у воркері, що не бачив сигналів інших процесів."""
+        refdata.services._snapshot = refdata.Snapshot(refdata.services._version, rows)
+
+    def test_cached_services_need_no_queries(self):
+        self.use_snapshot([self.known])
+        with self.assertNumQueries(0):
+            self.assertEqual(refdata.active_service_ids([self.known.pk]), [self.known.pk])
+
+    def test_service_from_another_process_is_checked_in_db(self):
+        self.use_snapshot([self.known])
+        created = Service.objects.create(name="Розвал-сходження")
+        inactive = Service.objects.create(name="Шиномонтаж", is_active=False)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                refdata.active_service_ids([created.pk, self.known.pk, inactive.pk, 999999]),
+                [created.pk, self.known.pk],
+            )
+
+    def test_expired_snapshot_is_reloaded(self):
+        self.use_snapshot([self.known])
+        refdata.services._snapshot.loaded_at -= refdata.SNAPSHOT_TTL
+        Service.objects.filter(pk=self.known.pk).update(is_active=False)
+
+        self.assertEqual(refdata.active_service_ids([self.known.pk]), [])
@@ -127,7 +127,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const q = clientInput.value;
         if (q.length < 2) return;
 
-        fetch(`/api/clients/auto_find/?q=${q}`)
+        fetch(`/api/search/suggest/?types=client&q=${encodeURIComponent(q)}`)
             .then(r => r.json())
             .then(data => {
                 clientResults.innerHTML = "";
@@ -156,7 +156,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const q = vehicleInput.value;
         if (q.length < 2) return;
 
-        fetch(`/api/vehicles/auto_find_by_number/?plate_number=${q}`)
+        fetch(`/api/search/suggest/?types=vehicle&q=${encodeURIComponent(q)}`)
             .then(r => r.json())
             .then(data => {
                 vehicleResults.innerHTML = "";